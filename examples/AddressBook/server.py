@@ -2,6 +2,7 @@ import connexion
 from flask_cors import CORS
 
 import nova_api
+from nova_api.persistence.request_scope import add_request_scope
 
 nova_api.logger.info("Test")
 
@@ -26,6 +27,8 @@ dao.close()
 # Create the application instance
 app = connexion.App(__name__, specification_dir=".")
 CORS(app.app)
+# Share one database connection among the DAOs of each request
+add_request_scope(app)
 
 # Add the api to the flask server
 app.add_api("contact_api.yml")
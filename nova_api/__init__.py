@@ -4,17 +4,20 @@ import logging
 import os
 import sys
 import time
+from array import array
 from dataclasses import Field, fields
 from functools import wraps
-from typing import Optional, Type
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, \
+    Type
 
-from flask import jsonify, make_response
+from flask import make_response
 from flask.wrappers import Response
 
-from nova_api import baseapi
+from nova_api import baseapi, encoder
 from nova_api.dao import GenericDAO
 from nova_api.entity import Entity
 from nova_api.exceptions import NovaAPIException
+from nova_api.persistence import request_scope
 
 # Authorization schemas
 JWT = 0
@@ -25,13 +28,41 @@ possible_level = {"DEBUG": logging.DEBUG,
                   "INFO": logging.INFO,
                   "WARNING": logging.WARNING,
                   "ERROR": logging.ERROR,
-                  "CRITICAL": logging.CRITICAL}
+                  "CRITICAL": logging.CRITICAL,
+                  # Quiet production profile
+                  "PRODUCTION": logging.WARNING}
+
+LOGGERS = ("NovaAPILogger", "nova_api")
 
 logger = logging.getLogger("NovaAPILogger")
 
 DEBUG = bool(os.environ.get('NOVAAPI_DEBUG', False))
 
 
+def set_log_level(level: str) -> None:
+    """Sets the level of the nova_api loggers.
+
+    The `PRODUCTION` profile only keeps warnings and errors, so the \
+    debug and info messages of each request are discarded before being \
+    formatted. The level may also be set through the env variable \
+    NOVAAPI_LOG_LEVEL.
+
+    :raises ValueError: If the level is not one of `possible_level`.
+
+    :param level: Name of the level, case insensitive
+    :return: None
+    """
+    if level.upper() not in possible_level:
+        raise ValueError(f"Log level {level} not available. Use one of "
+                         f"{', '.join(possible_level)}.")
+    for logger_name in LOGGERS:
+        logging.getLogger(logger_name).setLevel(possible_level[level.upper()])
+
+
+if os.environ.get("NOVAAPI_LOG_LEVEL"):
+    set_log_level(os.environ["NOVAAPI_LOG_LEVEL"])
+
+
 def close_if_still_open(entity_dao: GenericDAO) -> None:
     """Closes a DAO connection if it's still open.
 
@@ -57,21 +88,25 @@ def default_response(success: bool, status_code: int,
                 }
             }
 
+    The payload is encoded with `encoder.dumps` and only logged when the \
+    logger is enabled for debug.
+
     :param success: bool that represents if the request was successfully \
     processed.
     :param status_code: integer that represents the http status code of the \
     response.
     :param message: summary string for the response.
-    :param data: dictionary (json valid) with data to be sent in the response
+    :param data: dictionary with data to be sent in the response. Besides \
+    json valid values, it may contain entities, dates, datetimes and enums.
     :return: a flask response with headers and status codes set
     """
-    json_content = jsonify({"success": success,
-                            "message": message,
-                            "data": data})
-    logger.info("Sending message: %s with status code %s and success %s",
-                str(json_content),
-                str(status_code),
-                success)
+    json_content = encoder.dumps({"success": success,
+                                  "message": message,
+                                  "data": data})
+    logger.info("Sending message with status code %s and success %s",
+                status_code, success)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Message sent: %s", json_content.decode())
     return make_response(
         json_content,
         status_code,
@@ -120,6 +155,91 @@ def success_response(status_code: int = 200, message: str = "OK",
                             message=message, data=data)
 
 
+def streaming_response(results: Iterable[Entity], status_code: int = 200,
+                       message: str = "OK", ndjson: bool = False,
+                       fields_: List[str] = None) -> Response:
+    """Sends a flask streaming response, serializing the results as they \
+    are consumed, so the whole payload is never held in memory. Meant to \
+    be used with `GenericDAO.iter_all`.
+
+    The JSON format keeps the default response envelope, with the results \
+    in `data.results`. The NDJSON format sends one serialized entity per \
+    line without envelope.
+
+    If the iteration fails after the response started, the error is \
+    logged and the stream is interrupted, leaving an incomplete payload. \
+    So `results` should be validated and its query started before the \
+    call, as `iter_all` does, for the request errors to be sent as an \
+    `error_response` by `use_dao`.
+
+    :param results: Iterable with the entities to send
+    :param status_code: Integer that represents the http status code of the \
+    response.
+    :param message: Summary string for the response.
+    :param ndjson: Sends NDJSON instead of a JSON document
+    :param fields_: The attributes to send, as in `serialize_entity`
+    :return: A streamed flask response
+    """
+
+    def generate() -> Iterator[bytes]:
+        try:
+            if ndjson:
+                for result in results:
+                    yield encoder.dumps(serialize_entity(result,
+                                                         fields_)) + b"\n"
+                return
+
+            yield b'{"success":true,"message":' + encoder.dumps(message) \
+                + b',"data":{"results":['
+            for index, result in enumerate(results):
+                yield (b"," if index else b"") \
+                    + encoder.dumps(serialize_entity(result, fields_))
+            yield b"]}}"
+        except Exception:
+            logger.error("Streaming response interrupted due to an error.",
+                         exc_info=True)
+            raise
+
+    logger.info("Streaming %s response with status code %s",
+                "NDJSON" if ndjson else "JSON", status_code)
+    return Response(
+        generate(),
+        status=status_code,
+        mimetype="application/x-ndjson" if ndjson else "application/json"
+    )
+
+
+def serialize_entity(entity: Entity, fields_: List[str] = None) -> dict:
+    """Serializes an entity as `dict(entity)`, keeping only the selected \
+    fields if `fields_` is given. `id_` is always kept.
+
+    :param entity: The entity to serialize
+    :param fields_: The attributes selected with the `fields` argument of \
+    the DAO `get` or `get_all`
+    :return: Dictionary with the serialized fields of the entity
+    """
+    if not fields_:
+        return dict(entity)
+
+    selected = {"id_", *fields_}
+    return {key: value for key, value in entity
+            if key in selected
+            or (key.endswith("_id_") and key[:-len("_id_")] in selected)}
+
+
+def serialize_columns(columns: Dict[str, Sequence]) -> dict:
+    """Serializes the columns returned by `GenericDAO.get_all_columnar` \
+    to JSON valid lists. Arrays are converted with `tolist` and the other \
+    values with `Entity.serialize_field`.
+
+    :param columns: The columns returned by `get_all_columnar`
+    :return: Dictionary with a list of serialized values for each attribute
+    """
+    return {name: column.tolist() if isinstance(column, array)
+            else [Entity.serialize_field(value) for value in column]
+            for name, column in columns.items()}
+
+
 def use_dao(dao_class: Type[GenericDAO],
             error_message: str = "Error",
             dao_parameters: dict = None,
@@ -174,15 +294,22 @@ def use_dao(dao_class: Type[GenericDAO],
                         break
                     except ConnectionError as con_error:
                         logger.debug("Connection failed, will retry "
-                                     "{attempted_retries} times",
-                                     attempted_retries=attempted_retries)
+                                     "%s times", attempted_retries - 1)
                         time.sleep(retry_delay)
                         if attempted_retries == 1:
                             raise con_error
                     finally:
                         attempted_retries -= 1
 
-                return function(dao=entity_dao, *args, **kwargs)
+                response = function(dao=entity_dao, *args, **kwargs)
+                if isinstance(response, Response) and response.is_streamed:
+                    # The DAO is still used while the response is sent
+                    response.call_on_close(
+                        lambda dao=entity_dao: close_if_still_open(dao))
+                    if request_scope.is_active():
+                        response.call_on_close(request_scope.detach())
+                    entity_dao = None
+                return response
             except NovaAPIException as nova_api_exception:
                 response_data = {"error_code": nova_api_exception.error_code}
                 if DEBUG:
@@ -1,16 +1,21 @@
 """Module for Data Access Objects implementation"""
 
 import dataclasses
+import json
 import logging
 from abc import ABC, abstractmethod
+from array import array
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
 # pylint: disable=W0622
 from re import I, compile, sub
-from typing import List, Optional, Type
+from typing import Any, Callable, Dict, Iterable, Iterator, List, \
+    Optional, Sequence, Set, Tuple, Type
 
-from nova_api.entity import Entity
+from nova_api.entity import Entity, get_db_fields_info, get_fields_info
 from nova_api.exceptions import DuplicateEntityException, \
-    EntityNotFoundException, InvalidFiltersException, InvalidIDException, \
-    InvalidIDTypeException, \
+    EntityNotFoundException, InvalidCursorException, InvalidFieldsException, \
+    InvalidFiltersException, InvalidIDException, InvalidIDTypeException, \
     NotEntityException
 
 
@@ -25,9 +30,38 @@ def camel_to_snake(name: str):
     return sub('([a-z0-9])([A-Z])', r'\1_\2', name).lower()
 
 
+COUNT_EXACT = "exact"
+COUNT_ESTIMATED = "estimated"
+COUNT_WINDOW = "window"
+COUNT_NONE = "none"
+COUNT_MODES = (COUNT_EXACT, COUNT_ESTIMATED, COUNT_WINDOW, COUNT_NONE)
+
+ARRAY_TYPECODES = {int: 'q', float: 'd'}
+
 uuidv4regex = compile(
     r'^[a-f0-9]{8}[a-f0-9]{4}4[a-f0-9]{3}[89ab][a-f0-9]{3}[a-f0-9]{12}'
     r'\Z', I)
+uuidregex = compile(
+    r'^[a-f0-9]{8}[a-f0-9]{4}[47][a-f0-9]{3}[89ab][a-f0-9]{3}[a-f0-9]{12}'
+    r'\Z', I)
+
+
+@dataclasses.dataclass
+class BulkResult:
+    """Result of the bulk operations of a DAO.
+
+    :param ids: The `id_` of the entities successfully processed, in the \
+    order they were received.
+    :param errors: The errors of the entities that were not processed, \
+    keyed by their position in the list received.
+    """
+    ids: List[str] = dataclasses.field(default_factory=list)
+    errors: Dict[int, Exception] = dataclasses.field(default_factory=dict)
+
+    @property
+    def success(self) -> bool:
+        """Whether all entities were processed without errors."""
+        return not self.errors
 
 
 def is_valid_uuidv4(id_: str) -> bool:
@@ -40,9 +74,63 @@ def is_valid_uuidv4(id_: str) -> bool:
     return uuidv4regex.match(id_)
 
 
+def is_valid_uuid(id_: str) -> bool:
+    """
+    Checks that the id_ is an UUID generated by `generate_id`, either a \
+    UUIDv4 or a time ordered UUIDv7, without dashes.
+
+    :param id_: The ID to validate.
+    :return: True if id_ is an UUIDv4 or UUIDv7, False otherwise.
+    """
+    return uuidregex.match(id_)
+
+
 class GenericDAO(ABC):
     """ Interface class for the implementation of Data Access Objects.
+
+    The total returned by `get_all` is controlled by `count_mode`, which \
+    may be overridden in subclasses or passed to each call:
+     * *exact*: Counts the entities that match the filters.
+     * *estimated*: Uses the database statistics for the whole table or \
+     collection. It's cheap but approximate and ignores the filters.
+     * *window*: Counts the matched entities in the same query that \
+     recovers them with `COUNT(*) OVER()`. Falls back to *exact* if the \
+     database doesn't support it or if the page is past the last entity.
+     * *none*: Doesn't count. The total is returned as None.
+
+    The bulk operations `create_many`, `update_many`, `upsert_many` and \
+    `remove_many` \
+    process the entities in batches of `bulk_batch_size`. Each batch is \
+    checked with a single query and written with a single statement. The \
+    errors are reported per entity in the returned `BulkResult`.
+
+    `get_all` also supports keyset pagination through the `cursor` \
+    argument. The results are ordered by `keyset_field` and `id_` and each \
+    page starts right after the entity encoded in the cursor, so every page \
+    costs the same regardless of its position. An index on the \
+    `keyset_field` and `id_` columns is expected.
+
+    The `sort` argument of `get_all` orders the results in the database. \
+    Each key is an attribute name, prefixed with `-` for descending order, \
+    and `id_` is appended as a tiebreaker so that pages are stable. If \
+    `check_sort_indexes` is set, a warning is logged when a sort column is \
+    not the first column of an index.
+
+    With `trusted_hydration`, the entities read from the database are \
+    created with `Entity.from_db`, which is faster but skips the attribute \
+    validation and stripping made by `Entity.__init__` and \
+    `Entity.__setattr__`. It's disabled by default and should only be \
+    enabled when the database is trusted to hold valid values.
+
+    `get_all_columnar` returns the same results as `get_all` organized by \
+    column, without creating entities, for analytics and exports.
     """
+    count_mode: str = COUNT_EXACT
+    keyset_field: str = "creation_datetime"
+    bulk_batch_size: int = 500
+    rely_on_constraints: bool = False
+    check_sort_indexes: bool = False
+    trusted_hydration: bool = False
 
     @abstractmethod
     def __init__(self,
@@ -59,18 +147,21 @@ class GenericDAO(ABC):
 
         self.fields = fields
         if not self.fields:
-            class_args = dataclasses.fields(return_class)
+            class_args = get_db_fields_info(return_class)
             self.logger.debug("Field passed to %s are %s.",
                               self.__class__.__name__,
-                              str(class_args))
+                              class_args)
 
-            self.fields = {arg.name: self._generate_field_database_name(arg)
-                           for arg in class_args
-                           if arg.metadata.get("database", True)}
+            self.fields = {
+                arg.name: self._generate_field_database_name(arg.field_)
+                for arg in class_args
+            }
 
             self.logger.debug("Processed fields for %s are %s.",
                               self.__class__.__name__,
-                              str(self.fields))
+                              self.fields)
+
+        self._field_names = tuple(self.fields)
 
     def _generate_field_database_name(self, arg: dataclasses.Field) -> str:
         """
@@ -86,32 +177,190 @@ class GenericDAO(ABC):
                + ('' if not issubclass(arg.type, Entity) else "_id_")
 
     @abstractmethod
-    def get(self, id_: str) -> Optional[Entity]:
+    def get(self, id_: str, fields: List[str] = None) -> Optional[Entity]:
         """
         Recovers and entity with `id_` from the database. The id_ must be the \
-        nova_api generated id_ which is a 32-char uuid v4.
+        nova_api generated id_ which is a 32-char uuid v4 or v7.
 
         :raises InvalidIDTypeException: If the UUID is not a string
-        :raises InvalidIDException: If the UUID is not a valid UUID v4 \
+        :raises InvalidIDException: If the UUID is not a valid UUID v4 or v7 \
         without '-'.
+        :raises InvalidFieldsException: If a field is not available in the \
+        DAO.
 
         :param id_: The UUID of the instance to recover
+        :param fields: The attributes to select. Defaults to all fields. \
+        `id_` is always selected and the other attributes keep their \
+        defaults.
         :return: None if no instance is found or a `return_class` instance \
         if found
         """
         if not isinstance(id_, str):
             self.logger.error("ID was not passed as a str to get. "
-                              "Value received: %s", str(id_))
+                              "Value received: %s", id_)
             raise InvalidIDTypeException(debug=f"Received ID was {id_}")
-        if not is_valid_uuidv4(id_):
+        if not is_valid_uuid(id_):
             self.logger.error("ID is not a valid str in get. "
-                              "Should be a valid uuid4."
-                              "Value received: %s", str(id_))
+                              "Should be a valid uuid4 or uuid7."
+                              "Value received: %s", id_)
             raise InvalidIDException(debug=f"Received ID was {id_}")
 
+    def _get_projection(self, fields: Optional[List[str]],
+                        *required: str) -> Optional[List[str]]:
+        """
+        Returns the attributes to select when `fields` is given, in the \
+        order of the DAO fields and always including `id_` and `required`.
+
+        :raises InvalidFieldsException: If a field is not available in the \
+        DAO.
+
+        :param fields: The fields received in `get` or `get_all`
+        :param required: Other fields that must be selected
+        :return: None to select all fields or the list of attributes to select
+        """
+        if not fields:
+            return None
+
+        invalid = [field for field in fields if field not in self.fields]
+        if invalid:
+            self.logger.error("Fields %s not available in %s.",
+                              invalid, self.__class__.__name__)
+            raise InvalidFieldsException(
+                debug=f"Fields {', '.join(invalid)} not available in "
+                      f"{self.return_class.__name__}."
+            )
+
+        selected = {"id_", *fields, *required}
+        return [field for field in self.fields if field in selected]
+
+    def _get_sort(self, sort: Optional[List[str]],
+                  cursor: Optional[str] = None) \
+            -> Optional[Tuple[Tuple[str, bool], ...]]:
+        """
+        Parses the sort keys received in `get_all`.
+
+        :raises InvalidFieldsException: If a sort key is not available in \
+        the DAO.
+        :raises InvalidCursorException: If both `sort` and `cursor` are given.
+
+        :param sort: The attribute names to sort by, prefixed with `-` for \
+        descending order
+        :param cursor: The cursor received in `get_all`
+        :return: None if there is no sort or a tuple of (attribute, \
+        descending) pairs, ending with `id_`
+        """
+        if not sort:
+            return None
+        if cursor is not None:
+            raise InvalidCursorException(
+                debug=f"Keyset pagination is ordered by {self.keyset_field} "
+                      f"and can't be combined with sort."
+            )
+
+        parsed = tuple((key.lstrip('-+'), key.startswith('-'))
+                       for key in sort)
+        invalid = [field for field, _ in parsed if field not in self.fields]
+        if invalid:
+            self.logger.error("Sort fields %s not available in %s.",
+                              invalid, self.__class__.__name__)
+            raise InvalidFieldsException(
+                debug=f"Sort fields {', '.join(invalid)} not available in "
+                      f"{self.return_class.__name__}."
+            )
+
+        if "id_" not in [field for field, _ in parsed]:
+            parsed += (("id_", False),)
+        return parsed
+
+    def _warn_unindexed_sort(self, sort: Tuple[Tuple[str, bool], ...],
+                             indexed_columns: Set[str]) -> None:
+        """
+        Logs a warning for each sort column that is not the first column \
+        of an index.
+
+        :param sort: The sort returned by `_get_sort`
+        :param indexed_columns: The columns that start an index
+        :return: None
+        """
+        for field, _ in sort:
+            if self.fields[field] not in indexed_columns:
+                self.logger.warning("Sorting %s by %s, which has no "
+                                    "supporting index.",
+                                    self.return_class.__name__, field)
+
+    def _get_count_mode(self, count_mode: Optional[str]) -> str:
+        """
+        Returns the count mode to use in `get_all`, defaulting to the DAO \
+        `count_mode`.
+
+        :raises ValueError: If the count mode is not one of `COUNT_MODES`.
+
+        :param count_mode: The count mode received in `get_all`
+        :return: The count mode to use
+        """
+        count_mode = count_mode or self.count_mode
+        if count_mode not in COUNT_MODES:
+            self.logger.error("Count mode %s not available in %s.",
+                              count_mode, self.__class__.__name__)
+            raise ValueError(
+                f"Count mode {count_mode} not available. Use one of "
+                f"{', '.join(COUNT_MODES)}."
+            )
+        return count_mode
+
+    def next_cursor(self, results: List[Entity],
+                    length: int) -> Optional[str]:
+        """
+        Returns the cursor to recover the page after `results` with keyset \
+        pagination.
+
+        :param results: The results returned by `get_all` with a cursor
+        :param length: The length used in the `get_all` call
+        :return: The opaque cursor for the next page or None if `results` \
+        is the last page
+        """
+        if not results or len(results) < length:
+            return None
+        last = results[-1]
+        token = json.dumps([
+            Entity.serialize_field(getattr(last, self.keyset_field)),
+            last.id_
+        ])
+        return urlsafe_b64encode(token.encode()).decode()
+
+    def _decode_cursor(self, cursor: str) -> Optional[Tuple[Any, str]]:
+        """
+        Decodes a cursor created by `next_cursor`.
+
+        :raises InvalidCursorException: If the cursor is not valid.
+
+        :param cursor: The cursor received in `get_all`. An empty string \
+        represents the first page.
+        :return: None for the first page or a tuple with the `keyset_field` \
+        value and the `id_` of the last entity of the previous page.
+        """
+        if cursor == '':
+            return None
+        try:
+            value, id_ = json.loads(urlsafe_b64decode(cursor.encode()))
+        except (BinasciiError, TypeError, ValueError, AttributeError) as err:
+            self.logger.error("Invalid cursor received: %s", cursor)
+            raise InvalidCursorException(
+                debug=f"Received cursor was {cursor}"
+            ) from err
+        if not isinstance(id_, str) or not is_valid_uuid(id_):
+            self.logger.error("Invalid cursor received: %s", cursor)
+            raise InvalidCursorException(debug=f"Received cursor was {cursor}")
+        return value, id_
+
     @abstractmethod
+    # pylint: disable=R0913
     def get_all(self, length: int = 20, offset: int = 0,
-                filters: dict = None) -> (int, List[Entity]):
+                filters: dict = None,
+                count_mode: str = None,
+                cursor: str = None,
+                fields: List[str] = None,
+                sort: List[str] = None) -> (int, List[Entity]):
         """
         Recovers all instances that match the given filters up to the length \
         specified starting from the offset given.
@@ -133,8 +382,94 @@ class GenericDAO(ABC):
         valid attribute in the entity and the value may either be an specific \
         value or a list with two elements: an operator and a value,
         respectively.
-        :return: A tuple with the totol number of entities in the database \
-        and a list of the matched results.
+        :param count_mode: How to compute the total. One of `COUNT_MODES`. \
+        Defaults to the DAO `count_mode`.
+        :param cursor: Enables keyset pagination, ignoring the offset. Use \
+        an empty string for the first page and `next_cursor` for the \
+        following ones.
+        :param fields: The attributes to select. Defaults to all fields. \
+        `id_` is always selected and, with a cursor, the `keyset_field` too. \
+        The other attributes keep their defaults.
+        :param sort: The attributes to order by, prefixed with `-` for \
+        descending order. Can't be combined with `cursor`, which is always \
+        ordered by `keyset_field` and `id_`.
+        :return: A tuple with the total number of matched entities in the \
+        database and a list of the matched results.
+        """
+        raise NotImplementedError()
+
+    # pylint: disable=R0913
+    def get_all_columnar(self, length: int = 20, offset: int = 0,
+                         filters: dict = None,
+                         count_mode: str = None,
+                         fields: List[str] = None,
+                         sort: List[str] = None) \
+            -> (int, Dict[str, Sequence]):
+        """
+        Recovers the instances that match the given filters as `get_all`, \
+        but returns the values organized by column instead of creating an \
+        entity for each row. The values are kept as read from the database, \
+        so child entities are represented by their `id_`. Columns of `int` \
+        and `float` fields without null values are returned as `array` \
+        instances and the others as lists.
+
+        Example:
+            >>> dao.get_all_columnar(length=2, fields=["name"])
+            (2, {"id_": ["a1...", "b2..."], "name": ["John", "Jane"]})
+
+        :param length: The number of items to select
+        :param offset: The number of items to skip before starting to select
+        :param filters: A dict with the filters to use, as in `get_all`
+        :param count_mode: How to compute the total, as in `get_all`
+        :param fields: The attributes to select, as in `get_all`
+        :param sort: The attributes to order by, as in `get_all`
+        :return: A tuple with the total number of matched entities in the \
+        database and a dict with the values of each selected attribute.
+        """
+        raise NotImplementedError()
+
+    def _build_columns(self, names: Sequence[str],
+                       columns: Iterable[Sequence[Any]]) \
+            -> Dict[str, Sequence]:
+        """
+        Builds the result of `get_all_columnar`, converting the columns of \
+        `int` and `float` fields to arrays when they have no null values.
+
+        :param names: The attribute names of the columns
+        :param columns: The values of each column, in the order of `names`
+        :return: A dict with the column of each attribute
+        """
+        fields_info = get_fields_info(self.return_class)
+        result = {}
+        for name, values in zip(names, columns):
+            field_info = fields_info.get(name)
+            typecode = None if field_info is None \
+                else ARRAY_TYPECODES.get(field_info.field_.type)
+            column = None
+            if typecode is not None and None not in values:
+                try:
+                    column = array(typecode, values)
+                except (TypeError, OverflowError):
+                    self.logger.debug("Column %s can't be stored in an "
+                                      "array. Using a list.", name)
+            result[name] = column if column is not None else list(values)
+        return result
+
+    def iter_all(self, filters: dict = None, batch_size: int = 1000,
+                 fields: List[str] = None) -> Iterator[Entity]:
+        """
+        Iterates over all instances that match the given filters, fetching \
+        them from the database in batches of `batch_size` with a \
+        server-side cursor. The memory used doesn't depend on the number \
+        of matched entities, so it may be used for exports.
+
+        No other operation should be made with the DAO until the iteration \
+        finishes or the generator is closed.
+
+        :param filters: A dict with the filters to use, as in `get_all`
+        :param batch_size: The number of entities fetched at a time
+        :param fields: The attributes to select, as in `get_all`
+        :return: A generator of `return_class` instances
         """
         raise NotImplementedError()
 
@@ -165,7 +500,7 @@ class GenericDAO(ABC):
             self.logger.info(
                 "Entity was not passed as an instance to remove"
                 " and no filters where specified! "
-                "Value received: %s", str(entity))
+                "Value received: %s", entity)
             raise NotEntityException(
                 debug=f"Entity must be a {self.return_class.__name__} object "
                       f"or filters must be specified!"
@@ -174,13 +509,14 @@ class GenericDAO(ABC):
         if filters is not None and not isinstance(filters, dict):
             self.logger.error(
                 "Filters were not passed as an dict to remove!"
-                " Value received: %s", str(filters))
+                " Value received: %s", filters)
             raise InvalidFiltersException(
                 debug=f"Filters were {str(filters)}")
 
-        if entity is not None and self.get(entity.id_) is None:
+        if entity is not None and not self.rely_on_constraints \
+                and self.get(entity.id_) is None:
             self.logger.error("Entity was not found in database to remove."
-                              " Value received: %s", str(entity))
+                              " Value received: %s", entity)
             raise EntityNotFoundException(debug=f"Entity id_ is {entity.id_}")
 
         return 0
@@ -200,15 +536,15 @@ class GenericDAO(ABC):
         """
         if not isinstance(entity, self.return_class):
             self.logger.error("Entity was not passed as an instance to create."
-                              " Value received: %s", str(entity))
+                              " Value received: %s", entity)
             raise NotEntityException(
                 debug=f"Entity must be a {self.return_class.__name__} object! "
                       f"Entity was a {entity.__class__.__name__} object."
             )
 
-        if self.get(entity.id_) is not None:
+        if not self.rely_on_constraints and self.get(entity.id_) is not None:
             self.logger.error("Entity was found in database before create."
-                              " Value received: %s", str(entity))
+                              " Value received: %s", entity)
             raise DuplicateEntityException(
                 debug=f"{self.return_class.__name__} uuid {entity.id_} "
                       f"already exists in database!"
@@ -232,19 +568,229 @@ class GenericDAO(ABC):
         """
         if not isinstance(entity, self.return_class):
             self.logger.error("Entity was not passed as an instance to update."
-                              " Value received: %s", str(entity))
+                              " Value received: %s", entity)
             raise NotEntityException(
                 debug=f"Entity must be a {self.return_class.__name__} object! "
                       f"Entity was a {entity.__class__.__name__} object."
             )
 
-        if self.get(entity.id_) is None:
+        if not self.rely_on_constraints and self.get(entity.id_) is None:
             self.logger.error("Entity was not found in database to update."
-                              " Value received: %s", str(entity))
+                              " Value received: %s", entity)
             raise EntityNotFoundException(debug=f"Entity id_ is {entity.id_}")
 
         return ""
 
+    def create_many(self, entities: List[Entity],
+                    batch_size: int = None) -> BulkResult:
+        """
+        Creates the entities in the database in batches.
+
+        Entities that are not `return_class` instances or that already \
+        exist in the database are reported in the result errors with \
+        `NotEntityException` and `DuplicateEntityException`, respectively.
+
+        :param entities: The instances to save in the database.
+        :param batch_size: Number of entities per batch. Defaults to \
+        `bulk_batch_size`.
+        :return: The `BulkResult` of the operation.
+        """
+        return self._run_bulk(entities, batch_size, self._create_batch,
+                              expect_existing=False)
+
+    def update_many(self, entities: List[Entity],
+                    batch_size: int = None) -> BulkResult:
+        """
+        Updates the entities in the database in batches.
+
+        Entities that are not `return_class` instances or that don't \
+        exist in the database are reported in the result errors with \
+        `NotEntityException` and `EntityNotFoundException`, respectively.
+
+        :param entities: The entities with updated values.
+        :param batch_size: Number of entities per batch. Defaults to \
+        `bulk_batch_size`.
+        :return: The `BulkResult` of the operation.
+        """
+        return self._run_bulk(entities, batch_size, self._update_batch,
+                              expect_existing=True)
+
+    def remove_many(self, entities: List[Entity],
+                    batch_size: int = None) -> BulkResult:
+        """
+        Removes the entities from the database in batches.
+
+        Entities that are not `return_class` instances or that don't \
+        exist in the database are reported in the result errors with \
+        `NotEntityException` and `EntityNotFoundException`, respectively.
+
+        :param entities: The entities to remove.
+        :param batch_size: Number of entities per batch. Defaults to \
+        `bulk_batch_size`.
+        :return: The `BulkResult` of the operation.
+        """
+        return self._run_bulk(entities, batch_size, self._remove_batch,
+                              expect_existing=True)
+
+    def upsert(self, entity: Entity) -> str:
+        """
+        Creates the entity or updates it if an entity with the same `id_` \
+        already exists, in a single round trip to the database. When \
+        updating, `creation_datetime` is kept.
+
+        :raises NotEntityException: If `entity` is not a `return_class` \
+        instance.
+
+        :param entity: The instance to save in the database.
+        :return: The entity uuid.
+        """
+        if not isinstance(entity, self.return_class):
+            self.logger.error("Entity was not passed as an instance to upsert."
+                              " Value received: %s", entity)
+            raise NotEntityException(
+                debug=f"Entity must be a {self.return_class.__name__} object! "
+                      f"Entity was a {entity.__class__.__name__} object."
+            )
+
+        errors = self._upsert_batch([entity])
+        if errors:
+            raise errors[0]
+
+        return entity.id_
+
+    def upsert_many(self, entities: List[Entity],
+                    batch_size: int = None) -> BulkResult:
+        """
+        Creates or updates the entities in batches, with a single statement \
+        per batch.
+
+        Entities that are not `return_class` instances are reported in the \
+        result errors with `NotEntityException`.
+
+        :param entities: The instances to save in the database.
+        :param batch_size: Number of entities per batch. Defaults to \
+        `bulk_batch_size`.
+        :return: The `BulkResult` of the operation.
+        """
+        return self._run_bulk(entities, batch_size, self._upsert_batch,
+                              expect_existing=None)
+
+    # pylint: disable=R0912
+    def _run_bulk(self, entities: List[Entity], batch_size: Optional[int],
+                  batch_operation: Callable[[List[Entity]],
+                                            Dict[int, Exception]],
+                  expect_existing: Optional[bool]) -> BulkResult:
+        """
+        Splits the entities in batches, validates them and runs \
+        `batch_operation` for the valid entities of each batch.
+
+        :param entities: The entities received in the bulk operation
+        :param batch_size: Number of entities per batch
+        :param batch_operation: Writes a batch and returns the errors \
+        keyed by the position in the batch
+        :param expect_existing: Whether the entities must exist in the \
+        database (update and remove) or not (create). If None, the \
+        existence isn't checked.
+        :return: The `BulkResult` of the operation
+        """
+        batch_size = batch_size or self.bulk_batch_size
+        result = BulkResult()
+
+        for start in range(0, len(entities), batch_size):
+            rows = []
+            for index, entity in enumerate(entities[start:start + batch_size],
+                                           start):
+                if not isinstance(entity, self.return_class):
+                    result.errors[index] = NotEntityException(
+                        debug=f"Entity must be a "
+                              f"{self.return_class.__name__} object! Entity "
+                              f"was a {entity.__class__.__name__} object."
+                    )
+                else:
+                    rows.append((index, entity))
+
+            existing = self._get_existing_ids(
+                [entity.id_ for _, entity in rows]) \
+                if rows and expect_existing is not None else set()
+
+            batch = []
+            for index, entity in rows:
+                if expect_existing and entity.id_ not in existing:
+                    result.errors[index] = EntityNotFoundException(
+                        debug=f"Entity id_ is {entity.id_}")
+                elif expect_existing is False and entity.id_ in existing:
+                    result.errors[index] = DuplicateEntityException(
+                        debug=f"{self.return_class.__name__} uuid "
+                              f"{entity.id_} already exists in database!")
+                else:
+                    batch.append((index, entity))
+
+            if not batch:
+                continue
+
+            try:
+                errors = batch_operation([entity for _, entity in batch])
+            except Exception as err:  # pylint: disable=W0703
+                self.logger.error("Bulk operation failed for a batch of %s "
+                                  "entities.", len(batch), exc_info=True)
+                errors = {position: err for position in range(len(batch))}
+
+            for position, (index, entity) in enumerate(batch):
+                if position in errors:
+                    result.errors[index] = errors[position]
+                else:
+                    result.ids.append(entity.id_)
+
+        self.logger.info("Bulk operation finished with %s entities "
+                         "processed and %s errors.",
+                         len(result.ids), len(result.errors))
+        return result
+
+    def _get_existing_ids(self, ids: List[str]) -> Set[str]:
+        """
+        Returns which of the `ids` exist in the database.
+
+        :param ids: The ids to check
+        :return: The set of ids found in the database
+        """
+        raise NotImplementedError()
+
+    def _create_batch(self, entities: List[Entity]) -> Dict[int, Exception]:
+        """
+        Inserts a batch of validated entities in the database.
+
+        :param entities: The entities to insert
+        :return: The errors keyed by the position of the entity in the batch
+        """
+        raise NotImplementedError()
+
+    def _update_batch(self, entities: List[Entity]) -> Dict[int, Exception]:
+        """
+        Updates a batch of validated entities in the database.
+
+        :param entities: The entities to update
+        :return: The errors keyed by the position of the entity in the batch
+        """
+        raise NotImplementedError()
+
+    def _upsert_batch(self, entities: List[Entity]) -> Dict[int, Exception]:
+        """
+        Creates or updates a batch of validated entities in the database.
+
+        :param entities: The entities to save
+        :return: The errors keyed by the position of the entity in the batch
+        """
+        raise NotImplementedError()
+
+    def _remove_batch(self, entities: List[Entity]) -> Dict[int, Exception]:
+        """
+        Removes a batch of validated entities from the database.
+
+        :param entities: The entities to remove
+        :return: The errors keyed by the position of the entity in the batch
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def close(self):
         """
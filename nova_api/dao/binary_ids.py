@@ -0,0 +1,67 @@
+from typing import Any, List, Sequence, Type
+
+from nova_api.entity import Entity, get_fields_info
+
+
+class BinaryIdsMixin:  # pylint: disable=R0903
+    """Conversion of the ids of the SQL DAOs with `binary_ids`, which \
+    stores the `id_` and the ids of child entities in the database \
+    `UUID_TYPE` instead of `CHAR(32)`.
+
+    Must be mixed with a DAO that defines `database`, `fields` and \
+    `_field_names`.
+    """
+    binary_ids: bool = False
+
+    def _set_uuid_fields(self, return_class: Type[Entity]) -> None:
+        """Finds the fields saved as UUIDs, which are the `id_` and the \
+        child entities if `binary_ids` is set.
+
+        :param return_class: The entity class of the DAO
+        :return: None
+        """
+        fields_info = get_fields_info(return_class)
+        self._uuid_fields = frozenset(
+            name for name in self.fields
+            if name == 'id_' or name in fields_info
+            and isinstance(fields_info[name].field_.type, type)
+            and issubclass(fields_info[name].field_.type, Entity)
+        ) if self.binary_ids else frozenset()
+        self._uuid_indexes = tuple(index for index, name
+                                   in enumerate(self._field_names)
+                                   if name in self._uuid_fields)
+
+    def _encode_id(self, id_: str) -> Any:
+        """Converts an id to the value saved in the database.
+
+        :param id_: The hexadecimal id
+        :return: The database value, which is the same id without \
+        `binary_ids`
+        """
+        return self.database.encode_uuid(id_) if self.binary_ids else id_
+
+    def _get_db_values(self, entity: Entity) -> List[Any]:
+        """Returns the values of `entity` to save in the database, with \
+        the ids converted by `_encode_id`.
+
+        :param entity: The entity to save
+        :return: The values of the DAO fields
+        """
+        values = entity.get_db_values()
+        for index in self._uuid_indexes:
+            values[index] = self.database.encode_uuid(values[index])
+        return values
+
+    def _decode_row(self, result: Sequence[Any],
+                    names: Sequence[str]) -> Sequence[Any]:
+        """Converts the ids of a row read from the database to hex.
+
+        :param result: The row returned by the database
+        :param names: The attribute names of the row values
+        :return: The row with the converted ids
+        """
+        if not self._uuid_fields:
+            return result
+        return [self.database.decode_uuid(value)
+                if name in self._uuid_fields else value
+                for name, value in zip(names, result)]
@@ -1,17 +1,33 @@
-import dataclasses
 from datetime import datetime
-from typing import List, Optional, Type
-
-from nova_api.dao import GenericDAO, camel_to_snake
-from nova_api.entity import Entity
-from nova_api.exceptions import NoRowsAffectedException
+from typing import Any, Callable, ContextManager, Dict, Hashable, \
+    Iterator, List, Optional, Sequence, Set, Tuple, Type
+
+from nova_api.dao import COUNT_ESTIMATED, COUNT_EXACT, COUNT_NONE, \
+    COUNT_WINDOW, GenericDAO, camel_to_snake
+from nova_api.dao.binary_ids import BinaryIdsMixin
+from nova_api.dao.statement_cache import StatementCache
+from nova_api.entity import Entity, get_fields_info
+from nova_api.exceptions import EntityNotFoundException, \
+    NoRowsAffectedException
 from nova_api.persistence import PersistenceHelper
+from nova_api.persistence import request_scope
 from nova_api.persistence.mysql_helper import MySQLHelper
 
 
-class GenericSQLDAO(GenericDAO):
+class GenericSQLDAO(BinaryIdsMixin, GenericDAO):
     """SQL implementation for the GenericDAO interface
+
+    Inside a request of an app with `request_scope.add_request_scope`, the \
+    DAOs created without `database_instance` share one database per type \
+    and connection args, which is closed when the request ends.
+
+    With `binary_ids`, the `id_` and the ids of child entities are stored \
+    in the database `UUID_TYPE`, as `BINARY(16)` in MySQL and `UUID` in \
+    PostgreSQL, instead of `CHAR(32)`. The entities, filters and cursors \
+    keep using the hex ids, which are converted when written and read.
     """
+    statement_cache = StatementCache()
+
     # pylint: disable=R0913
     def __init__(self, database_type: Type[PersistenceHelper] = None,
                  database_instance: PersistenceHelper = None,
@@ -23,44 +39,71 @@ class GenericSQLDAO(GenericDAO):
 
         self.database_type = database_type
         self.database = database_instance
+        self.request_scoped = False
         if self.database_type is None and self.database is None:
             self.database_type = MySQLHelper
 
         self.logger.debug("Started %s with database type as %s, table as %s, "
                           "fields as %s, return_class as %s and prefix as %s",
                           self.__class__.__name__,
-                          str(database_type),
-                          str(table),
-                          str(fields),
+                          database_type,
+                          table,
+                          fields,
                           return_class.__name__,
-                          str(prefix))
-
-        if self.database is None:
+                          prefix)
+
+        if self.database is None and request_scope.is_active():
+            self.logger.debug("Using request database. Extra args: %s. ",
+                              kwargs)
+            self.database = request_scope.get_database(self.database_type,
+                                                       **kwargs)
+            self.request_scoped = True
+        elif self.database is None:
             self.logger.debug("Database connection starting. Extra args: %s. ",
-                              str(kwargs))
+                              kwargs)
             self.database = self.database_type(**kwargs)
             self.logger.debug("Connected to database.")
 
         self.table = table or camel_to_snake(return_class.__name__) + 's'
+        self._set_uuid_fields(return_class)
+        self._statements = GenericSQLDAO.statement_cache.namespace(
+            (self.__class__, self.database.__class__, self.table,
+             tuple(self.fields.items()))
+        )
+
+    def _get_statement(self, key: Hashable,
+                       builder: Callable[[], Any]) -> Any:
+        """Returns the statement `key` for this DAO from the statement cache.
 
-    def get(self, id_: str) -> Optional[Entity]:
+        :param key: The statement identifier
+        :param builder: Function that builds the statement on a cache miss
+        :return: The cached statement
+        """
+        return GenericSQLDAO.statement_cache.get(self._statements, key,
+                                                 builder)
+
+    def get(self, id_: str, fields: List[str] = None) -> Optional[Entity]:
         """Recovers one entity with `id_` from the database.
 
         The `id_` must be the nova_api generated `id_` which is \
-        a 32-char uuid v4.
+        a 32-char uuid v4 or v7.
 
         :raises InvalidIDTypeException: If the UUID is not a string
-        :raises InvalidIDException: If the UUID is not a valid UUID v4 \
+        :raises InvalidIDException: If the UUID is not a valid UUID v4 or v7 \
         without '-'.
+        :raises InvalidFieldsException: If a field is not available in the \
+        DAO.
 
         :param id_: The UUID of the instance to recover
+        :param fields: The attributes to select. Defaults to all fields.
         :return: None if no instance is found or a `return_class` instance \
         if found
         """
         super().get(id_)
 
         self.logger.debug("Get called with valid id %s", id_)
-        _, results = self.get_all(1, 0, {"id_": id_})
+        _, results = self.get_all(1, 0, {"id_": id_}, count_mode=COUNT_NONE,
+                                  fields=fields)
 
         if len(results) == 0:
             self.logger.info("No entries with id %s found. Returning None",
@@ -69,11 +112,15 @@ class GenericSQLDAO(GenericDAO):
 
         self.logger.debug("Found instance with id %s. Result: %s",
                           id_,
-                          str(results[0]))
+                          results[0])
         return results[0]
 
     def get_all(self, length: int = 20, offset: int = 0,
-                filters: dict = None) -> (int, List[Entity]):
+                filters: dict = None,
+                count_mode: str = None,
+                cursor: str = None,
+                fields: List[str] = None,
+                sort: List[str] = None) -> (int, List[Entity]):
         """Recovers all instances that match the given filters up to the
          length specified starting from the offset given.
 
@@ -93,47 +140,339 @@ class GenericSQLDAO(GenericDAO):
         :param filters: A dict with the filters to use. The key must be a \
         valid attribute in the entity and the value may either be an specific \
         value or a list with two elements: an operator and a value, respectively.
-        :return: A tuple with the totol number of entities in the database \
-        and a list of the matched results.
+        :param count_mode: How to compute the total. One of `COUNT_MODES`. \
+        Defaults to the DAO `count_mode`. The window mode is only used if the \
+        database supports it, otherwise an exact count is made.
+        :param cursor: Enables keyset pagination, ignoring the offset. Use \
+        an empty string for the first page and `next_cursor` for the \
+        following ones.
+        :param fields: The attributes to select. Defaults to all fields. \
+        `id_` is always selected and, with a cursor, the `keyset_field` too.
+        :param sort: The attributes to order by, prefixed with `-` for \
+        descending order. Can't be combined with `cursor`.
+        :return: A tuple with the total number of matched entities in the \
+        database and a list of the matched results.
         """
         self.logger.debug("Getting all with filters %s limit %s and offset %s",
-                          str(filters), length, offset)
+                          filters, length, offset)
+
+        total, results, projection = self._select(length, offset, filters,
+                                                  count_mode, cursor, fields,
+                                                  sort)
+
+        return_list = [self._create_entity(result, projection)
+                       for result in results]
+
+        self.logger.debug("Results are %s and the total in the database is %s",
+                          return_list,
+                          total)
+
+        return total, return_list
+
+    def get_all_columnar(self, length: int = 20, offset: int = 0,
+                         filters: dict = None,
+                         count_mode: str = None,
+                         fields: List[str] = None,
+                         sort: List[str] = None) \
+            -> (int, Dict[str, Sequence]):
+        """Recovers the instances that match the given filters as \
+        `get_all`, but returns the values organized by column instead of \
+        creating an entity for each row. Columns of `int` and `float` \
+        fields without null values are returned as `array` instances and \
+        the others as lists of the values read from the database.
+
+        :raises InvalidFieldsException: If a field is not available in the \
+        DAO.
+
+        :param length: The number of items to select
+        :param offset: The number of items to skip before starting to select
+        :param filters: A dict with the filters to use, as in `get_all`
+        :param count_mode: How to compute the total, as in `get_all`
+        :param fields: The attributes to select. Defaults to all fields.
+        :param sort: The attributes to order by, as in `get_all`
+        :return: A tuple with the total number of matched entities in the \
+        database and a dict with the values of each selected attribute.
+        """
+        self.logger.debug("Getting columns with filters %s limit %s and "
+                          "offset %s", filters, length, offset)
+
+        total, results, projection = self._select(length, offset, filters,
+                                                  count_mode, None, fields,
+                                                  sort)
+        names = projection or self._field_names
+
+        results = [self._decode_row(result, names) for result in results]
+        return total, self._build_columns(
+            names, list(zip(*results)) or [()] * len(names))
+
+    # pylint: disable=R0912,R0913,R0914
+    def _select(self, length: int, offset: int, filters: Optional[dict],
+                count_mode: Optional[str], cursor: Optional[str],
+                fields: Optional[List[str]], sort: Optional[List[str]]) \
+            -> Tuple[Optional[int], List[List[Any]], Optional[List[str]]]:
+        """Runs the select query of `get_all` and computes the total.
+
+        :param length: The number of items to select
+        :param offset: The number of items to skip before starting to select
+        :param filters: The filters received in `get_all`
+        :param count_mode: The count mode received in `get_all`
+        :param cursor: The cursor received in `get_all`
+        :param fields: The fields received in `get_all`
+        :param sort: The sort received in `get_all`
+        :return: A tuple with the total, the rows returned by the database \
+        and the selected attributes or None if all fields were selected
+        """
+        projection = self._get_projection(
+            fields, *([self.keyset_field] if cursor is not None else []))
+        columns = ', '.join(self.fields.values()) if projection is None \
+            else ', '.join([self.fields[field] for field in projection])
+        projection_key = projection and tuple(projection)
+        sort_ = self._get_sort(sort, cursor)
+
+        count_mode = self._get_count_mode(count_mode)
+        keyset = None
+        if cursor is not None:
+            keyset = self._decode_cursor(cursor)
+            if keyset is not None:
+                keyset = (keyset[0], self._encode_id(keyset[1]))
+            if count_mode == COUNT_WINDOW:
+                self.logger.debug("Window count would only count the rows "
+                                  "after the cursor. Using exact count.")
+                count_mode = COUNT_EXACT
+        if count_mode == COUNT_WINDOW \
+                and not self.database.SUPPORTS_WINDOW_COUNT:
+            self.logger.debug("Window count not supported by %s. "
+                              "Using exact count.",
+                              self.database.__class__.__name__)
+            count_mode = COUNT_EXACT
 
         filters_, query_params = ('', []) \
             if not filters \
             else self._generate_filters(filters)
-
-        query = self.database.SELECT_QUERY.format(
-            fields=', '.join(self.fields.values()),
-            table=self.table,
-            filters=filters_
-        )
+        order_by = '' if sort_ is None else self._get_statement(
+            ("order_by", sort_), lambda: self._build_order_by(sort_))
+        sorted_filters = f"{filters_} {order_by}" if order_by else filters_
+
+        if cursor is not None:
+            query = self._get_statement(
+                ("select_keyset", filters_, keyset is not None,
+                 projection_key),
+                lambda: self._build_keyset_query(filters_,
+                                                 keyset is not None,
+                                                 columns)
+            )
+            select_params = [*query_params, *(keyset or ()), length]
+        elif count_mode == COUNT_WINDOW:
+            query = self._get_statement(
+                ("select_window_count", filters_, projection_key, sort_),
+                lambda: self.database.SELECT_WINDOW_COUNT_QUERY.format(
+                    fields=columns,
+                    table=self.table,
+                    filters=sorted_filters
+                )
+            )
+            select_params = [*query_params, length, offset]
+        else:
+            query = self._get_statement(
+                ("select", filters_, projection_key, sort_),
+                lambda: self.database.SELECT_QUERY.format(
+                    fields=columns,
+                    table=self.table,
+                    filters=sorted_filters
+                )
+            )
+            select_params = [*query_params, length, offset]
 
         self.logger.debug("Running query in database %s with params %s",
                           query,
-                          str([*query_params, length, offset]))
-        self.database.query(query, [*query_params, length, offset])
+                          select_params)
+        self.database.query(query, select_params)
         results = self.database.get_results()
 
         if results is None:
             self.logger.info("No results found for query %s, %s in get_all. "
-                             "Returning none", query, str([*query_params,
-                                                           length, offset]))
-            return 0, []
+                             "Returning none", query, select_params)
+            if count_mode == COUNT_NONE:
+                return None, [], projection
+            if count_mode == COUNT_WINDOW and offset > 0:
+                # A page past the end has no row with the window count
+                return self._count_exact(filters_, query_params), [], \
+                    projection
+            return 0, [], projection
+
+        if count_mode == COUNT_WINDOW:
+            total = results[0][-1]
+            results = [result[:-1] for result in results]
+        elif count_mode == COUNT_EXACT:
+            total = self._count_exact(filters_, query_params)
+        elif count_mode == COUNT_ESTIMATED:
+            total = self._count_estimated()
+        else:
+            total = None
+
+        return total, results, projection
+
+    def iter_all(self, filters: dict = None, batch_size: int = 1000,
+                 fields: List[str] = None) -> Iterator[Entity]:
+        """Iterates over all instances that match the given filters, \
+        fetching them in batches of `batch_size` with a server-side cursor \
+        (an unbuffered cursor in MySQL and a named cursor in PostgreSQL).
+
+        The arguments are validated and the query runs when `iter_all` is \
+        called, so those errors are raised before any entity is consumed. \
+        No other operation should be made with the DAO until the iteration \
+        finishes or the generator is closed.
+
+        :raises InvalidFieldsException: If a field is not available in the \
+        DAO.
+        :raises RuntimeError: If the query fails.
+
+        :param filters: A dict with the filters to use, as in `get_all`
+        :param batch_size: The number of entities fetched at a time
+        :param fields: The attributes to select. Defaults to all fields.
+        :return: A generator of `return_class` instances
+        """
+        projection = self._get_projection(fields)
+        filters_, query_params = ('', []) \
+            if not filters \
+            else self._generate_filters(filters)
 
-        return_list = [self.return_class(*result) for result in results]
+        query = self._get_statement(
+            ("select_all", filters_, projection and tuple(projection)),
+            lambda: self.database.SELECT_ALL_QUERY.format(
+                fields=', '.join(self.fields.values()) if projection is None
+                else ', '.join([self.fields[field] for field in projection]),
+                table=self.table,
+                filters=filters_
+            )
+        )
 
-        query_total = self.database.QUERY_TOTAL_COLUMN.format(
+        self.logger.debug("Iterating query in database %s with params %s "
+                          "and batch size %s", query, query_params,
+                          batch_size)
+        batches = self.database.iter_query(query, query_params, batch_size)
+        # Runs the query and fetches the first batch right away
+        first_batch = next(batches, [])
+        return self._iter_entities(first_batch, batches, projection)
+
+    def _iter_entities(self, first_batch: List[List[Any]],
+                       batches: Iterator[List[List[Any]]],
+                       projection: Optional[List[str]]) -> Iterator[Entity]:
+        """Creates the entities of the batches returned by `iter_query`.
+
+        :param first_batch: The batch already fetched by `iter_all`
+        :param batches: The generator of the following batches
+        :param projection: The selected attributes or None if all fields \
+        were selected
+        :return: A generator of `return_class` instances
+        """
+        try:
+            for result in first_batch:
+                yield self._create_entity(result, projection)
+            for rows in batches:
+                for result in rows:
+                    yield self._create_entity(result, projection)
+        finally:
+            batches.close()
+
+    def _create_entity(self, result: List[Any],
+                       projection: Optional[List[str]]) -> Entity:
+        """Instantiates a `return_class` instance from a database row.
+
+        :param result: The row returned by the database
+        :param projection: The selected attributes or None if all fields \
+        were selected
+        :return: A `return_class` instance
+        """
+        result = self._decode_row(result, projection or self._field_names)
+        if self.trusted_hydration:
+            return self.return_class.from_db(result,
+                                             projection or self._field_names)
+        if projection is None:
+            return self.return_class(*result)
+        return self.return_class(**dict(zip(projection, result)))
+
+    def _build_order_by(self, sort: Tuple[Tuple[str, bool], ...]) -> str:
+        """Builds the ORDER BY clause for `sort`, warning about columns \
+        without a supporting index if `check_sort_indexes` is set.
+
+        :param sort: The sort returned by `_get_sort`
+        :return: The ORDER BY clause
+        """
+        if self.check_sort_indexes:
+            self.database.query(self.database.QUERY_INDEXED_COLUMNS,
+                                [self.table])
+            self._warn_unindexed_sort(
+                sort,
+                {result[0] for result in self.database.get_results() or []})
+
+        return self.database.ORDER_BY.format(
+            sort=', '.join([f"{self.fields[field]} "
+                            f"{'DESC' if descending else 'ASC'}"
+                            for field, descending in sort]))
+
+    def _build_keyset_query(self, filters_: str, seek: bool,
+                            columns: str) -> str:
+        """Builds the select query for keyset pagination.
+
+        :raises ValueError: If `keyset_field` is not a field of the DAO.
+
+        :param filters_: The where statement generated by `_generate_filters`
+        :param seek: Whether the query should start after a cursor
+        :param columns: The columns to select
+        :return: The select query ordered by `keyset_field` and `id_`
+        """
+        if self.keyset_field not in self.fields:
+            raise ValueError(
+                f"Keyset field {self.keyset_field} not available "
+                f"in {self.return_class.__name__}."
+            )
+        sort_column = self.fields[self.keyset_field]
+        id_column = self.fields['id_']
+
+        if seek:
+            seek_filter = self.database.KEYSET_FILTER.format(
+                sort_column=sort_column,
+                id_column=id_column)
+            filters_ = f"{filters_} AND {seek_filter}" if filters_ \
+                else self.database.FILTERS.format(filters=seek_filter)
+
+        return self.database.SELECT_KEYSET_QUERY.format(
+            fields=columns,
             table=self.table,
-            column=self.fields['id_'])
+            filters=filters_,
+            sort_column=sort_column,
+            id_column=id_column)
 
-        self.database.query(query_total)
-        total = self.database.get_results()[0][0]
-        self.logger.debug("Results are %s and the total in the database is %s",
-                          str(return_list),
-                          total)
+    def _count_exact(self, filters_: str, query_params: List) -> int:
+        """Counts the rows that match the filters.
 
-        return total, return_list
+        :param filters_: The where statement generated by `_generate_filters`
+        :param query_params: The params for the where statement
+        :return: The number of rows that match the filters
+        """
+        query_total = self._get_statement(
+            ("total", filters_),
+            lambda: self.database.QUERY_TOTAL_COLUMN.format(
+                table=self.table,
+                column=self.fields['id_'],
+                filters=filters_)
+        )
+
+        self.database.query(query_total, query_params)
+        return self.database.get_results()[0][0]
+
+    def _count_estimated(self) -> int:
+        """Returns the estimated number of rows in the table from the \
+        database statistics.
+
+        :return: The estimated number of rows in the table
+        """
+        self.database.query(self.database.QUERY_ESTIMATED_TOTAL, [self.table])
+        results = self.database.get_results()
+        if results is None:
+            return 0
+        return max(int(results[0][0] or 0), 0)
 
     def remove(self, entity: Entity = None,
                filters: dict = None) -> int:
@@ -170,16 +509,24 @@ class GenericSQLDAO(GenericDAO):
         elif filters is not None:
             filters_, query_params = self._generate_filters(filters)
 
-        query = self.database.DELETE_QUERY.format(
-            table=self.table,
-            column=self.fields['id_'],
-            filters=filters_)
+        query = self._get_statement(
+            ("delete", filters_),
+            lambda: self.database.DELETE_QUERY.format(
+                table=self.table,
+                column=self.fields['id_'],
+                filters=filters_)
+        )
 
         self.logger.debug("Running remove query in database: %s and params %s",
                           query,
                           query_params)
         row_count, _ = self.database.query(query, query_params)
         if row_count == 0:
+            if entity is not None and self.rely_on_constraints:
+                self.logger.error("Entity was not found in database to "
+                                  "remove. Value received: %s", entity)
+                raise EntityNotFoundException(
+                    debug=f"Entity id_ is {entity.id_}")
             self.logger.error("No rows were affected in database during "
                               "remove!")
             raise NoRowsAffectedException()
@@ -203,12 +550,15 @@ class GenericSQLDAO(GenericDAO):
         """
         super().create(entity)
 
-        ent_values = entity.get_db_values()
+        ent_values = self._get_db_values(entity)
 
-        query = self.database.INSERT_QUERY.format(
-            table=self.table,
-            fields=', '.join(self.fields.values()),
-            values=', '.join(['%s'] * len(ent_values)))
+        query = self._get_statement(
+            ("insert", len(ent_values)),
+            lambda: self.database.INSERT_QUERY.format(
+                table=self.table,
+                fields=', '.join(self.fields.values()),
+                values=', '.join(['%s'] * len(ent_values)))
+        )
 
         self.logger.debug("Running query in database: %s and params %s",
                           query,
@@ -240,23 +590,32 @@ class GenericSQLDAO(GenericDAO):
 
         entity.last_modified_datetime = datetime.now()
 
-        ent_values = entity.get_db_values()
-
-        query = self.database.UPDATE_QUERY.format(
-            table=self.table,
-            fields=', '.join(
-                [field + '=%s' for field in
-                 self.fields.values()]),
-            column=self.fields['id_']
+        ent_values = self._get_db_values(entity)
+
+        query = self._get_statement(
+            "update",
+            lambda: self.database.UPDATE_QUERY.format(
+                table=self.table,
+                fields=', '.join(
+                    [field + '=%s' for field in
+                     self.fields.values()]),
+                column=self.fields['id_']
+            )
         )
 
+        params = ent_values + [self._encode_id(entity.id_)]
         self.logger.debug("Running query in database: %s and params %s",
-                          query,
-                          ent_values + [entity.id_])
-        row_count, _ = self.database.query(query,
-                                           ent_values + [entity.id_])
+                          query, params)
+        row_count, _ = self.database.query(query, params)
 
         if row_count == 0:
+            # MySQL reports changed rows, so an existing row may not be
+            # affected if its values didn't change.
+            if self.rely_on_constraints and self.get(entity.id_) is None:
+                self.logger.error("Entity was not found in database to "
+                                  "update. Value received: %s", entity)
+                raise EntityNotFoundException(
+                    debug=f"Entity id_ is {entity.id_}")
             self.logger.error("No rows were affected in database during "
                               "update!")
             raise NoRowsAffectedException()
@@ -264,6 +623,185 @@ class GenericSQLDAO(GenericDAO):
         self.logger.info("Entity updated to %s", entity)
         return entity.id_
 
+    def _get_existing_ids(self, ids: List[str]) -> Set[str]:
+        """Returns which of the `ids` exist in the database with a single \
+        query.
+
+        :param ids: The ids to check
+        :return: The set of ids found in the database
+        """
+        query = self._get_statement(
+            ("existing_ids", len(ids)),
+            lambda: self.database.SELECT_QUERY.format(
+                fields=self.fields['id_'],
+                table=self.table,
+                filters=self._build_in_filter(len(ids)))
+        )
+        self.database.query(query, [*map(self._encode_id, ids), len(ids), 0])
+        results = self.database.get_results()
+        return {self._decode_row(result, ('id_',))[0]
+                for result in results or []}
+
+    def _create_batch(self, entities: List[Entity]) -> Dict[int, Exception]:
+        """Inserts the entities with a single multi-row INSERT, which is \
+        committed once. If it fails, the entities are inserted one at a \
+        time, so only the rows that fail are reported.
+
+        :raises NoRowsAffectedException: If not all rows were inserted.
+
+        :param entities: The entities to insert
+        :return: The errors of the rows that failed, keyed by their position
+        """
+        values = [self._get_db_values(entity) for entity in entities]
+
+        query = self._get_statement(
+            ("insert_many", len(values), len(values[0])),
+            lambda: self.database.INSERT_MANY_QUERY.format(
+                table=self.table,
+                fields=', '.join(self.fields.values()),
+                values=', '.join(
+                    ['(' + ', '.join(['%s'] * len(values[0])) + ')']
+                    * len(values)))
+        )
+
+        self.logger.debug("Running bulk insert of %s rows in database: %s",
+                          len(values), query)
+        try:
+            row_count, _ = self.database.query(
+                query, [value for row in values for value in row])
+        except Exception:  # pylint: disable=W0703
+            if len(entities) == 1:
+                raise
+            self.logger.warning("Bulk insert of %s rows failed. Inserting "
+                                "them one at a time.", len(values),
+                                exc_info=True)
+            errors = {}
+            for position, entity in enumerate(entities):
+                try:
+                    self._create_batch([entity])
+                except Exception as err:  # pylint: disable=W0703
+                    errors[position] = err
+            return errors
+
+        if row_count != len(values):
+            self.logger.error("Only %s of %s rows were inserted in "
+                              "database during create_many!",
+                              row_count, len(values))
+            raise NoRowsAffectedException()
+
+        return {}
+
+    def _update_batch(self, entities: List[Entity]) -> Dict[int, Exception]:
+        """Updates the entities with a single `executemany`, which is \
+        committed once.
+
+        :param entities: The entities to update
+        :return: An empty dict, as the batch is updated or fails as a whole
+        """
+        params_list = []
+        for entity in entities:
+            entity.last_modified_datetime = datetime.now()
+            params_list.append(self._get_db_values(entity)
+                               + [self._encode_id(entity.id_)])
+
+        query = self._get_statement(
+            "update",
+            lambda: self.database.UPDATE_QUERY.format(
+                table=self.table,
+                fields=', '.join(
+                    [field + '=%s' for field in
+                     self.fields.values()]),
+                column=self.fields['id_']
+            )
+        )
+
+        self.logger.debug("Running bulk update of %s rows in database: %s",
+                          len(params_list), query)
+        row_count, _ = self.database.query_many(query, params_list)
+
+        if row_count != len(params_list):
+            self.logger.warning("%s of %s rows were affected in database "
+                                "during update_many.",
+                                row_count, len(params_list))
+
+        return {}
+
+    def _upsert_batch(self, entities: List[Entity]) -> Dict[int, Exception]:
+        """Creates or updates the entities with a single multi-row \
+        INSERT that updates the rows whose `id_` already exists. The \
+        `id_` and `creation_datetime` of existing rows are kept. If the \
+        batch has the same `id_` more than once, the last entity is saved, \
+        as PostgreSQL can't update a row twice in the same INSERT.
+
+        :param entities: The entities to save
+        :return: An empty dict, as the batch is saved or fails as a whole
+        """
+        rows = {}
+        for entity in entities:
+            entity.last_modified_datetime = datetime.now()
+            rows[entity.id_] = self._get_db_values(entity)
+        values = list(rows.values())
+
+        query = self._get_statement(
+            ("upsert", len(values), len(values[0])),
+            lambda: self.database.UPSERT_QUERY.format(
+                table=self.table,
+                fields=', '.join(self.fields.values()),
+                values=', '.join(
+                    ['(' + ', '.join(['%s'] * len(values[0])) + ')']
+                    * len(values)),
+                column=self.fields['id_'],
+                updates=', '.join(
+                    [self.database.UPSERT_UPDATE.format(field=column)
+                     for field, column in self.fields.items()
+                     if field not in ('id_', 'creation_datetime')]))
+        )
+
+        self.logger.debug("Running upsert of %s rows in database: %s",
+                          len(values), query)
+        self.database.query(query,
+                            [value for row in values for value in row])
+
+        return {}
+
+    def _remove_batch(self, entities: List[Entity]) -> Dict[int, Exception]:
+        """Removes the entities with a single DELETE, which is \
+        committed once.
+
+        :param entities: The entities to remove
+        :return: An empty dict, as the batch is removed or fails as a whole
+        """
+        query = self._get_statement(
+            ("delete_many", len(entities)),
+            lambda: self.database.DELETE_QUERY.format(
+                table=self.table,
+                column=self.fields['id_'],
+                filters=self._build_in_filter(len(entities)))
+        )
+
+        self.logger.debug("Running bulk remove of %s rows in database: %s",
+                          len(entities), query)
+        row_count, _ = self.database.query(
+            query, [self._encode_id(entity.id_) for entity in entities])
+
+        if row_count != len(entities):
+            self.logger.warning("%s of %s rows were affected in database "
+                                "during remove_many.",
+                                row_count, len(entities))
+
+        return {}
+
+    def _build_in_filter(self, amount: int) -> str:
+        """Builds a where statement that matches `amount` ids.
+
+        :param amount: The number of ids to match
+        :return: The where statement
+        """
+        return self.database.FILTERS.format(
+            filters=self.database.IN_FILTER.format(
+                column=self.fields['id_'],
+                values=', '.join(['%s'] * amount)))
+
     def create_table_if_not_exists(self) -> None:
         """Creates the table in the database based on the `return_class` \
         attributes. The types used in the database will be inferred through \
@@ -275,24 +813,26 @@ class GenericSQLDAO(GenericDAO):
         primary_keys = []
 
         self.logger.info("Starting create table processing.")
-        for field in dataclasses.fields(self.return_class):
-            self.logger.debug("Processing field %s", field)
-            if field.metadata.get("database") is False:
+        for field in get_fields_info(self.return_class).values():
+            self.logger.debug("Processing field %s", field.field_)
+            if not field.database:
                 self.logger.debug("Field '%s' not included in database table, "
                                   "skipping.", field.name)
                 continue
 
-            type_ = field.metadata.get('type') \
-                    or self.database.predict_db_type(field.type)
+            type_ = self.database.UUID_TYPE \
+                if field.name in self._uuid_fields \
+                else field.db_type \
+                or self.database.predict_db_type(field.field_.type)
             self.logger.debug("'%s' type defined as '%s'", field.name, type_)
 
-            default = field.metadata.get('default') or "NULL"
+            default = field.db_default or "NULL"
 
             field_name = self.fields.get(field.name)
             self.logger.debug("'%s' name defined as '%s'",
                               field.name, field_name)
 
-            if field.metadata.get("primary_key"):
+            if field.primary_key:
                 self.logger.debug("'%s' added as primary key", field_name)
                 primary_keys.append(str(field_name))
                 if default == "NULL":
@@ -349,9 +889,36 @@ class GenericSQLDAO(GenericDAO):
 
         query_params = [item[1] if isinstance(item, list) else item
                         for item in filters.values()]
+        if self._uuid_fields:
+            query_params = [self._encode_id(param)
+                            if property_ in self._uuid_fields else param
+                            for property_, param
+                            in zip(filters, query_params)]
+
+        shape = tuple((property_, value[0] if isinstance(value, list)
+                       else '=')
+                      for property_, value in filters.items())
+
+        filters_ = self._get_statement(
+            ("filters", shape),
+            lambda: self._build_filters(shape)
+        )
+
+        return filters_, query_params
+
+    def _build_filters(self, shape: Tuple[Tuple[str, str], ...]) -> str:
+        """
+        Validates a filter shape and builds the where statement for it.
+
+        :raises ValueError: If a property is not in `fields` or a \
+        comparator is not allowed by the database.
 
+        :param shape: Tuple of (property, comparator) pairs, in the order \
+        the filters were received.
+        :return: The where statement
+        """
         field_keys = self.fields.keys()
-        for property_, value in filters.items():
+        for property_, comparator in shape:
             if property_ not in field_keys:
                 self.logger.error("Property %s not available in %s for "
                                   "get_all.",
@@ -361,34 +928,48 @@ class GenericSQLDAO(GenericDAO):
                     f"Property {property_} not available "
                     f"in {self.return_class.__name__}."
                 )
-            if isinstance(value, list) \
-                    and value[0] not in self.database.ALLOWED_COMPARATORS:
+            if comparator not in self.database.ALLOWED_COMPARATORS:
                 self.logger.error("Comparator %s not available in %s for "
                                   "get_all.",
-                                  value[0],
+                                  comparator,
                                   self.return_class.__name__)
                 raise ValueError(
-                    f"Comparator {value[0]} not allowed "
+                    f"Comparator {comparator} not allowed "
                     f"for {self.return_class.__name__}"
                 )
 
         filters_for_query = [
-            self.database.FILTER.format(
-                column=self.fields[filter_],
-                comparator=(filters[filter_][0]
-                            if isinstance(filters[filter_], list)
-                            else '='))
-            for filter_ in filters.keys()
+            self.database.FILTER.format(column=self.fields[property_],
+                                        comparator=comparator)
+            for property_, comparator in shape
         ]
-        filters_ = self.database.FILTERS.format(
+        return self.database.FILTERS.format(
             filters=' AND '.join(filters_for_query))
 
-        return filters_, query_params
+    def transaction(self) -> ContextManager[PersistenceHelper]:
+        """Runs the operations of the block in a single database \
+        transaction, committed once at the end. Other DAOs created with \
+        `database_instance=dao.database` share the connection and take part \
+        in the transaction.
+
+        Example:
+            >>> phone_dao = PhoneDAO(database_instance=contact_dao.database)
+            >>> with contact_dao.transaction():
+            ...     contact_dao.create(contact)
+            ...     phone_dao.create_many(phones)
+
+        :return: A context manager that commits the transaction when the \
+        block ends or rolls it back if an exception is raised
+        """
+        return self.database.transaction()
 
     def close(self) -> None:
-        """Closes the connection to the database
+        """Closes the connection to the database. Databases shared in the \
+        request scope are kept open until the request ends.
 
         :return: None
         """
+        if self.request_scoped:
+            return
         self.logger.debug("Closing connection to database.")
         self.database.close()
@@ -1,17 +1,26 @@
 from datetime import date, datetime, time
 from os import environ
-from typing import Any, List, Optional, Type
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, \
+    Tuple, Type
 from urllib.parse import quote_plus
 
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 from nova_api import GenericDAO
-from nova_api.dao import camel_to_snake
-from nova_api.entity import Entity
+from nova_api.dao import COUNT_ESTIMATED, COUNT_NONE, camel_to_snake
+from nova_api.entity import Entity, get_fields_info
+from nova_api.exceptions import DuplicateEntityException, \
+    EntityNotFoundException, InvalidCursorException
+
+DUPLICATE_KEY_ERROR = 11000
 
 
 class MongoDAO(GenericDAO):
     """Mongo implementation for the GenericDAO interface
+
+    When `rely_on_constraints` is True, duplicates are only detected if the \
+    collection has a unique index on the `id_` field.
     """
     # pylint: disable=R0913
     def __init__(self, database=environ.get('DB_NAME', 'default'),
@@ -41,50 +50,68 @@ class MongoDAO(GenericDAO):
                           or camel_to_snake(return_class.__name__) + 's'
         self.cursor = self.database[self.collection]
 
-    def get(self, id_: str) -> Optional[Entity]:
+    def get(self, id_: str, fields: List[str] = None) -> Optional[Entity]:
         """
         Recovers and entity with `id_` from the database. The id_ must be the \
-        nova_api generated id_ which is a 32-char uuid v4.
+        nova_api generated id_ which is a 32-char uuid v4 or v7.
 
         :raises InvalidIDTypeException: If the UUID is not a string
-        :raises InvalidIDException: If the UUID is not a valid UUID v4 \
+        :raises InvalidIDException: If the UUID is not a valid UUID v4 or v7 \
         without '-'.
+        :raises InvalidFieldsException: If a field is not available in the \
+        DAO.
 
         :param id_: The UUID of the instance to recover
+        :param fields: The attributes to select. Defaults to all fields.
         :return: None if no instance is found or a `return_class` instance \
         if found
         """
         super().get(id_)
 
         self.logger.debug("Get called with valid id %s", id_)
-        result = self.cursor.find_one({self.fields['id_']: id_})
-        result_object = self._create_entity_from_result(result)
+        projection = self._get_projection(fields)
+        if projection is None:
+            result = self.cursor.find_one({self.fields['id_']: id_})
+        else:
+            result = self.cursor.find_one(
+                {self.fields['id_']: id_},
+                projection=self._generate_projection(projection))
+        result_object = self._create_entity_from_result(result, projection)
 
         self.logger.debug("Found instance with id %s. Result: %s",
                           id_,
-                          str(result_object))
+                          result_object)
 
         return result_object
 
-    def _create_entity_from_result(self, result: dict) -> Optional[Entity]:
+    def _create_entity_from_result(self, result: dict,
+                                   projection: List[str] = None) \
+            -> Optional[Entity]:
         """
         Instantiates a `return_class` instance from the dict returned \
         from Mongo. Returns None if no dict
 
         :param result: Dictionary returned from Mongo
+        :param projection: The attributes that were selected. Defaults to \
+        all fields.
         :return: A `return_class` instance
         """
         if not result:
             return None
 
-        entity = {}
-        for prop, field in self.fields.items():
-            entity[prop] = result.pop(field, None)
+        names = projection or self._field_names
+        values = [result.pop(self.fields[prop], None) for prop in names]
 
-        return self.return_class(**entity)
+        if self.trusted_hydration:
+            return self.return_class.from_db(values, names)
+        return self.return_class(**dict(zip(names, values)))
 
+    # pylint: disable=R0914
     def get_all(self, length: int = 20, offset: int = 0,
-                filters=None) -> (int, List[Entity]):
+                filters=None, count_mode: str = None,
+                cursor: str = None,
+                fields: List[str] = None,
+                sort: List[str] = None) -> (int, List[Entity]):
         """
                 Recovers all instances that match the given filters up to
                 the length \
@@ -110,29 +137,208 @@ class MongoDAO(GenericDAO):
         valid attribute in the entity and the value may either be an specific \
         value or a list with two elements: an operator and a value,
         respectively.
-        :return: A tuple with the totol number of entities in the database \
-        and a list of the matched results.
+        :param count_mode: How to compute the total. One of `COUNT_MODES`. \
+        Defaults to the DAO `count_mode`. MongoDB has no window count, so \
+        the window mode makes an exact count.
+        :param cursor: Enables keyset pagination, ignoring the offset. Use \
+        an empty string for the first page and `next_cursor` for the \
+        following ones.
+        :param fields: The attributes to select. Defaults to all fields. \
+        `id_` is always selected and, with a cursor, the `keyset_field` too.
+        :param sort: The attributes to order by, prefixed with `-` for \
+        descending order. Can't be combined with `cursor`.
+        :return: A tuple with the total number of matched entities in the \
+        database and a list of the matched results.
         """
+        count_mode = self._get_count_mode(count_mode)
         if filters is None:
             filters = {}
         self.logger.debug("Getting all with filters %s limit %s and offset %s",
                           filters, length, offset)
 
-        result_cur = self.cursor.find(self._generate_filters(filters),
-                                      limit=length, skip=offset)
+        projection = self._get_projection(
+            fields, *([self.keyset_field] if cursor is not None else []))
+        find_options = {} if projection is None \
+            else {"projection": self._generate_projection(projection)}
+        sort_ = self._get_sort(sort, cursor)
+        if sort_ is not None:
+            find_options["sort"] = self._generate_sort(sort_)
+
+        prepared_filters = self._generate_filters(filters)
+        if cursor is None:
+            result_cur = self.cursor.find(prepared_filters,
+                                          limit=length, skip=offset,
+                                          **find_options)
+        else:
+            result_cur = self.cursor.find(
+                self._generate_keyset_filters(prepared_filters,
+                                              self._decode_cursor(cursor)),
+                sort=[(self.fields[self.keyset_field], ASCENDING),
+                      (self.fields["id_"], ASCENDING)],
+                limit=length, **find_options)
 
         results = []
         for result in result_cur:
-            results.append(self._create_entity_from_result(result))
+            results.append(self._create_entity_from_result(result,
+                                                           projection))
 
         if not results:
             self.logger.info("No results found in get_all. Returning none")
             return 0, []
 
-        amount = self.cursor.count_documents({})
+        if count_mode == COUNT_NONE:
+            amount = None
+        elif count_mode == COUNT_ESTIMATED:
+            amount = self.cursor.estimated_document_count()
+        else:
+            amount = self.cursor.count_documents(prepared_filters)
 
         return amount, results
 
+    # pylint: disable=R0914
+    def get_all_columnar(self, length: int = 20, offset: int = 0,
+                         filters: dict = None,
+                         count_mode: str = None,
+                         fields: List[str] = None,
+                         sort: List[str] = None) \
+            -> (int, Dict[str, Sequence]):
+        """
+        Recovers the instances that match the given filters as `get_all`, \
+        but returns the values organized by column instead of creating an \
+        entity for each document. Columns of `int` and `float` fields \
+        without null values are returned as `array` instances and the \
+        others as lists of the values read from MongoDB.
+
+        :raises InvalidFieldsException: If a field is not available in the \
+        DAO.
+
+        :param length: The number of items to select
+        :param offset: The number of items to skip before starting to select
+        :param filters: A dict with the filters to use, as in `get_all`
+        :param count_mode: How to compute the total, as in `get_all`
+        :param fields: The attributes to select. Defaults to all fields.
+        :param sort: The attributes to order by, as in `get_all`
+        :return: A tuple with the total number of matched entities in the \
+        database and a dict with the values of each selected attribute.
+        """
+        count_mode = self._get_count_mode(count_mode)
+        self.logger.debug("Getting columns with filters %s limit %s and "
+                          "offset %s", filters, length, offset)
+
+        projection = self._get_projection(fields)
+        find_options = {} if projection is None \
+            else {"projection": self._generate_projection(projection)}
+        sort_ = self._get_sort(sort)
+        if sort_ is not None:
+            find_options["sort"] = self._generate_sort(sort_)
+
+        names = projection or self._field_names
+        db_names = [self.fields[prop] for prop in names]
+        columns = [[] for _ in names]
+
+        prepared_filters = self._generate_filters(filters or {})
+        for result in self.cursor.find(prepared_filters, limit=length,
+                                       skip=offset, **find_options):
+            for column, db_name in zip(columns, db_names):
+                column.append(result.get(db_name))
+
+        if not columns[0]:
+            self.logger.info("No results found in get_all_columnar.")
+            return 0, self._build_columns(names, columns)
+
+        if count_mode == COUNT_NONE:
+            amount = None
+        elif count_mode == COUNT_ESTIMATED:
+            amount = self.cursor.estimated_document_count()
+        else:
+            amount = self.cursor.count_documents(prepared_filters)
+
+        return amount, self._build_columns(names, columns)
+
+    def iter_all(self, filters: dict = None, batch_size: int = 1000,
+                 fields: List[str] = None) -> Iterator[Entity]:
+        """
+        Iterates over all instances that match the given filters. The \
+        MongoDB cursor fetches the documents in batches of `batch_size`.
+
+        The arguments are validated and the first batch is fetched when \
+        `iter_all` is called, so those errors are raised before any entity \
+        is consumed.
+
+        :raises InvalidFieldsException: If a field is not available in the \
+        DAO.
+
+        :param filters: A dict with the filters to use, as in `get_all`
+        :param batch_size: The number of entities fetched at a time
+        :param fields: The attributes to select. Defaults to all fields.
+        :return: A generator of `return_class` instances
+        """
+        projection = self._get_projection(fields)
+        find_options = {} if projection is None \
+            else {"projection": self._generate_projection(projection)}
+
+        result_cur = self.cursor.find(self._generate_filters(filters or {}),
+                                      batch_size=batch_size, **find_options)
+        documents = iter(result_cur)
+        try:
+            # Sends the query and fetches the first batch right away
+            first = next(documents, None)
+        except Exception:
+            result_cur.close()
+            raise
+        return self._iter_entities(first, documents, result_cur, projection)
+
+    def _iter_entities(self, first: Optional[dict], documents: Iterator[dict],
+                       result_cur,
+                       projection: Optional[List[str]]) -> Iterator[Entity]:
+        """Creates the entities of the documents of a cursor.
+
+        :param first: The document already fetched by `iter_all` or None \
+        if there are no documents
+        :param documents: The iterator of the following documents
+        :param result_cur: The MongoDB cursor, closed at the end
+        :param projection: The selected attributes or None if all fields \
+        were selected
+        :return: A generator of `return_class` instances
+        """
+        try:
+            if first is None:
+                return
+            yield self._create_entity_from_result(first, projection)
+            for result in documents:
+                yield self._create_entity_from_result(result, projection)
+        finally:
+            result_cur.close()
+
+    def _generate_projection(self, projection: List[str]) -> dict:
+        """
+        Converts the selected attributes to a MongoDB projection.
+
+        :param projection: The attributes returned by `_get_projection`
+        :return: The projection dict to use when querying MongoDB
+        """
+        return {self.fields[prop]: True for prop in projection}
+
+    def _generate_sort(self, sort: Tuple[Tuple[str, bool], ...]) \
+            -> List[Tuple[str, int]]:
+        """
+        Converts the parsed sort to a MongoDB sort specification, warning \
+        about fields without a supporting index if `check_sort_indexes` \
+        is set.
+
+        :param sort: The sort returned by `_get_sort`
+        :return: The list of (field, direction) pairs to use when querying \
+        MongoDB
+        """
+        if self.check_sort_indexes:
+            self._warn_unindexed_sort(
+                sort,
+                {index["key"][0][0]
+                 for index in self.cursor.index_information().values()})
+
+        return [(self.fields[field], DESCENDING if descending else ASCENDING)
+                for field, descending in sort]
+
     def _generate_filters(self, filters: dict) -> dict:
         """
         Converts the filters dict to the database field notation \
@@ -149,6 +355,38 @@ class MongoDAO(GenericDAO):
 
         return prepared_filters
 
+    def _generate_keyset_filters(self, prepared_filters: dict,
+                                 keyset: Optional[tuple]) -> dict:
+        """
+        Adds the keyset pagination condition to the filters.
+
+        :param prepared_filters: The filters from `_generate_filters`
+        :param keyset: The decoded cursor or None for the first page
+        :return: The filters dict to use when querying MongoDB
+        """
+        if keyset is None:
+            return prepared_filters
+
+        value, id_ = keyset
+        sort_field = self.fields[self.keyset_field]
+        id_field = self.fields["id_"]
+        field_info = get_fields_info(self.return_class).get(self.keyset_field)
+        field_type = field_info.field_.type if field_info else None
+        try:
+            if field_type is datetime and isinstance(value, str):
+                value = datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+            elif field_type is date and isinstance(value, str):
+                value = datetime.strptime(value, "%Y-%m-%d")
+        except ValueError as err:
+            raise InvalidCursorException(
+                debug=f"Cursor value {value} is not a valid {field_type}"
+            ) from err
+
+        keyset_filters = dict(prepared_filters)
+        keyset_filters["$or"] = [{sort_field: {"$gt": value}},
+                                 {sort_field: value, id_field: {"$gt": id_}}]
+        return keyset_filters
+
     def remove(self, entity: Entity = None, filters: dict = None) -> int:
         """
         Removes entities from database. May be called either with an instance
@@ -175,8 +413,16 @@ class MongoDAO(GenericDAO):
 
         count = 0
         if entity is not None:
-            self.cursor.delete_one({self.fields["id_"]: entity.id_})
             count = 1
+            if self.rely_on_constraints:
+                count = self.cursor.delete_one(
+                    {self.fields["id_"]: entity.id_}
+                ).deleted_count
+                if count == 0:
+                    raise EntityNotFoundException(
+                        debug=f"Entity id_ is {entity.id_}")
+            else:
+                self.cursor.delete_one({self.fields["id_"]: entity.id_})
         elif filters is not None:
             count = self.cursor.delete_many(
                 self._generate_filters(filters)
@@ -198,9 +444,15 @@ class MongoDAO(GenericDAO):
         """
         super().create(entity)
 
-        self.cursor.insert_one(
-            self._prepare_db_dict(entity)
-        )
+        try:
+            self.cursor.insert_one(
+                self._prepare_db_dict(entity)
+            )
+        except DuplicateKeyError as err:
+            raise DuplicateEntityException(
+                debug=f"{self.return_class.__name__} uuid {entity.id_} "
+                      f"already exists in database!"
+            ) from err
 
         return entity.id_
 
@@ -245,12 +497,20 @@ class MongoDAO(GenericDAO):
         :return: The id_ of the updated entity.
         """
         super().update(entity)
-        old_ent = self.get(entity.id_)
         entity.last_modified_datetime = datetime.now()
-
-        old_entity = self._prepare_db_dict(old_ent)
         new_entity = self._prepare_db_dict(entity)
 
+        if self.rely_on_constraints:
+            matched = self.cursor.update_one(
+                {self.fields["id_"]: entity.id_},
+                {"$set": new_entity}).matched_count
+            if matched == 0:
+                raise EntityNotFoundException(
+                    debug=f"Entity id_ is {entity.id_}")
+            return entity.id_
+
+        old_entity = self._prepare_db_dict(self.get(entity.id_))
+
         query = {}
         for field in self.fields.values():
             if old_entity.get(field, None) != new_entity.get(field, None):
@@ -261,6 +521,135 @@ class MongoDAO(GenericDAO):
 
         return entity.id_
 
+    def _get_existing_ids(self, ids: List[str]) -> Set[str]:
+        """
+        Returns which of the `ids` exist in the database with a single query.
+
+        :param ids: The ids to check
+        :return: The set of ids found in the database
+        """
+        id_field = self.fields["id_"]
+        return {document[id_field]
+                for document in self.cursor.find({id_field: {"$in": ids}},
+                                                 projection={id_field: True})}
+
+    def _create_batch(self, entities: List[Entity]) -> Dict[int, Exception]:
+        """
+        Inserts the entities with a single unordered `insert_many`.
+
+        :param entities: The entities to insert
+        :return: The errors keyed by the position of the entity in the batch
+        """
+        try:
+            self.cursor.insert_many(
+                [self._prepare_db_dict(entity) for entity in entities],
+                ordered=False)
+        except BulkWriteError as err:
+            return self._map_write_errors(err, entities)
+        return {}
+
+    def _update_batch(self, entities: List[Entity]) -> Dict[int, Exception]:
+        """
+        Updates the entities with a single unordered `bulk_write`.
+
+        :param entities: The entities to update
+        :return: The errors keyed by the position of the entity in the batch
+        """
+        operations = []
+        for entity in entities:
+            entity.last_modified_datetime = datetime.now()
+            operations.append(
+                UpdateOne({self.fields["id_"]: entity.id_},
+                          {"$set": self._prepare_db_dict(entity)}))
+        try:
+            self.cursor.bulk_write(operations, ordered=False)
+        except BulkWriteError as err:
+            return self._map_write_errors(err, entities)
+        return {}
+
+    def _upsert_batch(self, entities: List[Entity]) -> Dict[int, Exception]:
+        """
+        Creates or updates the entities with `upsert` updates. A single \
+        entity is saved with `update_one` and a batch with a single \
+        unordered `bulk_write`. The `creation_datetime` is only set when \
+        the document is inserted. If the batch has the same `id_` more than \
+        once, the last entity is saved, as the order of an unordered \
+        `bulk_write` isn't guaranteed.
+
+        :param entities: The entities to save
+        :return: The errors keyed by the position of the entity in the batch
+        """
+        latest = {entity.id_: entity for entity in entities}
+        operations = []
+        for entity in latest.values():
+            entity.last_modified_datetime = datetime.now()
+            document = self._prepare_db_dict(entity)
+            on_insert = {
+                field: document.pop(field)
+                for field in (self.fields["id_"],
+                              self.fields.get("creation_datetime"))
+                if field in document
+            }
+            operations.append(({self.fields["id_"]: entity.id_},
+                               {"$set": document,
+                                "$setOnInsert": on_insert}))
+
+        if len(operations) == 1:
+            try:
+                self.cursor.update_one(*operations[0], upsert=True)
+            except DuplicateKeyError as err:
+                error = DuplicateEntityException(debug=str(err))
+                return {position: error for position in range(len(entities))}
+            return {}
+
+        try:
+            self.cursor.bulk_write(
+                [UpdateOne(filter_, update, upsert=True)
+                 for filter_, update in operations],
+                ordered=False)
+        except BulkWriteError as err:
+            saved = list(latest.values())
+            failed = {saved[index].id_: error for index, error
+                      in self._map_write_errors(err, saved).items()}
+            return {position: failed[entity.id_]
+                    for position, entity in enumerate(entities)
+                    if entity.id_ in failed}
+        return {}
+
+    def _remove_batch(self, entities: List[Entity]) -> Dict[int, Exception]:
+        """
+        Removes the entities with a single `delete_many`.
+
+        :param entities: The entities to remove
+        :return: An empty dict, as a delete doesn't fail per document
+        """
+        self.cursor.delete_many(
+            {self.fields["id_"]: {"$in": [entity.id_ for entity in entities]}}
+        )
+        return {}
+
+    def _map_write_errors(self, error: BulkWriteError,
+                          entities: List[Entity]) -> Dict[int, Exception]:
+        """
+        Converts the write errors of a bulk operation to the errors \
+        reported in `BulkResult`.
+
+        :param error: The error raised by the bulk operation
+        :param entities: The entities of the batch
+        :return: The errors keyed by the position of the entity in the batch
+        """
+        errors = {}
+        for write_error in error.details.get("writeErrors", []):
+            index = write_error["index"]
+            if write_error.get("code") == DUPLICATE_KEY_ERROR:
+                errors[index] = DuplicateEntityException(
+                    debug=f"{self.return_class.__name__} uuid "
+                          f"{entities[index].id_} already exists in database!"
+                )
+            else:
+                errors[index] = RuntimeError(write_error.get("errmsg"))
+        return errors
+
     def close(self):
         """
         Closes the connection to the database
@@ -0,0 +1,66 @@
+from typing import Any, Callable, Dict, Hashable
+
+
+class StatementCache:
+    """Cache of the SQL statements generated by `GenericSQLDAO`.
+
+    Statements are grouped in namespaces, one for each combination of DAO \
+    class, persistence helper type, table and columns. Inside a namespace, \
+    each statement is identified by the operation and, for filtered \
+    queries, by the filter shape (filtered fields and comparators). As the \
+    namespaces are shared, a statement is built only once and reused by \
+    every instance of the DAO.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._namespaces: Dict[Hashable, Dict[Hashable, Any]] = {}
+
+    def namespace(self, key: Hashable) -> Dict[Hashable, Any]:
+        """Returns the statements namespace identified by `key`, creating \
+        it if necessary.
+
+        :param key: The namespace identifier
+        :return: The dict that holds the statements of the namespace
+        """
+        return self._namespaces.setdefault(key, {})
+
+    def get(self, namespace: Dict[Hashable, Any], key: Hashable,
+            builder: Callable[[], Any]) -> Any:
+        """Returns the statement `key` from `namespace`, building it with \
+        `builder` if it's not cached yet.
+
+        :param namespace: A namespace returned by `namespace`
+        :param key: The statement identifier inside the namespace
+        :param builder: Function without arguments that builds the statement
+        :return: The cached statement
+        """
+        statement = namespace.get(key)
+        if statement is None:
+            self.misses += 1
+            statement = builder()
+            namespace[key] = statement
+        else:
+            self.hits += 1
+        return statement
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the cache usage statistics.
+
+        :return: A dict with the hits, misses and number of cached statements
+        """
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "size": sum(len(namespace)
+                            for namespace in self._namespaces.values())}
+
+    def clear(self) -> None:
+        """Removes all cached statements and resets the statistics.
+
+        :return: None
+        """
+        for namespace in self._namespaces.values():
+            namespace.clear()
+        self.hits = 0
+        self.misses = 0
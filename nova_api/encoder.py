@@ -0,0 +1,126 @@
+"""JSON encoders used to serialize the API responses.
+
+The responses are encoded by the first available backend among orjson, \
+ujson and the standard library `json`. Another backend may be selected \
+with the env variable NOVAAPI_JSON_BACKEND or with `set_backend`.
+
+All backends encode `Entity` instances as `dict(entity)` and dates, \
+datetimes and enums with `Entity.serialize_field`, so entities may be \
+sent without being converted first. Decimals, as the values read from \
+`DECIMAL` columns, are encoded as strings, as flask's `jsonify` does.
+"""
+import json
+import os
+from array import array
+from datetime import date
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, Union
+
+from nova_api.entity import Entity
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def default(value: Any) -> Any:
+    """Converts the values the JSON backends can't encode natively.
+
+    :raises TypeError: If the value can't be converted.
+
+    :param value: The value to convert
+    :return: A JSON serializable value
+    """
+    if isinstance(value, Entity):
+        return dict(value)
+    if isinstance(value, (date, Enum)):
+        return Entity.serialize_field(value)
+    if isinstance(value, array):
+        return value.tolist()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {value.__class__.__name__} "
+                    f"is not JSON serializable")
+
+
+def _orjson_dumps(value: Any) -> bytes:
+    """Encodes `value` with orjson, which keeps the datetime format of \
+    `Entity.serialize_field`.
+
+    :param value: The value to encode
+    :return: The UTF-8 encoded JSON
+    """
+    return orjson.dumps(value, default=default,
+                        option=orjson.OPT_PASSTHROUGH_DATETIME
+                        | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+
+def _ujson_dumps(value: Any) -> bytes:
+    """Encodes `value` with ujson.
+
+    :param value: The value to encode
+    :return: The UTF-8 encoded JSON
+    """
+    return ujson.dumps(value, default=default,
+                       ensure_ascii=False).encode()
+
+
+def _json_dumps(value: Any) -> bytes:
+    """Encodes `value` with the standard library `json`.
+
+    :param value: The value to encode
+    :return: The UTF-8 encoded JSON
+    """
+    return json.dumps(value, default=default, ensure_ascii=False,
+                      separators=(",", ":")).encode()
+
+
+BACKENDS: Dict[str, Callable[[Any], bytes]] = {"json": _json_dumps}
+if ujson is not None:
+    BACKENDS["ujson"] = _ujson_dumps
+if orjson is not None:
+    BACKENDS["orjson"] = _orjson_dumps
+
+_dumps: Callable[[Any], bytes] = _json_dumps
+
+
+def set_backend(backend: Union[str, Callable[[Any], bytes]] = None) -> None:
+    """Selects the JSON backend used by `dumps`.
+
+    :raises ValueError: If the backend is not available.
+
+    :param backend: The name of one of `BACKENDS` or a function that \
+    encodes a value to UTF-8 encoded JSON. Defaults to the fastest \
+    available backend.
+    :return: None
+    """
+    global _dumps  # pylint: disable=W0603
+    if callable(backend):
+        _dumps = backend
+        return
+
+    backend = backend or next(name for name in ("orjson", "ujson", "json")
+                              if name in BACKENDS)
+    if backend not in BACKENDS:
+        raise ValueError(f"JSON backend {backend} not available. Use one "
+                         f"of {', '.join(BACKENDS)}.")
+    _dumps = BACKENDS[backend]
+
+
+def dumps(value: Any) -> bytes:
+    """Encodes `value` with the selected backend.
+
+    :param value: The value to encode
+    :return: The UTF-8 encoded JSON
+    """
+    return _dumps(value)
+
+
+set_backend(os.environ.get("NOVAAPI_JSON_BACKEND") or None)
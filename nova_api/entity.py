@@ -1,19 +1,43 @@
 """Base entity for modeling of API's entities"""
 import logging
+import os
+import time
 from abc import ABC
-from dataclasses import dataclass, field, fields, Field
+from dataclasses import MISSING, dataclass, field, fields, Field
 from datetime import date, datetime
 from enum import Enum
-from uuid import uuid4
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+from uuid import UUID, uuid4
 
 from nova_api.exceptions import InvalidAttributeException
 
 
+ID_VERSION = os.environ.get("NOVAAPI_ID_VERSION", "4")
+
+
+def generate_time_ordered_id() -> str:
+    """Generates an uuid v7, which starts with the current unix time in \
+    milliseconds. Ids generated later sort after the previous ones, so \
+    they're inserted at the end of the primary key index.
+
+    :return: Hexadecimal string representation of the uuid.
+    """
+    value = (time.time_ns() // 1_000_000 & (1 << 48) - 1) << 80 \
+        | int.from_bytes(os.urandom(10), "big")
+    # Version 7 and RFC 4122 variant bits
+    value = value & ~(0xF << 76) | 0x7 << 76
+    value = value & ~(0x3 << 62) | 0x2 << 62
+    return UUID(int=value).hex
+
+
 def generate_id() -> str:
-    """Generates an uuid v4.
+    """Generates an uuid v4, or an uuid v7 with `generate_time_ordered_id` \
+    if the env variable NOVAAPI_ID_VERSION is 7.
 
     :return: Hexadecimal string representation of the uuid.
     """
+    if ID_VERSION == "7":
+        return generate_time_ordered_id()
     return uuid4().hex
 
 
@@ -26,6 +50,32 @@ def get_time() -> datetime:
     return datetime_no_microseconds
 
 
+@dataclass(frozen=True)
+class FieldInfo:
+    """Metadata of an Entity field compiled once per class.
+
+    :param name: The attribute name
+    :param field_: The dataclass field
+    :param database: Whether the field is saved in the database
+    :param primary_key: Whether the field is part of the primary key
+    :param db_type: The database type set in the field metadata
+    :param db_default: The database default set in the field metadata
+    :param parser: Parses the values set in the attribute
+    :param db_converter: Converts the values read from the database or \
+    None if they are used as is
+    :param validator: The validation function set in the field metadata
+    """
+    name: str
+    field_: Field
+    database: bool
+    primary_key: bool
+    db_type: Optional[str]
+    db_default: Optional[str]
+    parser: Callable[[Any], Any]
+    db_converter: Optional[Callable[[Any], Any]]
+    validator: Optional[Callable[[Any], bool]]
+
+
 @dataclass
 class Entity(ABC):
     """Base Entity implementation
@@ -42,7 +92,13 @@ class Entity(ABC):
                 name: str = None
                 age: int = None
                 birthday: date = None
+
+    Entities that are held in memory in large amounts may be declared \
+    with `@entity(slots=True)` instead of `@dataclass`, which stores the \
+    fields in `__slots__` instead of a per-instance `__dict__`.
     """
+    __slots__ = ()
+
     id_: str = field(default_factory=generate_id,
                      metadata={"type": "CHAR(32)",
                                "primary_key": True,
@@ -78,13 +134,13 @@ class Entity(ABC):
         :param value: The attribute value
         :return: None
         """
-        field_ = getattr(self, '__dataclass_fields__').get(key)
-        if not field_:
+        field_info = get_fields_info(type(self)).get(key)
+        if not field_info:
             raise AttributeError
 
-        parsed_value = self.__try_parse_field_value(field_, value)
-        validation_function = field_.metadata.get('validation', lambda v: True)
-        if not validation_function(parsed_value):
+        parsed_value = field_info.parser(value)
+        if field_info.validator is not None \
+                and not field_info.validator(parsed_value):
             raise InvalidAttributeException(
                 debug=f'Attribute {key!r} received an invalid value {value!r}'
             )
@@ -101,7 +157,8 @@ class Entity(ABC):
 
         :return key, value: The tuple with the field_name and field_value
         """
-        for key, value in self.__dict__.items():
+        for key in get_fields_info(type(self)):
+            value = getattr(self, key)
             if isinstance(value, Entity):
                 yield key + '_id_', Entity.serialize_field(value)
             else:
@@ -129,6 +186,41 @@ class Entity(ABC):
             serialized_value = field_value.value
         return serialized_value
 
+    @classmethod
+    def from_db(cls, values: Sequence, names: Sequence[str]) -> 'Entity':
+        """Creates an instance from values read from the database.
+
+        The values are trusted, so `__setattr__` and the field validations \
+        are skipped. Only the conversions needed for database values are \
+        made, with converters precomputed once per class: child entities \
+        are instantiated from their `id_`, enums from their values and \
+        dates and datetimes parsed if received as strings. Fields not in \
+        `names` receive their defaults.
+
+        :param values: The values read from the database
+        :param names: The attribute names of `values`, in the same order
+        :return: The hydrated instance
+        """
+        instance = object.__new__(cls)
+        row = dict(zip(names, values))
+        for name, field_info in get_fields_info(cls).items():
+            if name in row:
+                value = row[name]
+                if field_info.db_converter is not None:
+                    value = field_info.db_converter(value)
+            elif field_info.field_.default_factory is not MISSING:
+                value = field_info.field_.default_factory()
+            elif field_info.field_.default is not MISSING:
+                value = field_info.field_.default
+            else:
+                value = None
+            object.__setattr__(instance, name, value)
+
+        post_init = getattr(instance, "__post_init__", None)
+        if post_init is not None:
+            post_init()
+        return instance
+
     def get_db_values(self, field_serializer=None) -> list:
         """Returns all attributes to save in database with formatted values.
 
@@ -144,46 +236,241 @@ class Entity(ABC):
         :return: Serialized values to save in database
         """
         field_serializer = field_serializer or Entity.serialize_field
-        return [field_serializer(self.__getattribute__(field_.name))
-                for field_ in fields(self)
-                if field_.metadata.get("database", True)]
+        return [field_serializer(self.__getattribute__(field_info.name))
+                for field_info in get_db_fields_info(type(self))]
 
-    @staticmethod
-    def __try_parse_field_value(field_: Field, value):
-        """Returns the parsed value
 
-        :param field_: The field
-        :param value:
-        :return: The parsed value
-        """
-        try:
-            if issubclass(field_.type, (Entity, Enum)) \
-                    and \
-                    not isinstance(value, field_.type):
+def entity(cls: type = None, *, slots: bool = False, **kwargs) -> Any:
+    """Decorator that turns an Entity subclass into a dataclass, as \
+    `dataclass` does, optionally storing the fields in `__slots__`.
+
+    Slotted entities don't have a per-instance `__dict__`, which cuts the \
+    memory used by each instance, while keeping the parsing, validation \
+    and serialization of `Entity`. They may only inherit from `Entity` or \
+    from other slotted entities.
+
+    Example:
+         ::
+
+            @entity(slots=True)
+            class Person(Entity):
+                name: str = None
+                age: int = None
+
+    :raises TypeError: If `slots` is set and a base class has a `__dict__`.
+
+    :param cls: The class to decorate
+    :param slots: Whether to store the fields in `__slots__`
+    :param kwargs: Other arguments to `dataclass`
+    :return: The decorated class or a decorator if called with arguments
+    """
+
+    def wrap(cls_: type) -> type:
+        cls_ = dataclass(cls_, **kwargs)
+        return _add_slots(cls_) if slots else cls_
+
+    return wrap if cls is None else wrap(cls)
+
+
+def _add_slots(cls: type) -> type:
+    """Recreates a dataclass with `__slots__` for its fields.
+
+    :raises TypeError: If a base class has a `__dict__`.
+
+    :param cls: The dataclass
+    :return: The new class with `__slots__`
+    """
+    for base in cls.__mro__[1:]:
+        if "__dict__" in base.__dict__:
+            raise TypeError(f"Slotted entity {cls.__name__} can't inherit "
+                            f"from {base.__name__}, which has a __dict__.")
+
+    inherited_slots = set()
+    for base in cls.__mro__[1:]:
+        base_slots = base.__dict__.get("__slots__", ())
+        inherited_slots.update([base_slots] if isinstance(base_slots, str)
+                               else base_slots)
+
+    field_names = tuple(field_.name for field_ in fields(cls)
+                        if field_.name not in inherited_slots)
+    cls_dict = dict(cls.__dict__)
+    cls_dict["__slots__"] = field_names
+    for name in field_names:
+        cls_dict.pop(name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+
+    slotted_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    slotted_cls.__qualname__ = cls.__qualname__
+
+    # Methods using super() reference the original class in __class__
+    for value in cls_dict.values():
+        function = getattr(value, "__func__", value)
+        for cell in getattr(function, "__closure__", None) or ():
+            try:
+                if cell.cell_contents is cls:
+                    cell.cell_contents = slotted_cls
+            except ValueError:
+                continue
+    return slotted_cls
+
+
+_FIELDS_INFO: Dict[type, Dict[str, FieldInfo]] = {}
+_DB_FIELDS_INFO: Dict[type, Tuple[FieldInfo, ...]] = {}
+
+
+def get_fields_info(cls: type) -> Dict[str, FieldInfo]:
+    """Returns the compiled metadata of the fields of an Entity class, \
+    in declaration order. It's built on the first call for each class and \
+    reused afterwards, so the dataclass fields and their metadata aren't \
+    inspected again on every attribute set or DAO instantiation.
+
+    :param cls: The Entity subclass
+    :return: Dict with the `FieldInfo` of each field by attribute name
+    """
+    fields_info = _FIELDS_INFO.get(cls)
+    if fields_info is None:
+        fields_info = {field_.name: _compile_field_info(field_)
+                       for field_ in fields(cls)}
+        _FIELDS_INFO[cls] = fields_info
+        _DB_FIELDS_INFO[cls] = tuple(field_info
+                                     for field_info in fields_info.values()
+                                     if field_info.database)
+    return fields_info
+
+
+def get_db_fields_info(cls: type) -> Tuple[FieldInfo, ...]:
+    """Returns the compiled metadata of the fields of an Entity class that \
+    are saved in the database, in declaration order.
+
+    :param cls: The Entity subclass
+    :return: Tuple with the `FieldInfo` of the database fields
+    """
+    db_fields_info = _DB_FIELDS_INFO.get(cls)
+    if db_fields_info is None:
+        get_fields_info(cls)
+        db_fields_info = _DB_FIELDS_INFO[cls]
+    return db_fields_info
+
+
+def _compile_field_info(field_: Field) -> FieldInfo:
+    """Builds the `FieldInfo` of a dataclass field.
+
+    :param field_: The field
+    :return: The compiled field metadata
+    """
+    return FieldInfo(name=field_.name,
+                     field_=field_,
+                     database=field_.metadata.get("database", True),
+                     primary_key=bool(field_.metadata.get("primary_key")),
+                     db_type=field_.metadata.get("type"),
+                     db_default=field_.metadata.get("default"),
+                     parser=_compile_parser(field_),
+                     db_converter=_compile_db_converter(field_),
+                     validator=field_.metadata.get("validation"))
+
+
+def _keep_value(value: Any) -> Any:
+    """Returns the value unchanged.
+
+    :param value: The value
+    :return: The value
+    """
+    return value
+
+
+def _compile_parser(field_: Field) -> Callable[[Any], Any]:
+    """Returns the function that parses the values set in `field_`. \
+    Fields that are subclasses of Entity or Enum are instantiated from the \
+    value, dates and datetimes are parsed from strings with the format in \
+    the field metadata and strings are stripped.
+
+    :param field_: The field
+    :return: The parser
+    """
+    type_ = field_.type
+    if not isinstance(type_, type):
+        return _keep_value
+
+    if issubclass(type_, (Entity, Enum)):
+        def parse_instance(value):
+            if isinstance(value, type_):
+                return value
+            try:
                 # pylint: disable=W0511
                 # TODO call dao.get
-                value = field_.type(value)
-            elif issubclass(field_.type, datetime) \
-                    and \
-                    not isinstance(value, field_.type):
-                value = datetime.strptime(
-                    value,
-                    field_.metadata.get("datetime_format",
-                                        "%Y-%m-%d %H:%M:%S")
-                )
-            elif issubclass(field_.type, date) \
-                    and \
-                    not isinstance(value,
-                                   field_.type):
-                value = datetime.strptime(
-                    value,
-                    field_.metadata.get("date_format",
-                                        "%Y-%m-%d")
-                ).date()
-            elif field_.type == date and isinstance(value, datetime):
-                value = value.date()
-            elif issubclass(field_.type, str) and value is not None:
-                value = str(value).strip()
-        except TypeError:
-            pass
-        return value
+                return type_(value)
+            except TypeError:
+                return value
+
+        return parse_instance
+
+    if issubclass(type_, datetime):
+        datetime_format = field_.metadata.get("datetime_format",
+                                              "%Y-%m-%d %H:%M:%S")
+
+        def parse_datetime(value):
+            if isinstance(value, type_):
+                return value
+            try:
+                return datetime.strptime(value, datetime_format)
+            except TypeError:
+                return value
+
+        return parse_datetime
+
+    if issubclass(type_, date):
+        date_format = field_.metadata.get("date_format", "%Y-%m-%d")
+
+        def parse_date(value):
+            if not isinstance(value, type_):
+                try:
+                    return datetime.strptime(value, date_format).date()
+                except TypeError:
+                    return value
+            if type_ is date and isinstance(value, datetime):
+                return value.date()
+            return value
+
+        return parse_date
+
+    if issubclass(type_, str):
+        return lambda value: value if value is None else str(value).strip()
+
+    return _keep_value
+
+
+def _compile_db_converter(field_: Field) -> Optional[Callable[[Any], Any]]:
+    """Returns the function that converts a value read from the database \
+    to the type of `field_`, or None if the value is used as is.
+
+    :param field_: The field
+    :return: The converter or None
+    """
+    type_ = field_.type
+    if not isinstance(type_, type):
+        return None
+
+    if issubclass(type_, Entity):
+        return lambda value: value if isinstance(value, type_) \
+            else type_(value)
+    if issubclass(type_, Enum):
+        return lambda value: value if value is None \
+            or isinstance(value, type_) else type_(value)
+    if issubclass(type_, datetime):
+        datetime_format = field_.metadata.get("datetime_format",
+                                              "%Y-%m-%d %H:%M:%S")
+        return lambda value: datetime.strptime(value, datetime_format) \
+            if isinstance(value, str) else value
+    if issubclass(type_, date):
+        date_format = field_.metadata.get("date_format", "%Y-%m-%d")
+
+        def convert_date(value):
+            if isinstance(value, datetime):
+                return value.date()
+            if isinstance(value, str):
+                return datetime.strptime(value, date_format).date()
+            return value
+
+        return convert_date
+    return None
@@ -58,9 +58,10 @@ class InvalidIDTypeException(NovaAPIException):
 
 @dataclass
 class InvalidIDException(NovaAPIException):
-    """ ID is not a valid UUID v4 """
+    """ ID is not a valid UUID v4 or v7 """
     status_code: int = field(default=400, init=False)
-    message: str = field(default="ID is not a valid UUID v4", init=False)
+    message: str = field(default="ID is not a valid UUID v4 or v7",
+                         init=False)
 
 
 @dataclass
@@ -93,3 +94,19 @@ class InvalidAttributeException(NovaAPIException):
     """ Attribute failed it's validation. """
     status_code: int = field(default=400, init=False)
     message: str = field(default='Invalid attribute value', init=False)
+
+
+@dataclass
+class InvalidCursorException(NovaAPIException):
+    """ Pagination cursor is not valid. """
+    status_code: int = field(default=400, init=False)
+    message: str = field(default='Pagination cursor is not valid',
+                         init=False)
+
+
+@dataclass
+class InvalidFieldsException(NovaAPIException):
+    """ Selected fields are not valid. """
+    status_code: int = field(default=400, init=False)
+    message: str = field(default='Selected fields are not valid',
+                         init=False)
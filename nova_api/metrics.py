@@ -0,0 +1,136 @@
+"""Exports the connection pools usage in the Prometheus text format.
+
+The metrics of each pool are read with `pool_stats` or exported with the \
+`metrics` view, which may be added to a connexion or flask app with \
+`add_metrics_endpoint`. Each process keeps its own pools, so with uWSGI \
+every worker reports its own connections.
+"""
+from typing import Iterator, List
+
+from flask import Response
+
+from nova_api.persistence.connection_pool import ConnectionPool, \
+    Histogram, PoolStats
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Name, type, help and the function that reads the value from the stats
+METRICS = (
+    ("nova_api_pool_max_connections", "gauge",
+     "Maximum number of connections of the pool.",
+     lambda stats: stats.max_size),
+    ("nova_api_pool_connections", "gauge",
+     "Number of open connections, including the ones being opened.",
+     lambda stats: stats.size),
+    ("nova_api_pool_connections_in_use", "gauge",
+     "Number of borrowed connections.",
+     lambda stats: stats.in_use),
+    ("nova_api_pool_connections_idle", "gauge",
+     "Number of idle connections.",
+     lambda stats: stats.idle),
+    ("nova_api_pool_checkouts_total", "counter",
+     "Number of connections handed out.",
+     lambda stats: stats.checkouts),
+    ("nova_api_pool_checkout_timeouts_total", "counter",
+     "Number of checkouts that failed because the pool was exhausted.",
+     lambda stats: stats.timeouts),
+    ("nova_api_pool_connections_created_total", "counter",
+     "Number of connections opened.",
+     lambda stats: stats.created),
+    ("nova_api_pool_connections_closed_total", "counter",
+     "Number of connections closed.",
+     lambda stats: stats.closed),
+    ("nova_api_pool_checkout_wait_seconds", "histogram",
+     "Seconds taken to hand out a connection.",
+     lambda stats: stats.wait_time),
+    ("nova_api_pool_connection_lifetime_seconds", "histogram",
+     "Seconds a connection was kept open before being closed.",
+     lambda stats: stats.lifetime),
+)
+
+
+def pool_stats() -> List[PoolStats]:
+    """Returns the usage of all the open connection pools.
+
+    :return: The stats of each pool, sorted by name
+    """
+    return sorted((pool.stats() for pool in list(ConnectionPool.instances)),
+                  key=lambda stats: stats.name)
+
+
+def _escape(value: str) -> str:
+    """Escapes a label value of the text format.
+
+    :param value: The label value
+    :return: The escaped value
+    """
+    return value.replace("\\", "\\\\").replace("\"", "\\\"") \
+        .replace("\n", "\\n")
+
+
+def _format_number(value: float) -> str:
+    """Formats a sample value or bucket bound of the text format.
+
+    :param value: The number
+    :return: The formatted number
+    """
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _histogram_samples(name: str, labels: str,
+                       histogram: Histogram) -> Iterator[str]:
+    """Formats the bucket, sum and count samples of a histogram.
+
+    :param name: The metric name
+    :param labels: The formatted labels of the pool
+    :param histogram: The histogram
+    :return: Iterator of the sample lines
+    """
+    for bound, count in histogram.cumulative():
+        yield f'{name}_bucket{{{labels},le="{_format_number(bound)}"}} ' \
+              f'{count}'
+    yield f"{name}_sum{{{labels}}} {_format_number(histogram.total)}"
+    yield f"{name}_count{{{labels}}} {histogram.count}"
+
+
+def render(stats: List[PoolStats] = None) -> str:
+    """Formats the pools usage in the Prometheus text format.
+
+    :param stats: The stats to format. Defaults to the stats of all the \
+    open pools.
+    :return: The metrics text
+    """
+    if stats is None:
+        stats = pool_stats()
+
+    lines = []
+    for name, type_, help_, read in METRICS:
+        lines.append(f"# HELP {name} {help_}")
+        lines.append(f"# TYPE {name} {type_}")
+        for pool in stats:
+            labels = f'pool="{_escape(pool.name)}"'
+            if type_ == "histogram":
+                lines.extend(_histogram_samples(name, labels, read(pool)))
+            else:
+                lines.append(f"{name}{{{labels}}} {read(pool)}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics() -> Response:
+    """View that exports the pools usage in the Prometheus text format.
+
+    :return: The flask response with the metrics
+    """
+    return Response(render(), status=200, content_type=CONTENT_TYPE)
+
+
+def add_metrics_endpoint(app, path: str = "/metrics") -> None:
+    """Adds the `metrics` view to an app.
+
+    :param app: The connexion or flask app
+    :param path: The path of the endpoint
+    :return: None
+    """
+    app.add_url_rule(path, "nova_api_metrics", metrics)
@@ -1,37 +1,282 @@
 import logging
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from nova_api.entity import Entity
+from nova_api.persistence.prepared import get_statements
+from nova_api.persistence.replicas import ReplicaSet, \
+    is_primary_pinned, is_read_query, pin_primary
 
 
 class PersistenceHelper(ABC):
+    """Base class of the database helpers.
+
+    If `replicas` is set, the reads are sent to a read replica until the \
+    helper writes to the primary. From then on, all the queries of the \
+    helper run in the primary and, inside a flask app context, the queries \
+    of every other helper used by the request too, so a request always \
+    reads its own writes.
+
+    Outside of a `transaction`, each write is committed as soon as it's \
+    executed and reads are never committed.
+
+    If `prepared` is set, the queries with params are prepared in the \
+    server the first time they run in a connection and executed as prepared \
+    statements afterwards, skipping the parsing and planning. Each \
+    connection keeps up to `prepared_cache_size` statements, deallocating \
+    the least recently used ones.
+    """
     ALLOWED_COMPARATORS: List[str]
     TYPE_MAPPING: Dict[str, str]
     CREATE_QUERY: str
     COLUMN: str
     SELECT_QUERY: str
+    SELECT_ALL_QUERY: str
     FILTERS: str
     FILTER: str
     DELETE_QUERY: str
     INSERT_QUERY: str
     UPDATE_QUERY: str
     QUERY_TOTAL_COLUMN: str
+    QUERY_ESTIMATED_TOTAL: str
+    SELECT_WINDOW_COUNT_QUERY: str
+    SUPPORTS_WINDOW_COUNT: bool = False
+    SELECT_KEYSET_QUERY: str
+    KEYSET_FILTER: str
+    IN_FILTER: str
+    INSERT_MANY_QUERY: str
+    UPSERT_QUERY: str
+    UPSERT_UPDATE: str
+    ORDER_BY: str
+    QUERY_INDEXED_COLUMNS: str
+    UUID_TYPE: str
 
     @abstractmethod
     # pylint: disable=R0913
     def __init__(self, host: str, user: str, password: str,
                  database: str, pooled: bool, database_args: dict):
         self.cursor = None
+        self.db_conn = None
         self.logger = logging.getLogger("NovaAPILogger")
+        self.replicas: Optional[ReplicaSet] = None
+        self.pinned = False
+        self.read_from_replica = False
+        self.replica_host = None
+        self.replica_conn = None
+        self.replica_cursor = None
+        self.replica_pool = None
+        self.transaction_depth = 0
+        self.transaction_failed = False
+        self.prepared = False
+        self.prepared_cache_size = 100
+        self.prepared_cursor = None
+
+    def _connect(self, host: str) -> Tuple[Any, Any]:
+        """Opens or borrows a connection to a database node. Must be \
+        implemented by the helpers that support replicas.
+
+        :param host: The host of the node
+        :return: The connection and the pool it was borrowed from, or None \
+        if not pooled
+        """
+        raise NotImplementedError()
+
+    def _pin_primary(self) -> None:
+        """Sends the following queries of the helper and of the current \
+        request to the primary.
+
+        :return: None
+        """
+        self.pinned = True
+        pin_primary()
+
+    def _use_replica_for(self, query: str) -> bool:
+        """Returns whether `query` should run in a replica, connecting to \
+        one in the first read. Writes pin the helper to the primary.
+
+        :param query: The query to execute
+        :return: True if the query must run in `replica_conn`
+        """
+        if self.replicas is None or self.pinned or is_primary_pinned():
+            return False
+        if not is_read_query(query):
+            self.logger.debug("Write to primary, pinning request to it.")
+            self._pin_primary()
+            return False
+        if self.replica_conn is None:
+            host = self.replicas.acquire()
+            try:
+                self.replica_conn, self.replica_pool = self._connect(host)
+                self.replica_cursor = self.replica_conn.cursor()
+            except Exception:  # pylint: disable=W0703
+                self.replicas.release(host)
+                self.replica_conn = None
+                self.logger.warning("Unable to connect to replica %s. "
+                                    "Reading from primary.", host,
+                                    exc_info=True)
+                self.pinned = True
+                return False
+            self.replica_host = host
+        return True
+
+    def _route(self, query: str) -> Tuple[Any, Any]:
+        """Returns the connection and cursor that must run `query`.
+
+        :param query: The query to execute
+        :return: The connection and cursor of the replica or the primary
+        """
+        self.read_from_replica = self._use_replica_for(query)
+        if self.read_from_replica:
+            return self.replica_conn, self.replica_cursor
+        return self.db_conn, self.cursor
+
+    def _prepare(self, db_conn: Any, query: str) -> Any:
+        """Prepares `query` in a connection. Must be implemented by the \
+        helpers that support prepared statements.
+
+        :param db_conn: The connection to prepare the statement in
+        :param query: The query with the params placeholders
+        :return: The prepared statement
+        """
+        raise NotImplementedError()
+
+    def _deallocate(self, db_conn: Any, statement: Any) -> None:
+        """Frees a statement returned by `_prepare`.
+
+        :param db_conn: The connection of the statement
+        :param statement: The prepared statement
+        :return: None
+        """
+        raise NotImplementedError()
+
+    def _get_prepared(self, db_conn: Any, query: str,
+                      params: Optional[List]) -> Any:
+        """Returns the prepared statement of `query` in the connection, \
+        preparing it if necessary. Only the queries with params are \
+        prepared, as the ones generated by the DAOs.
+
+        :param db_conn: The connection that will run the query
+        :param query: The query to execute
+        :param params: The query params
+        :return: The prepared statement or None if the query must not be \
+        prepared
+        """
+        if not self.prepared or not params:
+            return None
+        statements = get_statements(db_conn)
+        statement = statements.get(query)
+        if statement is not None:
+            statements.move_to_end(query)
+            return statement
+        self.logger.debug("Preparing statement %s", query)
+        statement = self._prepare(db_conn, query)
+        statements[query] = statement
+        if len(statements) > self.prepared_cache_size:
+            _, evicted = statements.popitem(last=False)
+            self._deallocate(db_conn, evicted)
+        return statement
+
+    def _should_commit(self, query: str) -> bool:
+        """Returns whether `query` must be committed right after being \
+        executed, which is the case of writes outside of a transaction.
+
+        :param query: The executed query
+        :return: True if the query must be committed
+        """
+        return self.transaction_depth == 0 and not is_read_query(query)
+
+    @contextmanager
+    def transaction(self) -> Iterator["PersistenceHelper"]:
+        """Runs the queries of the block in a single transaction in the \
+        primary, which is committed once when the block ends or rolled back \
+        if it raises an exception. DAOs that share the helper through \
+        `database_instance` take part in the same transaction.
+
+        Nested blocks are part of the outermost transaction.
+
+        Example:
+            >>> with helper.transaction():
+            ...     contact_dao.create(contact)
+            ...     phone_dao.create_many(phones)
+
+        :raises RuntimeError: If a query failed inside the transaction and \
+        the database aborted it, even if the error was handled in the block.
+        :return: A context manager that yields the helper
+        """
+        if self.transaction_depth == 0:
+            self.logger.debug("Starting transaction.")
+            self._pin_primary()
+            self.transaction_failed = False
+        self.transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0:
+                self.logger.debug("Rolling back transaction.")
+                self.db_conn.rollback()
+            raise
+        self.transaction_depth -= 1
+        if self.transaction_depth > 0:
+            return
+        if self.transaction_failed:
+            self.db_conn.rollback()
+            raise RuntimeError("\nThe transaction was rolled back because a "
+                               "query failed inside it.\n\n")
+        self.logger.debug("Committing transaction.")
+        self.db_conn.commit()
+
+    def _close_replica(self) -> None:
+        """Gives the replica connection back, if one was opened.
+
+        :return: None
+        """
+        if self.replica_conn is None:
+            return
+        self.replica_cursor.close()
+        if self.replica_pool is not None:
+            self.replica_pool.put_connection(self.replica_conn)
+        else:
+            self.replica_conn.close()
+        self.replicas.release(self.replica_host)
+        self.replica_conn = None
 
     @abstractmethod
     def query(self, query: str, params: List) -> (int, int):
         pass
 
+    @abstractmethod
+    def query_many(self, query: str, params_list: List[List]) -> (int, int):
+        """
+        Executes the query once for each params in `params_list` and \
+        commits once at the end. Nothing is committed if any execution fails.
+
+        :param query: The query to execute
+        :param params_list: The list of params for each execution
+        :return: The total row count and the last row id
+        """
+
+    @abstractmethod
+    def iter_query(self, query: str, params: List = None,
+                   batch_size: int = 1000) -> Iterator[List[Any]]:
+        """
+        Executes the query in a server-side cursor and yields the results \
+        in batches of up to `batch_size` rows, so memory doesn't grow with \
+        the number of rows. No other query should be executed in the helper \
+        until the iteration finishes or the generator is closed.
+
+        :param query: The query to execute
+        :param params: The query params
+        :param batch_size: The number of rows fetched at a time
+        :return: A generator of lists of rows
+        """
+
     def get_results(self) -> List[Any]:
+        cursor = self.prepared_cursor or (
+            self.replica_cursor if self.read_from_replica else self.cursor)
         try:
-            results = self.cursor.fetchall()
+            results = cursor.fetchall()
             self.logger.debug("Got results from database: %s", results)
             return results if len(results) > 0 else None
         except Exception as err:
@@ -42,7 +287,25 @@ class PersistenceHelper(ABC):
 
     @abstractmethod
     def close(self) -> None:
-        pass
+        self._close_replica()
+
+    def encode_uuid(self, id_: Any) -> Any:
+        """Converts a hex `id_` to the value saved in a `UUID_TYPE` \
+        column. Other values are returned as they are.
+
+        :param id_: The hexadecimal id
+        :return: The database value
+        """
+        return id_
+
+    def decode_uuid(self, value: Any) -> Any:
+        """Converts a value read from a `UUID_TYPE` column to the hex \
+        `id_` used by the entities.
+
+        :param value: The database value
+        :return: The hexadecimal id
+        """
+        return value
 
     def predict_db_type(self, cls_to_predict) -> str:
         """
@@ -51,9 +314,6 @@ class PersistenceHelper(ABC):
         :param cls_to_predict: Class to predict the db type.
         :return: The db type.
         """
-        print(issubclass(cls_to_predict, Entity))
-        print(cls_to_predict)
-        print(cls_to_predict.__mro__)
         if issubclass(cls_to_predict, Entity):
             return "CHAR(32)"
         return self.TYPE_MAPPING.get(cls_to_predict.__name__) \
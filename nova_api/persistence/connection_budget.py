@@ -0,0 +1,98 @@
+"""Limit of database connections shared by all the processes of a host"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import tempfile
+import threading
+from typing import ClassVar, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ConnectionBudget:
+    """Limits the connections opened to a database server by all the \
+    processes of a host, as the workers of uWSGI.
+
+    The budget is a set of `limit` slot files in `directory`. Each open \
+    connection holds an exclusive lock on one of the files, so connections \
+    are only opened while there's a free slot. The locks are released by \
+    the operating system when a process exits, so the slots of crashed \
+    workers are never lost.
+
+    :param key: Identifies the database server, as its host
+    :param limit: Maximum number of connections of all the processes
+    :param directory: Directory of the slot files, which must be shared by \
+    the processes
+    """
+    instances: ClassVar[Dict[str, ConnectionBudget]] = {}
+    lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self, key: str, limit: int,
+                 directory: str = None) -> None:
+        if fcntl is None:
+            raise RuntimeError("Connection budgets require file locks, "
+                               "which are not available in this platform.")
+        if limit < 1:
+            raise ValueError(f"Invalid connection budget: {limit}.")
+        self.key = re.sub("[^a-zA-Z0-9._-]", "_", key)
+        self.limit = limit
+        self.directory = directory or os.path.join(tempfile.gettempdir(),
+                                                   "nova_api_budget")
+        self.logger = logging.getLogger("NovaAPILogger")
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def get_instance(cls, key: str, limit: int,
+                     directory: str = os.environ.get('DB_BUDGET_DIR')) \
+            -> ConnectionBudget:
+        """Gets the budget of a database server, creating it in the first \
+        call. All the pools of a process connected to the same server share \
+        the budget.
+
+        :param key: Identifies the database server, as its host
+        :param limit: Maximum number of connections of all the processes
+        :param directory: Directory of the slot files. Defaults to \
+        `nova_api_budget` in the temporary directory. May be set through \
+        the env variable DB_BUDGET_DIR.
+        :return: The connection budget
+        """
+        with cls.lock:
+            instance = cls.instances.get(key)
+            if instance is None:
+                instance = cls(key, limit, directory)
+                cls.instances[key] = instance
+            return instance
+
+    def acquire(self) -> Optional[int]:
+        """Takes a free slot of the budget.
+
+        :return: The slot, to be given to `release` when the connection is \
+        closed, or None if all the slots are taken
+        """
+        for index in range(self.limit):
+            slot = os.open(os.path.join(self.directory,
+                                        f"{self.key}.{index}.lock"),
+                           os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return slot
+            except OSError:
+                os.close(slot)
+        self.logger.debug("Connection budget of %s exhausted with %s "
+                          "connections.", self.key, self.limit)
+        return None
+
+    @staticmethod
+    def release(slot: int) -> None:
+        """Frees a slot taken with `acquire`. In a forked process, only \
+        forgets the inherited slot, which is still held by the parent.
+
+        :param slot: The slot
+        :return: None
+        """
+        os.close(slot)
@@ -0,0 +1,575 @@
+"""Health checked connection pool shared by the persistence helpers"""
+import logging
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from nova_api.persistence.connection_budget import ConnectionBudget
+
+# Upper bounds, in seconds, of the pool histograms buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIFETIME_BUCKETS = (1, 10, 60, 300, 600, 1800, 3600, 7200)
+# Seconds between the attempts to take a slot of an exhausted budget
+BUDGET_POLL_INTERVAL = 0.05
+
+
+def optional_seconds(value: Any) -> Optional[float]:
+    """Converts a pool time setting to seconds. Empty values and 0 \
+    disable the setting.
+
+    :param value: The setting, as received or read from an env variable
+    :return: The setting in seconds or None if disabled
+    """
+    if value in (None, '') or not float(value):
+        return None
+    return float(value)
+
+
+class PoolExhaustedError(ConnectionError):
+    """Raised when all the connections of a pool are in use."""
+
+
+@dataclass
+class Histogram:
+    """Distribution of observed values in fixed buckets.
+
+    :param buckets: The upper bounds of the buckets, in ascending order
+    :param counts: Number of observations in each bucket. The last item \
+    counts the observations above all bounds.
+    :param total: Sum of the observed values
+    """
+    buckets: Tuple[float, ...]
+    counts: List[int] = None
+    total: float = 0.0
+
+    def __post_init__(self) -> None:
+        if self.counts is None:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    @property
+    def count(self) -> int:
+        """Number of observations."""
+        return sum(self.counts)
+
+    def observe(self, value: float) -> None:
+        """Records an observation.
+
+        :param value: The observed value
+        :return: None
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """Returns the number of observations less than or equal to each \
+        bound, ending with infinity.
+
+        :return: List of (bound, count) tuples
+        """
+        result = []
+        count = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),),
+                                       self.counts):
+            count += bucket_count
+            result.append((bound, count))
+        return result
+
+    def copy(self) -> "Histogram":
+        """Returns an independent copy of the histogram.
+
+        :return: The copy
+        """
+        return replace(self, counts=list(self.counts))
+
+
+@dataclass
+class PoolStats:
+    """Snapshot of the usage of a `ConnectionPool`.
+
+    :param name: The pool name
+    :param max_size: Maximum number of connections of the pool
+    :param size: Number of open connections, including the ones being opened
+    :param in_use: Number of borrowed connections
+    :param idle: Number of idle connections
+    :param checkouts: Number of connections handed out
+    :param timeouts: Number of checkouts that failed because the pool was \
+    exhausted
+    :param created: Number of connections opened
+    :param closed: Number of connections closed
+    :param wait_time: Seconds taken to hand out each connection
+    :param lifetime: Seconds each closed connection was kept open
+    """
+    name: str
+    max_size: int
+    size: int = 0
+    in_use: int = 0
+    idle: int = 0
+    checkouts: int = 0
+    timeouts: int = 0
+    created: int = 0
+    closed: int = 0
+    wait_time: Histogram = field(
+        default_factory=lambda: Histogram(WAIT_BUCKETS))
+    lifetime: Histogram = field(
+        default_factory=lambda: Histogram(LIFETIME_BUCKETS))
+
+
+@dataclass
+class PooledConnection:
+    """A connection kept by `ConnectionPool`, its timestamps and its \
+    `ConnectionBudget` slot."""
+    connection: Any
+    created_at: float
+    returned_at: float
+    slot: Optional[int] = None
+
+
+class ConnectionPool:
+    """Thread-safe pool of database connections that validates the \
+    connections before handing them out.
+
+    Connections are checked when borrowed, so stale connections, as the \
+    ones left after a database failover, are replaced instead of reaching \
+    a request:
+     * *max_age*: Connections older than `max_age` seconds are closed and \
+     replaced.
+     * *max_idle*: Connections that were not used for `max_idle` seconds \
+     are closed and replaced.
+     * *pre_ping*: Idle connections are pinged with `ping` before being \
+     handed out.
+
+    When all the connections are in use, `get_connection` waits up to \
+    `timeout` seconds for a connection to be given back, so bursts of \
+    requests are queued instead of failing.
+
+    If `check_interval` is set, a daemon thread evicts the expired idle \
+    connections every `check_interval` seconds and opens new ones until \
+    the pool has `min_size` connections, so requests rarely wait for a \
+    connection to be opened.
+
+    :param name: The pool name, used in the logs
+    :param connect: Function that opens a new connection
+    :param ping: Function that returns whether a connection is alive
+    :param reset: Function called with each connection returned to the \
+    pool to clean its session. Connections that fail to reset are discarded.
+    :param min_size: Number of connections to keep open
+    :param max_size: Maximum number of connections open at the same time
+    :param max_age: Maximum age of a connection in seconds. None disables \
+    the recycling.
+    :param max_idle: Maximum idle time of a connection in seconds. None \
+    disables the eviction.
+    :param pre_ping: Whether to ping the connections before handing them out
+    :param check_interval: Seconds between the background checks. None \
+    disables the background thread.
+    :param timeout: Seconds to wait for a connection when the pool is \
+    exhausted. 0 fails immediately and None waits indefinitely.
+    :param budget: Connection limit shared with other pools and processes
+
+    If a `budget` is given, connections are only opened while the budget \
+    has free slots, so the pools of all the processes of a host stay within \
+    the database connection limit.
+
+    In a forked process, as a uWSGI worker, the pools forget the \
+    connections inherited from the parent and open their own as they are \
+    needed.
+
+    The usage of the pool, as the wait time of the checkouts and the \
+    lifetime of the connections, is available with `stats`. All the open \
+    pools are kept in `ConnectionPool.instances`.
+    """
+    instances: "weakref.WeakSet[ConnectionPool]" = weakref.WeakSet()
+
+    # pylint: disable=R0913
+    def __init__(self, name: str,
+                 connect: Callable[[], Any],
+                 ping: Callable[[Any], bool],
+                 reset: Callable[[Any], None] = None,
+                 min_size: int = 0,
+                 max_size: int = 5,
+                 max_age: Optional[float] = None,
+                 max_idle: Optional[float] = None,
+                 pre_ping: bool = True,
+                 check_interval: Optional[float] = None,
+                 timeout: Optional[float] = 0,
+                 budget: ConnectionBudget = None) -> None:
+        if max_size < 1 or not 0 <= min_size <= max_size:
+            raise ValueError(f"Invalid pool size: min_size {min_size} and "
+                             f"max_size {max_size}.")
+        self.name = name
+        self.connect = connect
+        self.ping = ping
+        self.reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_age = max_age
+        self.max_idle = max_idle
+        self.pre_ping = pre_ping
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self.budget = budget
+        self.logger = logging.getLogger("NovaAPILogger")
+
+        # Notified whenever a connection is given back or a slot released
+        self._lock = threading.Condition()
+        self._idle: List[PooledConnection] = []
+        self._in_use: Dict[int, PooledConnection] = {}
+        self._size = 0
+        self._closed = threading.Event()
+        self._stats = PoolStats(name, max_size)
+        # Connections of the parent process, which must not be closed
+        self._inherited: List[PooledConnection] = []
+
+        ConnectionPool.instances.add(self)
+        self.replenish()
+        self._start_checks()
+
+    @property
+    def size(self) -> int:
+        """Number of open connections, idle or in use."""
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        """Number of idle connections."""
+        return len(self._idle)
+
+    def stats(self) -> PoolStats:
+        """Returns a snapshot of the usage of the pool.
+
+        :return: The pool statistics
+        """
+        with self._lock:
+            return replace(self._stats, size=self._size,
+                           in_use=len(self._in_use), idle=len(self._idle),
+                           wait_time=self._stats.wait_time.copy(),
+                           lifetime=self._stats.lifetime.copy())
+
+    def get_connection(self, timeout: Optional[float] = -1) -> Any:
+        """Borrows a valid connection from the pool, opening a new one if \
+        there are no idle connections. If `max_size` connections are in \
+        use, waits for one to be given back.
+
+        :raises PoolExhaustedError: If no connection is available after \
+        the timeout.
+        :raises ConnectionError: If the pool is closed.
+
+        :param timeout: Seconds to wait for a connection. Defaults to the \
+        pool `timeout`.
+        :return: The connection, which must be given back with \
+        `put_connection`
+        """
+        timeout = self.timeout if timeout == -1 else timeout
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        while True:
+            record = self._checkout(deadline)
+            if record is None:
+                record = self._open(deadline)
+                break
+            if self._is_valid(record):
+                break
+            self._discard(record)
+
+        with self._lock:
+            self._in_use[id(record.connection)] = record
+            self._stats.checkouts += 1
+            self._stats.wait_time.observe(time.monotonic() - start)
+        return record.connection
+
+    def _checkout(self, deadline: Optional[float]) \
+            -> Optional[PooledConnection]:
+        """Takes an idle connection or reserves a slot for a new one, \
+        waiting until `deadline` if the pool is exhausted.
+
+        :raises PoolExhaustedError: If the deadline is reached.
+        :raises ConnectionError: If the pool is closed.
+
+        :param deadline: The `time.monotonic` limit or None to wait \
+        indefinitely
+        :return: The idle connection or None if a slot was reserved
+        """
+        with self._lock:
+            while True:
+                if self._closed.is_set():
+                    raise ConnectionError(f"Pool {self.name} is closed.")
+                if self._idle:
+                    # The most recently used connections are the warmest
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+
+                remaining = None if deadline is None \
+                    else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._stats.timeouts += 1
+                    raise PoolExhaustedError(
+                        f"Pool {self.name} exhausted with "
+                        f"{self._size} connections in use.")
+                self._lock.wait(remaining)
+
+    def put_connection(self, connection: Any, discard: bool = False) -> None:
+        """Gives a connection back to the pool.
+
+        :param connection: A connection returned by `get_connection`
+        :param discard: Closes the connection instead of keeping it, as \
+        when it's known to be broken
+        :return: None
+        """
+        with self._lock:
+            record = self._in_use.pop(id(connection), None)
+        if record is None:
+            self.logger.warning("Connection returned to pool %s was not "
+                                "borrowed from it. Closing it.", self.name)
+            self._close_connection(connection)
+            return
+
+        if discard or self._closed.is_set() \
+                or self._is_expired(record, time.monotonic()):
+            self._discard(record)
+            return
+
+        if self.reset is not None:
+            try:
+                self.reset(connection)
+            except Exception:  # pylint: disable=W0703
+                self.logger.warning("Unable to reset connection of pool %s. "
+                                    "Discarding it.", self.name,
+                                    exc_info=True)
+                self._discard(record)
+                return
+
+        record.returned_at = time.monotonic()
+        with self._lock:
+            self._idle.append(record)
+            self._lock.notify()
+
+    def evict(self) -> int:
+        """Closes the idle connections that exceeded `max_age` or \
+        `max_idle`. The connections that are not alive are only detected \
+        when borrowed, with `pre_ping`.
+
+        :return: The number of evicted connections
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = [record for record in self._idle
+                       if self._is_expired(record, now)]
+            self._idle = [record for record in self._idle
+                          if not self._is_expired(record, now)]
+
+        for record in expired:
+            self._discard(record)
+        if expired:
+            self.logger.info("Evicted %s connections from pool %s.",
+                             len(expired), self.name)
+        return len(expired)
+
+    def replenish(self) -> int:
+        """Opens connections until the pool has `min_size` connections.
+
+        :return: The number of opened connections
+        """
+        opened = 0
+        while True:
+            with self._lock:
+                if self._closed.is_set() or self._size >= self.min_size:
+                    return opened
+                self._size += 1
+            try:
+                record = self._open(time.monotonic())
+            except PoolExhaustedError:
+                return opened
+            record.returned_at = time.monotonic()
+            with self._lock:
+                self._idle.append(record)
+                self._lock.notify()
+            opened += 1
+
+    def close(self) -> None:
+        """Closes the idle connections and stops the background checks. \
+        The connections in use are closed when given back.
+
+        :return: None
+        """
+        self._closed.set()
+        ConnectionPool.instances.discard(self)
+        with self._lock:
+            records, self._idle = self._idle, []
+            self._lock.notify_all()
+        for record in records:
+            self._discard(record)
+
+    def after_fork(self) -> None:
+        """Forgets the connections inherited from the parent process, as \
+        they are still used by it. Called in the child process after a fork.
+
+        :return: None
+        """
+        self._lock = threading.Condition()
+        closed = self._closed.is_set()
+        self._closed = threading.Event()
+        if closed:
+            self._closed.set()
+
+        records = self._idle + list(self._in_use.values())
+        self._idle, self._in_use, self._size = [], {}, 0
+        self._stats = PoolStats(self.name, self.max_size)
+        for record in records:
+            if record.slot is not None:
+                self.budget.release(record.slot)
+                record.slot = None
+        # Keeps the connections referenced, as some drivers end the session
+        # when a connection is garbage collected
+        self._inherited.extend(records)
+        self._start_checks()
+
+    def _start_checks(self) -> None:
+        """Starts the background checks thread if `check_interval` is set.
+
+        :return: None
+        """
+        if self.check_interval and not self._closed.is_set():
+            threading.Thread(target=self._check_periodically,
+                             name=f"nova_api-pool-{self.name}",
+                             daemon=True).start()
+
+    def _check_periodically(self) -> None:
+        """Evicts and replenishes the connections every `check_interval` \
+        seconds until the pool is closed.
+
+        :return: None
+        """
+        while not self._closed.wait(self.check_interval):
+            try:
+                self.evict()
+                self.replenish()
+            except Exception:  # pylint: disable=W0703
+                self.logger.error("Background check of pool %s failed.",
+                                  self.name, exc_info=True)
+
+    def _open(self, deadline: Optional[float]) -> PooledConnection:
+        """Opens a new connection for a slot already reserved in `_size`.
+
+        :raises PoolExhaustedError: If the budget has no free slots until \
+        the deadline.
+
+        :param deadline: The `time.monotonic` limit to wait for a budget \
+        slot or None to wait indefinitely
+        :return: The new pooled connection
+        """
+        slot = None
+        try:
+            if self.budget is not None:
+                slot = self._acquire_slot(deadline)
+            connection = self.connect()
+        except Exception:
+            if slot is not None:
+                self.budget.release(slot)
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+        now = time.monotonic()
+        with self._lock:
+            self._stats.created += 1
+        self.logger.debug("Opened connection in pool %s.", self.name)
+        return PooledConnection(connection, now, now, slot)
+
+    def _acquire_slot(self, deadline: Optional[float]) -> int:
+        """Takes a slot of the budget, waiting until `deadline` for one to \
+        be freed by other pools or processes.
+
+        :raises PoolExhaustedError: If the deadline is reached.
+
+        :param deadline: The `time.monotonic` limit or None to wait \
+        indefinitely
+        :return: The budget slot
+        """
+        while True:
+            slot = self.budget.acquire()
+            if slot is not None:
+                return slot
+
+            remaining = None if deadline is None \
+                else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                with self._lock:
+                    self._stats.timeouts += 1
+                raise PoolExhaustedError(
+                    f"Connection budget of pool {self.name} exhausted "
+                    f"with {self.budget.limit} connections.")
+            time.sleep(BUDGET_POLL_INTERVAL if remaining is None
+                       else min(remaining, BUDGET_POLL_INTERVAL))
+
+    def _is_expired(self, record: PooledConnection, now: float) -> bool:
+        """Returns whether a connection exceeded `max_age` or `max_idle`.
+
+        :param record: The pooled connection
+        :param now: The current `time.monotonic`
+        :return: True if the connection must be replaced
+        """
+        return (self.max_age is not None
+                and now - record.created_at > self.max_age) \
+            or (self.max_idle is not None
+                and now - record.returned_at > self.max_idle)
+
+    def _is_valid(self, record: PooledConnection) -> bool:
+        """Returns whether an idle connection may be handed out.
+
+        :param record: The pooled connection
+        :return: False if the connection is expired or not alive
+        """
+        if self._is_expired(record, time.monotonic()):
+            return False
+        if not self.pre_ping:
+            return True
+        try:
+            return bool(self.ping(record.connection))
+        except Exception:  # pylint: disable=W0703
+            return False
+
+    def _discard(self, record: PooledConnection) -> None:
+        """Closes a pooled connection and releases its slot.
+
+        :param record: The pooled connection
+        :return: None
+        """
+        with self._lock:
+            self._size -= 1
+            self._stats.closed += 1
+            self._stats.lifetime.observe(time.monotonic() - record.created_at)
+            self._lock.notify()
+        self.logger.debug("Discarding connection from pool %s.", self.name)
+        self._close_connection(record.connection)
+        if record.slot is not None:
+            self.budget.release(record.slot)
+
+    def _close_connection(self, connection: Any) -> None:
+        """Closes a connection, ignoring the errors of broken connections.
+
+        :param connection: The connection to close
+        :return: None
+        """
+        try:
+            connection.close()
+        except Exception:  # pylint: disable=W0703
+            self.logger.debug("Error closing connection of pool %s.",
+                              self.name, exc_info=True)
+
+
+def _after_fork_in_child() -> None:
+    """Resets all the pools in a forked process.
+
+    :return: None
+    """
+    for pool in list(ConnectionPool.instances):
+        pool.after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
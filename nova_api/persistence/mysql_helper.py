@@ -1,13 +1,16 @@
 import logging
 import os
-from typing import List
+from typing import Any, Iterator, List, Tuple
 
 import mysql.connector
-from mysql.connector import Error, InterfaceError, DatabaseError, PoolError, \
-    ProgrammingError
+from mysql.connector import Error, InterfaceError, DatabaseError, \
+    ProgrammingError, errorcode
 
+from nova_api.exceptions import DuplicateEntityException
+from nova_api.persistence.connection_pool import PoolExhaustedError
 from nova_api.persistence.mysql_pool import MySQLPool
 from nova_api.persistence import PersistenceHelper
+from nova_api.persistence.replicas import ReplicaSet
 
 
 class MySQLHelper(PersistenceHelper):
@@ -26,22 +29,75 @@ class MySQLHelper(PersistenceHelper):
     COLUMN = "`{field}` {type} {default}"
     SELECT_QUERY = "SELECT {fields} FROM `{table}` {filters} " \
                    "LIMIT %s OFFSET %s;"
+    SELECT_ALL_QUERY = "SELECT {fields} FROM `{table}` {filters};"
     FILTERS = "WHERE {filters}"
     FILTER = "`{column}` {comparator} %s"
     DELETE_QUERY = "DELETE FROM {table} {filters};"
     INSERT_QUERY = "INSERT INTO `{table}` ({fields}) VALUES ({values});"
     UPDATE_QUERY = "UPDATE `{table}` SET {fields} WHERE {column} = %s;"
-    QUERY_TOTAL_COLUMN = "SELECT count(`{column}`) FROM {table};"
+    QUERY_TOTAL_COLUMN = "SELECT count(`{column}`) FROM {table} {filters};"
+    QUERY_ESTIMATED_TOTAL = "SELECT TABLE_ROWS " \
+                            "FROM information_schema.TABLES " \
+                            "WHERE TABLE_SCHEMA = DATABASE() " \
+                            "AND TABLE_NAME = %s;"
+    SELECT_WINDOW_COUNT_QUERY = "SELECT {fields}, COUNT(*) OVER() " \
+                                "FROM `{table}` {filters} " \
+                                "LIMIT %s OFFSET %s;"
+    # Window functions are only available from MySQL 8.0 on
+    SUPPORTS_WINDOW_COUNT = False
+    SELECT_KEYSET_QUERY = "SELECT {fields} FROM `{table}` {filters} " \
+                          "ORDER BY `{sort_column}`, `{id_column}` " \
+                          "LIMIT %s;"
+    KEYSET_FILTER = "(`{sort_column}`, `{id_column}`) > (%s, %s)"
+    IN_FILTER = "`{column}` IN ({values})"
+    INSERT_MANY_QUERY = "INSERT INTO `{table}` ({fields}) VALUES {values};"
+    UPSERT_QUERY = "INSERT INTO `{table}` ({fields}) VALUES {values} " \
+                   "ON DUPLICATE KEY UPDATE {updates};"
+    UPSERT_UPDATE = "{field}=VALUES({field})"
+    ORDER_BY = "ORDER BY {sort}"
+    QUERY_INDEXED_COLUMNS = "SELECT COLUMN_NAME " \
+                            "FROM information_schema.STATISTICS " \
+                            "WHERE TABLE_SCHEMA = DATABASE() " \
+                            "AND TABLE_NAME = %s AND SEQ_IN_INDEX = 1;"
+    UUID_TYPE = "BINARY(16)"
 
     # pylint: disable=R0913
     def __init__(self, host: str = os.environ.get('DB_URL'),
                  user: str = os.environ.get('DB_USER'),
                  password: str = os.environ.get('DB_PASSWORD'),
                  database: str = os.environ.get('DB_NAME'),
-                 pooled: bool = True, database_args: dict = None):
+                 pooled: bool = True, database_args: dict = None,
+                 replicas: str = os.environ.get('DB_REPLICA_URLS'),
+                 replica_strategy: str = os.environ.get(
+                     'DB_REPLICA_STRATEGY', 'round_robin'),
+                 prepared: bool = os.environ.get(
+                     'DB_PREPARED_STATEMENTS', 'false').lower() == 'true',
+                 prepared_cache_size: int = os.environ.get(
+                     'DB_PREPARED_CACHE_SIZE', 100)):
+        """
+        :param host: The primary database host
+        :param user: The database user
+        :param password: The user password
+        :param database: The database name
+        :param pooled: Whether to borrow the connections from a pool
+        :param database_args: Extra options to pass to database connection
+        :param replicas: Read replica hosts, as a list or a comma separated \
+        string. Each host has its own pool. May be set through the env \
+        variable DB_REPLICA_URLS.
+        :param replica_strategy: How reads are balanced, `round_robin` or \
+        `least_connections`. Defaults to `round_robin`. May be set through \
+        the env variable DB_REPLICA_STRATEGY.
+        :param prepared: Whether to run the queries with params as \
+        server-side prepared statements. Defaults to False. May be set \
+        through the env variable DB_PREPARED_STATEMENTS.
+        :param prepared_cache_size: Maximum number of prepared statements \
+        kept by each connection. Defaults to 100. May be set through the env \
+        variable DB_PREPARED_CACHE_SIZE.
+        """
         super().__init__(host, user, password, database, pooled, database_args)
 
         self.logger = logging.getLogger("NovaAPILogger")
+        self.pooled = pooled
 
         if host is None:
             host = 'localhost'
@@ -60,59 +116,154 @@ class MySQLHelper(PersistenceHelper):
         if database_args is None:
             database_args = {}
 
+        self.user = str(user)
+        self.database = str(database)
+        self.database_args = database_args
+        self._password = str(password)
+        self.replicas = ReplicaSet.get_instance(replicas, replica_strategy)
+        self.prepared = prepared
+        self.prepared_cache_size = int(prepared_cache_size)
+
         try:
             self.logger.info("Connecting to database %s at %s "
                              "with username %s. Pooled: %s. Extra args: %s",
                              database, host, user, pooled, database_args)
-            if pooled:
-                self.db_conn = MySQLPool.get_instance(
-                    host=str(host), user=str(user),
-                    password=str(password),
-                    database=str(database),
-                    database_args=database_args).get_connection()
-            else:
-                self.db_conn = mysql.connector.connect(host=str(host),
-                                                       user=str(user),
-                                                       password=str(password),
-                                                       database=str(database),
-                                                       **database_args)
+            self.db_conn, self.pool = self._connect(str(host))
             self.cursor = self.db_conn.cursor()
         except (InterfaceError, ValueError, DatabaseError,
-                PoolError, ProgrammingError) as err:
+                PoolExhaustedError, ProgrammingError) as err:
             self.logger.critical("Unable to connect to database!",
                                  exc_info=True)
             raise ConnectionError("\nSomething went wrong when connecting "
                                   f"to mysql: {err}\n\n") \
                 from err
 
+    def _connect(self, host: str) -> Tuple[Any, Any]:
+        if self.pooled:
+            pool = MySQLPool.get_instance(
+                host=host, user=self.user,
+                password=self._password,
+                database=self.database,
+                database_args=self.database_args,
+                prepared=self.prepared)
+            return pool.get_connection(), pool
+        return mysql.connector.connect(host=host,
+                                       user=self.user,
+                                       password=self._password,
+                                       database=self.database,
+                                       **self.database_args), None
+
+    def _prepare(self, db_conn: Any, query: str) -> Any:
+        # The statement is prepared in the first execution of the cursor
+        return db_conn.cursor(prepared=True)
+
+    def _deallocate(self, db_conn: Any, statement: Any) -> None:
+        statement.close()
+
     def query(self, query: str, params: List = None) -> (int, int):
         super().query(query, params)
+        db_conn, cursor = self._route(query)
         try:
+            self.prepared_cursor = self._get_prepared(db_conn, query, params)
+            cursor = self.prepared_cursor or cursor
             self.logger.debug("Query to execute is %s, params %s",
                               query,
                               params)
             if params is not None:
-                self.cursor.execute(query, params)
+                cursor.execute(query, params)
             else:
-                self.cursor.execute(query)
-            if (query.__contains__('INSERT')
-                    or query.__contains__('UPDATE')
-                    or query.__contains__('DELETE')):
+                cursor.execute(query)
+            if self._should_commit(query):
                 self.logger.debug("Committing query.")
+                db_conn.commit()
+            self.logger.debug("Row count %s and last row id %s",
+                              cursor.rowcount,
+                              cursor.lastrowid)
+            return cursor.rowcount, cursor.lastrowid
+        except Error as err:
+            self._raise_if_duplicate(err)
+            self.logger.critical("Unable to execute query in database!",
+                                 exc_info=True)
+            raise RuntimeError(
+                f"\nSomething went wrong with the query: {err}\n\n"
+            ) from err
+
+    def query_many(self, query: str, params_list: List[List]) -> (int, int):
+        super().query_many(query, params_list)
+        self._pin_primary()
+        self.read_from_replica = False
+        self.prepared_cursor = None
+        try:
+            self.logger.debug("Query to execute many times is %s, "
+                              "%s params", query, len(params_list))
+            self.cursor.executemany(query, params_list)
+            if self.transaction_depth == 0:
                 self.db_conn.commit()
             self.logger.debug("Row count %s and last row id %s",
                               self.cursor.rowcount,
                               self.cursor.lastrowid)
             return self.cursor.rowcount, self.cursor.lastrowid
         except Error as err:
+            if self.transaction_depth == 0:
+                self.db_conn.rollback()
+            self._raise_if_duplicate(err)
             self.logger.critical("Unable to execute query in database!",
                                  exc_info=True)
             raise RuntimeError(
                 f"\nSomething went wrong with the query: {err}\n\n"
             ) from err
 
+    def iter_query(self, query: str, params: List = None,
+                   batch_size: int = 1000) -> Iterator[List[Any]]:
+        super().iter_query(query, params, batch_size)
+        db_conn, _ = self._route(query)
+        self.prepared_cursor = None
+        cursor = db_conn.cursor(buffered=False)
+        try:
+            self.logger.debug("Query to iterate is %s, params %s, batch "
+                              "size %s", query, params, batch_size)
+            cursor.execute(query, params)
+            rows = cursor.fetchmany(batch_size)
+            while rows:
+                yield rows
+                rows = cursor.fetchmany(batch_size)
+        except Error as err:
+            self.logger.critical("Unable to execute query in database!",
+                                 exc_info=True)
+            raise RuntimeError(
+                f"\nSomething went wrong with the query: {err}\n\n"
+            ) from err
+        finally:
+            # Unbuffered rows must be read before the cursor is closed
+            if db_conn.unread_result:
+                db_conn.consume_results()
+            cursor.close()
+
+    def encode_uuid(self, id_: Any) -> Any:
+        try:
+            return bytes.fromhex(id_)
+        except (TypeError, ValueError):
+            return id_
+
+    def decode_uuid(self, value: Any) -> Any:
+        return value.hex() if isinstance(value, (bytes, bytearray)) \
+            else value
+
+    def _raise_if_duplicate(self, err: Error) -> None:
+        """Raises DuplicateEntityException if `err` is a duplicate key error.
+
+        :param err: The error raised by the database
+        :return: None
+        """
+        if getattr(err, "errno", None) == errorcode.ER_DUP_ENTRY:
+            self.logger.info("Duplicate key in database: %s", err)
+            raise DuplicateEntityException(debug=str(err)) from err
+
     def close(self):
         super().close()
         self.logger.info("Closing connection to database!")
         self.cursor.close()
-        self.db_conn.close()
+        if self.pooled:
+            self.pool.put_connection(self.db_conn)
+        else:
+            self.db_conn.close()
@@ -4,9 +4,14 @@ import logging
 import os
 import re
 from dataclasses import dataclass, field
-from typing import ClassVar, Dict
+from typing import ClassVar, Dict, Optional
 
-from mysql.connector import pooling
+import mysql.connector
+
+from nova_api.persistence.connection_budget import ConnectionBudget
+from nova_api.persistence.connection_pool import ConnectionPool, \
+    optional_seconds
+from nova_api.persistence.prepared import clear_statements
 
 
 @dataclass
@@ -16,14 +21,27 @@ class MySQLPool:
         default=logging.getLogger("NovaAPILogger"))
 
     @classmethod
-    # pylint: disable=R0913
+    # pylint: disable=R0913,R0914
     def get_instance(cls, host: str = os.environ.get('DB_URL'),
                      user: str = os.environ.get('DB_USER'),
                      password: str = os.environ.get('DB_PASSWORD'),
                      database: str = os.environ.get('DB_NAME'),
                      size: int = os.environ.get('MYSQL_POOL_SIZE', 5),
-                     database_args: dict = None) \
-            -> pooling.MySQLConnectionPool:
+                     database_args: dict = None,
+                     max_age: Optional[float] = os.environ.get(
+                         'DB_POOL_MAX_AGE', 3600),
+                     max_idle: Optional[float] = os.environ.get(
+                         'DB_POOL_MAX_IDLE', 600),
+                     pre_ping: bool = os.environ.get(
+                         'DB_POOL_PRE_PING', 'true').lower() != 'false',
+                     check_interval: Optional[float] = os.environ.get(
+                         'DB_POOL_CHECK_INTERVAL', 30),
+                     timeout: Optional[float] = os.environ.get(
+                         'DB_POOL_TIMEOUT', 10),
+                     max_connections: Optional[int] = os.environ.get(
+                         'DB_MAX_CONNECTIONS'),
+                     prepared: bool = False) \
+            -> ConnectionPool:
         """
         Get an instance of a database connection pool.
 
@@ -39,8 +57,35 @@ class MySQLPool:
         :param password: The user password if necessary
         :param database: The database name to use
         :param size: Number of connections to keep in the pool. \
-        Defaults to 5.
+        Defaults to 5. With `max_connections`, only one connection is kept \
+        and the others are opened as needed.
         :param database_args: Extra options to pass to database connection.
+        :param max_age: Seconds after which a connection is recycled. \
+        Defaults to 3600. May be set through the env variable \
+        DB_POOL_MAX_AGE.
+        :param max_idle: Seconds after which an idle connection is \
+        evicted. Defaults to 600. May be set through the env variable \
+        DB_POOL_MAX_IDLE.
+        :param pre_ping: Whether to ping the connections before handing \
+        them out. Defaults to True. May be set through the env variable \
+        DB_POOL_PRE_PING.
+        :param check_interval: Seconds between the background eviction and \
+        replenishment of connections. Defaults to 30. May be set through the \
+        env variable DB_POOL_CHECK_INTERVAL.
+        :param timeout: Seconds to wait for a connection when all of them \
+        are in use. Defaults to 10. 0 fails immediately and an empty value \
+        waits indefinitely. May be set through the env variable \
+        DB_POOL_TIMEOUT.
+        :param max_connections: Maximum number of connections to the \
+        database server opened by all the processes of the host, as the \
+        uWSGI workers. Disabled by default. May be set through the env \
+        variable DB_MAX_CONNECTIONS.
+        :param prepared: Whether the connections keep their prepared \
+        statements when returned to the pool. If so, only the open \
+        transaction is rolled back instead of resetting the whole session, \
+        so the session variables and temporary tables are kept too. \
+        Defaults to False and, as `database_args`, only the first call \
+        defines it.
         :return: The connection pool instance
         """
         if database_args is None:
@@ -60,16 +105,39 @@ class MySQLPool:
             return instance
 
         cls.logger.info("Pool not connected, instantiating: %s", pool_name)
-        instance = pooling.MySQLConnectionPool(
-            pool_name=pool_name,
-            pool_size=size,
-            pool_reset_session=True,
-            host=host,
-            database=database,
-            user=user,
-            password=password,
-            **database_args)
+        budget = ConnectionBudget.get_instance(host, int(max_connections)) \
+            if max_connections else None
+        instance = ConnectionPool(
+            name=pool_name,
+            connect=lambda: mysql.connector.connect(host=host,
+                                                    database=database,
+                                                    user=user,
+                                                    password=password,
+                                                    **database_args),
+            ping=lambda connection: connection.is_connected(),
+            reset=(lambda connection: connection.rollback()) if prepared
+            else _reset,
+            # With a budget, idle workers must not hold the shared slots
+            min_size=int(size) if budget is None else min(int(size), 1),
+            max_size=int(size),
+            max_age=optional_seconds(max_age),
+            max_idle=optional_seconds(max_idle),
+            pre_ping=pre_ping,
+            check_interval=optional_seconds(check_interval),
+            timeout=None if timeout in (None, '') else float(timeout),
+            budget=budget)
         cls.instances[pool_name] = instance
 
         cls.logger.info("Pool instantiated: %s", pool_name)
         return instance
+
+
+def _reset(connection) -> None:
+    """Cleans the session of a connection returned to the pool, which \
+    also deallocates its prepared statements.
+
+    :param connection: The mysql connection
+    :return: None
+    """
+    clear_statements(connection)
+    connection.reset_session()
@@ -1,12 +1,16 @@
 import os
-from typing import List
+from typing import Any, Iterator, List, Tuple
+from uuid import UUID, uuid4
 
 import psycopg2
-from psycopg2 import DatabaseError, Error, InterfaceError, ProgrammingError
-from psycopg2.pool import PoolError
+from psycopg2 import DatabaseError, Error, InterfaceError, \
+    ProgrammingError, errorcodes
 
+from nova_api.exceptions import DuplicateEntityException
+from nova_api.persistence.connection_pool import PoolExhaustedError
 from nova_api.persistence.postgresql_pool import PostgreSQLPool
 from nova_api.persistence import PersistenceHelper
+from nova_api.persistence.replicas import ReplicaSet
 
 
 class PostgreSQLHelper(PersistenceHelper):
@@ -24,12 +28,35 @@ class PostgreSQLHelper(PersistenceHelper):
     COLUMN = "{field} {type} {default}"
     SELECT_QUERY = "SELECT {fields} FROM {table} {filters} " \
                    "LIMIT %s OFFSET %s;"
+    SELECT_ALL_QUERY = "SELECT {fields} FROM {table} {filters};"
     FILTERS = "WHERE {filters}"
     FILTER = "{column} {comparator} %s"
     DELETE_QUERY = "DELETE FROM {table} {filters};"
     INSERT_QUERY = "INSERT INTO {table} ({fields}) VALUES ({values});"
     UPDATE_QUERY = "UPDATE {table} SET {fields} WHERE {column} = %s;"
-    QUERY_TOTAL_COLUMN = "SELECT count({column}) FROM {table};"
+    QUERY_TOTAL_COLUMN = "SELECT count({column}) FROM {table} {filters};"
+    QUERY_ESTIMATED_TOTAL = "SELECT reltuples::BIGINT FROM pg_class " \
+                            "WHERE relname = %s;"
+    SELECT_WINDOW_COUNT_QUERY = "SELECT {fields}, COUNT(*) OVER() " \
+                                "FROM {table} {filters} " \
+                                "LIMIT %s OFFSET %s;"
+    SUPPORTS_WINDOW_COUNT = True
+    SELECT_KEYSET_QUERY = "SELECT {fields} FROM {table} {filters} " \
+                          "ORDER BY {sort_column}, {id_column} " \
+                          "LIMIT %s;"
+    KEYSET_FILTER = "({sort_column}, {id_column}) > (%s, %s)"
+    IN_FILTER = "{column} IN ({values})"
+    INSERT_MANY_QUERY = "INSERT INTO {table} ({fields}) VALUES {values};"
+    UPSERT_QUERY = "INSERT INTO {table} ({fields}) VALUES {values} " \
+                   "ON CONFLICT ({column}) DO UPDATE SET {updates};"
+    UPSERT_UPDATE = "{field}=EXCLUDED.{field}"
+    ORDER_BY = "ORDER BY {sort}"
+    QUERY_INDEXED_COLUMNS = "SELECT a.attname FROM pg_index i " \
+                            "JOIN pg_class c ON c.oid = i.indrelid " \
+                            "JOIN pg_attribute a ON a.attrelid = c.oid " \
+                            "AND a.attnum = i.indkey[0] " \
+                            "WHERE c.relname = %s;"
+    UUID_TYPE = "UUID"
 
     # pylint: disable=R0913
     def __init__(self, host: str = os.environ.get('DB_URL'),
@@ -37,7 +64,34 @@ class PostgreSQLHelper(PersistenceHelper):
                  password: str = os.environ.get('DB_PASSWORD'),
                  database: str = os.environ.get('DB_NAME'),
                  pooled: bool = True,
-                 database_args: dict = None):
+                 database_args: dict = None,
+                 replicas: str = os.environ.get('DB_REPLICA_URLS'),
+                 replica_strategy: str = os.environ.get(
+                     'DB_REPLICA_STRATEGY', 'round_robin'),
+                 prepared: bool = os.environ.get(
+                     'DB_PREPARED_STATEMENTS', 'false').lower() == 'true',
+                 prepared_cache_size: int = os.environ.get(
+                     'DB_PREPARED_CACHE_SIZE', 100)):
+        """
+        :param host: The primary database host
+        :param user: The database user
+        :param password: The user password
+        :param database: The database name
+        :param pooled: Whether to borrow the connections from a pool
+        :param database_args: Extra options to pass to database connection
+        :param replicas: Read replica hosts, as a list or a comma separated \
+        string. Each host has its own pool. May be set through the env \
+        variable DB_REPLICA_URLS.
+        :param replica_strategy: How reads are balanced, `round_robin` or \
+        `least_connections`. Defaults to `round_robin`. May be set through \
+        the env variable DB_REPLICA_STRATEGY.
+        :param prepared: Whether to run the queries with params as \
+        server-side prepared statements. Defaults to False. May be set \
+        through the env variable DB_PREPARED_STATEMENTS.
+        :param prepared_cache_size: Maximum number of prepared statements \
+        kept by each connection. Defaults to 100. May be set through the env \
+        variable DB_PREPARED_CACHE_SIZE.
+        """
         super().__init__(host, user, password, database, pooled, database_args)
 
         self.host = str(host) if host is not None else 'localhost'
@@ -52,63 +106,169 @@ class PostgreSQLHelper(PersistenceHelper):
             if database_args is not None else {}
 
         self.pooled = pooled
+        self._password = str(password)
+        self.replicas = ReplicaSet.get_instance(replicas, replica_strategy)
+        self.prepared = prepared
+        self.prepared_cache_size = int(prepared_cache_size)
 
         try:
             self.logger.info("Connecting to database %s at %s "
                              "with username %s. Pooled: %s. Extra args: %s",
                              database, host, user, pooled, database_args)
-            if self.pooled:
-                self.db_conn = PostgreSQLPool.get_instance(
-                    host=self.host, user=self.user,
-                    password=str(password),
-                    database=self.database,
-                    database_args=self.database_args).getconn(key=id(self))
-            else:
-                self.db_conn = psycopg2.connect(host=self.host,
-                                                user=self.user,
-                                                password=str(password),
-                                                database=self.database,
-                                                **self.database_args)
+            self.db_conn, self.pool = self._connect(self.host)
             self.cursor = self.db_conn.cursor()
         except (InterfaceError, ValueError, DatabaseError,
-                PoolError, ProgrammingError) as err:
+                PoolExhaustedError, ProgrammingError) as err:
             self.logger.critical("Unable to connect to database!",
                                  exc_info=True)
             raise ConnectionError("\nSomething went wrong when connecting "
                                   f"to postgresql: {err}\n\n") \
                 from err
 
+    def _connect(self, host: str) -> Tuple[Any, Any]:
+        if self.pooled:
+            pool = PostgreSQLPool.get_instance(
+                host=host, user=self.user,
+                password=self._password,
+                database=self.database,
+                database_args=self.database_args)
+            return pool.get_connection(), pool
+        return psycopg2.connect(host=host,
+                                user=self.user,
+                                password=self._password,
+                                database=self.database,
+                                **self.database_args), None
+
+    def _prepare(self, db_conn: Any, query: str) -> Any:
+        name = f"nova_api_{uuid4().hex}"
+        # PREPARE takes numbered params instead of the driver placeholders
+        parts = query.split("%s")
+        statement = parts[0] + "".join(f"${index}{part}" for index, part
+                                       in enumerate(parts[1:], 1))
+        with db_conn.cursor() as cursor:
+            cursor.execute(f"PREPARE {name} AS {statement}")
+        placeholders = ', '.join(['%s'] * (len(parts) - 1))
+        return name, f"EXECUTE {name} ({placeholders});"
+
+    def _deallocate(self, db_conn: Any, statement: Any) -> None:
+        name, _ = statement
+        with db_conn.cursor() as cursor:
+            cursor.execute(f"DEALLOCATE {name};")
+
     def query(self, query: str, params: List = None) -> (int, int):
         super().query(query, params)
+        db_conn, cursor = self._route(query)
         try:
             self.logger.debug("Query to execute is %s, params %s",
                               query,
                               params)
-            if params is not None:
-                self.cursor.execute(query, params)
+            prepared = self._get_prepared(db_conn, query, params)
+            if prepared is not None:
+                cursor.execute(prepared[1], params)
+            elif params is not None:
+                cursor.execute(query, params)
             else:
-                self.cursor.execute(query)
-            self.db_conn.commit()
+                cursor.execute(query)
+            if self._should_commit(query):
+                db_conn.commit()
+            self.logger.debug("Row count %s and last row id %s",
+                              cursor.rowcount,
+                              cursor.lastrowid)
+            return cursor.rowcount, cursor.lastrowid
+        except Error as err:
+            self._abort(db_conn)
+            self._raise_if_duplicate(err)
+            self.logger.critical("Unable to execute query in database!",
+                                 exc_info=True)
+            raise RuntimeError(
+                f"\nSomething went wrong with the query: {err}\n\n"
+            ) from err
+
+    def query_many(self, query: str, params_list: List[List]) -> (int, int):
+        super().query_many(query, params_list)
+        self._pin_primary()
+        self.read_from_replica = False
+        try:
+            self.logger.debug("Query to execute many times is %s, "
+                              "%s params", query, len(params_list))
+            self.cursor.executemany(query, params_list)
+            if self.transaction_depth == 0:
+                self.db_conn.commit()
             self.logger.debug("Row count %s and last row id %s",
                               self.cursor.rowcount,
                               self.cursor.lastrowid)
             return self.cursor.rowcount, self.cursor.lastrowid
         except Error as err:
+            self._abort(self.db_conn)
+            self._raise_if_duplicate(err)
             self.logger.critical("Unable to execute query in database!",
                                  exc_info=True)
             raise RuntimeError(
                 f"\nSomething went wrong with the query: {err}\n\n"
             ) from err
 
+    def iter_query(self, query: str, params: List = None,
+                   batch_size: int = 1000) -> Iterator[List[Any]]:
+        super().iter_query(query, params, batch_size)
+        db_conn, _ = self._route(query)
+        # Named cursors are server-side and only send the fetched rows
+        cursor = db_conn.cursor(name=f"nova_api_{uuid4().hex}")
+        cursor.itersize = batch_size
+        try:
+            self.logger.debug("Query to iterate is %s, params %s, batch "
+                              "size %s", query, params, batch_size)
+            cursor.execute(query, params)
+            rows = cursor.fetchmany(batch_size)
+            while rows:
+                yield rows
+                rows = cursor.fetchmany(batch_size)
+        except Error as err:
+            self._abort(db_conn)
+            self.logger.critical("Unable to execute query in database!",
+                                 exc_info=True)
+            raise RuntimeError(
+                f"\nSomething went wrong with the query: {err}\n\n"
+            ) from err
+        finally:
+            cursor.close()
+            # Ends the transaction opened by the named cursor
+            if self.transaction_depth == 0:
+                db_conn.commit()
+
+    def decode_uuid(self, value: Any) -> Any:
+        # The UUID input accepts the hex ids, but they're read with dashes
+        if isinstance(value, UUID):
+            return value.hex
+        return value.replace("-", "") if isinstance(value, str) else value
+
+    def _abort(self, db_conn: Any) -> None:
+        """Handles a failed statement, which aborts the whole transaction \
+        in PostgreSQL. Outside of a transaction, it's rolled back right away. \
+        Inside one, it's marked as failed to be rolled back when it ends.
+
+        :param db_conn: The connection that ran the statement
+        :return: None
+        """
+        if self.transaction_depth > 0 and db_conn is self.db_conn:
+            self.transaction_failed = True
+        else:
+            db_conn.rollback()
+
+    def _raise_if_duplicate(self, err: Error) -> None:
+        """Raises DuplicateEntityException if `err` is a unique violation.
+
+        :param err: The error raised by the database
+        :return: None
+        """
+        if getattr(err, "pgcode", None) == errorcodes.UNIQUE_VIOLATION:
+            self.logger.info("Duplicate key in database: %s", err)
+            raise DuplicateEntityException(debug=str(err)) from err
+
     def close(self) -> None:
         super().close()
         self.logger.info("Closing connection to database!")
         self.cursor.close()
         if self.pooled:
-            PostgreSQLPool.get_instance(
-                host=self.host, user=self.user,
-                database=self.database,
-                database_args=self.database_args).putconn(self.db_conn,
-                                                          key=id(self))
+            self.pool.put_connection(self.db_conn)
         else:
             self.db_conn.close()
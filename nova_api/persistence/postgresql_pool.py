@@ -4,9 +4,13 @@ import logging
 import os
 import re
 from dataclasses import dataclass, field
-from typing import ClassVar, Dict
+from typing import ClassVar, Dict, Optional
 
-from psycopg2 import pool
+import psycopg2
+
+from nova_api.persistence.connection_budget import ConnectionBudget
+from nova_api.persistence.connection_pool import ConnectionPool, \
+    optional_seconds
 
 
 @dataclass
@@ -16,14 +20,28 @@ class PostgreSQLPool:
         default=logging.getLogger("NovaAPILogger"))
 
     @classmethod
-    # pylint: disable=R0913
+    # pylint: disable=R0913,R0914
     def get_instance(cls, host: str = os.environ.get('DB_URL'),
                      user: str = os.environ.get('DB_USER'),
                      password: str = os.environ.get('DB_PASSWORD'),
                      database: str = os.environ.get('DB_NAME'),
-                     size: int = os.environ.get('MYSQL_POOL_SIZE', 5),
-                     database_args: dict = None) \
-            -> pool.SimpleConnectionPool:
+                     size: int = os.environ.get('POSTGRESQL_POOL_SIZE', 5),
+                     min_size: int = os.environ.get(
+                         'POSTGRESQL_POOL_MIN_SIZE', 1),
+                     database_args: dict = None,
+                     max_age: Optional[float] = os.environ.get(
+                         'DB_POOL_MAX_AGE', 3600),
+                     max_idle: Optional[float] = os.environ.get(
+                         'DB_POOL_MAX_IDLE', 600),
+                     pre_ping: bool = os.environ.get(
+                         'DB_POOL_PRE_PING', 'true').lower() != 'false',
+                     check_interval: Optional[float] = os.environ.get(
+                         'DB_POOL_CHECK_INTERVAL', 30),
+                     timeout: Optional[float] = os.environ.get(
+                         'DB_POOL_TIMEOUT', 10),
+                     max_connections: Optional[int] = os.environ.get(
+                         'DB_MAX_CONNECTIONS')) \
+            -> ConnectionPool:
         """
         Get an instance of a database connection pool.
 
@@ -38,16 +56,41 @@ class PostgreSQLPool:
         :param user: The database user to use
         :param password: The user password if necessary
         :param database: The database name to use
-        :param size: Number of connections to keep in the pool. \
-        Defaults to 5.
-        :param database_args: Extra options to pass to database connection.
+        :param size: Maximum number of connections open at the same time. \
+        Defaults to 5. May be set through the env variable \
+        POSTGRESQL_POOL_SIZE.
+        :param min_size: Number of connections kept open. Defaults to 1. \
+        May be set through the env variable POSTGRESQL_POOL_MIN_SIZE.
+        :param database_args: Extra options to pass to database connection. \
+        `minconn` and `maxconn`, as used by the psycopg2 pools, override \
+        `min_size` and `size`.
+        :param max_age: Seconds after which a connection is recycled. \
+        Defaults to 3600. May be set through the env variable \
+        DB_POOL_MAX_AGE.
+        :param max_idle: Seconds after which an idle connection is \
+        evicted. Defaults to 600. May be set through the env variable \
+        DB_POOL_MAX_IDLE.
+        :param pre_ping: Whether to ping the connections before handing \
+        them out. Defaults to True. May be set through the env variable \
+        DB_POOL_PRE_PING.
+        :param check_interval: Seconds between the background eviction and \
+        replenishment of connections. Defaults to 30. May be set through the \
+        env variable DB_POOL_CHECK_INTERVAL.
+        :param timeout: Seconds to wait for a connection when all of them \
+        are in use. Defaults to 10. 0 fails immediately and an empty value \
+        waits indefinitely. May be set through the env variable \
+        DB_POOL_TIMEOUT.
+        :param max_connections: Maximum number of connections to the \
+        database server opened by all the processes of the host, as the \
+        uWSGI workers. Disabled by default. May be set through the env \
+        variable DB_MAX_CONNECTIONS.
         :return: The connection pool instance
         """
         if database_args is None:
             database_args = {}
-
-        if database_args.get("minconn", None) is None:
-            database_args.update({"minconn": size})
+        database_args = dict(database_args)
+        min_size = int(database_args.pop("minconn", min_size))
+        size = int(database_args.pop("maxconn", size))
 
         pool_name = user + "_" + host + "-" + database
         # This guarantees
@@ -63,14 +106,43 @@ class PostgreSQLPool:
             return instance
 
         cls.logger.info("Pool not connected, instantiating: %s", pool_name)
-        instance = pool.SimpleConnectionPool(
-            maxconn=size,
-            host=host,
-            database=database,
-            user=user,
-            password=password,
-            **database_args)
+        budget = ConnectionBudget.get_instance(host, int(max_connections)) \
+            if max_connections else None
+        instance = ConnectionPool(
+            name=pool_name,
+            connect=lambda: psycopg2.connect(host=host,
+                                             database=database,
+                                             user=user,
+                                             password=password,
+                                             **database_args),
+            ping=_ping,
+            reset=lambda connection: connection.rollback(),
+            min_size=min_size,
+            max_size=size,
+            max_age=optional_seconds(max_age),
+            max_idle=optional_seconds(max_idle),
+            pre_ping=pre_ping,
+            check_interval=optional_seconds(check_interval),
+            timeout=None if timeout in (None, '') else float(timeout),
+            budget=budget)
         cls.instances[pool_name] = instance
 
         cls.logger.info("Pool instantiated: %s", pool_name)
         return instance
+
+
+def _ping(connection) -> bool:
+    """Checks that a connection is alive with a trivial query.
+
+    :param connection: The psycopg2 connection
+    :return: True if the query succeeded
+    """
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
@@ -0,0 +1,35 @@
+"""Server-side prepared statements of each database connection.
+
+The statements are kept with the connection they were prepared in, so \
+they're reused by every helper that borrows the connection from a pool and \
+dropped with it when it's closed.
+"""
+from collections import OrderedDict
+from typing import Any
+from weakref import WeakKeyDictionary
+
+_statements: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def get_statements(connection: Any) -> OrderedDict:
+    """Returns the statements prepared in a connection, from the least to \
+    the most recently used, keyed by the query.
+
+    :param connection: The database connection
+    :return: The statements of the connection
+    """
+    statements = _statements.get(connection)
+    if statements is None:
+        statements = OrderedDict()
+        _statements[connection] = statements
+    return statements
+
+
+def clear_statements(connection: Any) -> None:
+    """Forgets the statements of a connection, as when its session is \
+    reset and the database deallocates them.
+
+    :param connection: The database connection
+    :return: None
+    """
+    _statements.pop(connection, None)
@@ -0,0 +1,130 @@
+"""Selection of the read replicas used by the persistence helpers"""
+from __future__ import annotations
+
+import threading
+from typing import ClassVar, Dict, Iterable, List, Optional, Tuple, Union
+
+from flask import g, has_app_context
+
+ROUND_ROBIN = "round_robin"
+LEAST_CONNECTIONS = "least_connections"
+STRATEGIES = (ROUND_ROBIN, LEAST_CONNECTIONS)
+
+
+def parse_hosts(hosts: Union[str, Iterable[str], None]) -> List[str]:
+    """Reads a list of hosts, as the comma separated list of the env \
+    variable DB_REPLICA_URLS.
+
+    :param hosts: The hosts as a list or a comma separated string
+    :return: The list of hosts, without empty items
+    """
+    if hosts is None:
+        return []
+    if isinstance(hosts, str):
+        hosts = hosts.split(",")
+    return [host.strip() for host in hosts if host and host.strip()]
+
+
+def is_read_query(query: str) -> bool:
+    """Returns whether a query only reads data, so it may run in a replica. \
+    Locking reads, as `SELECT ... FOR UPDATE`, must run in the primary.
+
+    :param query: The query to classify
+    :return: True if the query may run in a replica
+    """
+    statement = query.lstrip().upper()
+    return statement.startswith("SELECT") \
+        and " FOR UPDATE" not in statement \
+        and " FOR SHARE" not in statement \
+        and " LOCK IN SHARE MODE" not in statement
+
+
+def pin_primary() -> None:
+    """Sends the reads of the current request to the primary, so all the \
+    helpers used by it read the writes made by any of them. Does nothing \
+    outside of an app context.
+
+    :return: None
+    """
+    if has_app_context():
+        g.nova_api_primary_pinned = True
+
+
+def is_primary_pinned() -> bool:
+    """Returns whether `pin_primary` was called in the current request.
+
+    :return: True if the reads must run in the primary
+    """
+    return has_app_context() and g.get("nova_api_primary_pinned", False)
+
+
+class ReplicaSet:
+    """Chooses the replica that runs each read.
+
+    The strategies are:
+     * *round_robin*: Uses each replica in turn.
+     * *least_connections*: Uses the replica with the least connections \
+     in use by the process.
+
+    :param hosts: The replica hosts
+    :param strategy: One of `STRATEGIES`
+    """
+    instances: ClassVar[Dict[Tuple[Tuple[str, ...], str], ReplicaSet]] = {}
+    lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self, hosts: List[str], strategy: str = ROUND_ROBIN) -> None:
+        if not hosts:
+            raise ValueError("A replica set needs at least one host.")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Replica strategy {strategy} not supported. "
+                             f"Use one of {', '.join(STRATEGIES)}.")
+        self.hosts = list(hosts)
+        self.strategy = strategy
+        self.in_use = dict.fromkeys(self.hosts, 0)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls, hosts: Union[str, Iterable[str]],
+                     strategy: str = ROUND_ROBIN) -> Optional[ReplicaSet]:
+        """Gets the replica set of the hosts, creating it in the first call, \
+        so the helpers of a process share the balancing.
+
+        :param hosts: The hosts as a list or a comma separated string
+        :param strategy: One of `STRATEGIES`
+        :return: The replica set or None if there are no hosts
+        """
+        hosts = parse_hosts(hosts)
+        if not hosts:
+            return None
+        key = (tuple(hosts), strategy)
+        with cls.lock:
+            instance = cls.instances.get(key)
+            if instance is None:
+                instance = cls(hosts, strategy)
+                cls.instances[key] = instance
+            return instance
+
+    def acquire(self) -> str:
+        """Chooses a replica for a new connection.
+
+        :return: The replica host, to be given to `release` when the \
+        connection is closed
+        """
+        with self._lock:
+            if self.strategy == LEAST_CONNECTIONS:
+                host = min(self.hosts, key=self.in_use.__getitem__)
+            else:
+                host = self.hosts[self._next]
+                self._next = (self._next + 1) % len(self.hosts)
+            self.in_use[host] += 1
+            return host
+
+    def release(self, host: str) -> None:
+        """Records that a connection to a replica was closed.
+
+        :param host: The host returned by `acquire`
+        :return: None
+        """
+        with self._lock:
+            self.in_use[host] -= 1
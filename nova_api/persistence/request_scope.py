@@ -0,0 +1,100 @@
+"""Shares one persistence helper per database among the DAOs of a request.
+
+Once `add_request_scope` is called for an app, the `GenericSQLDAO` \
+instances created while handling a request don't open their own \
+connections. The first DAO of each database type and connection args \
+creates the helper and the following ones reuse it, so a handler that uses \
+several DAOs checks out a single connection. The helpers are closed when \
+the request ends.
+"""
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from flask import current_app, g, has_app_context
+
+from nova_api.persistence import PersistenceHelper
+
+EXTENSION = "nova_api_request_scope"
+
+
+def is_active() -> bool:
+    """Returns whether the helpers are shared in the current context.
+
+    :return: True if inside an app with the request scope enabled
+    """
+    return has_app_context() and current_app.extensions.get(EXTENSION, False)
+
+
+def _get_registry() -> Dict[Tuple[Type[PersistenceHelper], str],
+                            PersistenceHelper]:
+    """Returns the helpers of the current context, keyed by their type and \
+    connection args.
+
+    :return: The registry of the current context
+    """
+    if "nova_api_databases" not in g:
+        g.nova_api_databases = {}
+    return g.nova_api_databases
+
+
+def get_database(database_type: Type[PersistenceHelper],
+                 **kwargs: Any) -> PersistenceHelper:
+    """Returns the helper of the current context for the database, \
+    connecting in the first call.
+
+    :param database_type: The persistence helper class
+    :param kwargs: The args to create the helper
+    :return: The shared helper
+    """
+    registry = _get_registry()
+    key = (database_type, repr(sorted(kwargs.items())))
+    database = registry.get(key)
+    if database is None:
+        database = database_type(**kwargs)
+        registry[key] = database
+    return database
+
+
+def detach() -> Callable[[], None]:
+    """Removes the helpers from the current context, so they aren't closed \
+    when it ends, as when they're still used by a streamed response.
+
+    :return: Function without arguments that closes the detached helpers
+    """
+    databases = list(g.pop("nova_api_databases", {}).values())
+    return lambda: _close(databases)
+
+
+# pylint: disable=W0613
+def release_databases(exception: Optional[BaseException] = None) -> None:
+    """Closes the helpers of the current context. Registered as a \
+    teardown function of the app by `add_request_scope`.
+
+    :param exception: The exception that ended the context, if any
+    :return: None
+    """
+    _close(g.pop("nova_api_databases", {}).values())
+
+
+def _close(databases) -> None:
+    """Closes the helpers, logging the ones that fail.
+
+    :param databases: The helpers to close
+    :return: None
+    """
+    for database in databases:
+        try:
+            database.close()
+        except Exception:  # pylint: disable=W0703
+            database.logger.error("Unable to close request database.",
+                                  exc_info=True)
+
+
+def add_request_scope(app) -> None:
+    """Enables sharing the helpers among the DAOs of each request of an app.
+
+    :param app: The connexion or flask app
+    :return: None
+    """
+    flask_app = getattr(app, "app", app)
+    flask_app.extensions[EXTENSION] = True
+    flask_app.teardown_appcontext(release_databases)
@@ -24,7 +24,8 @@ setuptools.setup(
     ],
     extras_require={
         'postgresql': ['psycopg2-binary'],
-        'mongo': ['pymongo >= 3.12, < 4.0', 'python-dateutil']
+        'mongo': ['pymongo >= 3.12, < 4.0', 'python-dateutil'],
+        'json': ['orjson']
     },
     classifiers=[
         "Programming Language :: Python :: 3",
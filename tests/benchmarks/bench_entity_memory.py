@@ -0,0 +1,60 @@
+"""Compares the memory used by regular and slotted entities.
+
+Run with ``python tests/benchmarks/bench_entity_memory.py [amount]``.
+"""
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from datetime import date
+
+from nova_api.entity import Entity, entity
+
+
+@dataclass
+class Contact(Entity):
+    first_name: str = None
+    last_name: str = None
+    email: str = None
+    birthday: date = None
+
+
+@entity(slots=True)
+class SlottedContact(Entity):
+    first_name: str = None
+    last_name: str = None
+    email: str = None
+    birthday: date = None
+
+
+def measure(entity_class: type, amount: int) -> int:
+    """Returns the bytes allocated to keep `amount` instances in memory.
+
+    :param entity_class: The entity class to instantiate
+    :param amount: The number of instances
+    :return: The allocated bytes
+    """
+    tracemalloc.start()
+    snapshot = tracemalloc.take_snapshot()
+    entities = [entity_class(first_name="John", last_name="Doe",
+                             email="john@doe.com",
+                             birthday=date(2000, 1, 1))
+                for _ in range(amount)]
+    allocated = sum(stat.size_diff for stat in
+                    tracemalloc.take_snapshot().compare_to(snapshot,
+                                                           "filename"))
+    tracemalloc.stop()
+    del entities
+    return allocated
+
+
+def main(amount: int) -> None:
+    regular = measure(Contact, amount)
+    slotted = measure(SlottedContact, amount)
+    print(f"{amount} entities")
+    print(f"regular: {regular / amount:.0f} bytes per entity")
+    print(f"slotted: {slotted / amount:.0f} bytes per entity")
+    print(f"saved:   {1 - slotted / regular:.0%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,74 @@
+"""Measures the time of a list request with each log level.
+
+Run with ``python tests/benchmarks/bench_logging.py [rows] [repeat]``.
+"""
+import io
+import logging
+import sys
+import timeit
+from dataclasses import dataclass
+from datetime import date
+
+from flask import Flask
+
+import nova_api
+from nova_api.dao.generic_sql_dao import GenericSQLDAO
+from nova_api.entity import Entity
+from nova_api.persistence.mysql_helper import MySQLHelper
+
+
+@dataclass
+class Contact(Entity):
+    first_name: str = None
+    last_name: str = None
+    birthday: date = None
+
+
+class FakeDatabase:
+    """Database stub that returns the same rows for every query."""
+    ALLOWED_COMPARATORS = MySQLHelper.ALLOWED_COMPARATORS
+    SELECT_QUERY = MySQLHelper.SELECT_QUERY
+    FILTERS = MySQLHelper.FILTERS
+    FILTER = MySQLHelper.FILTER
+    SUPPORTS_WINDOW_COUNT = False
+
+    def __init__(self, rows: list) -> None:
+        self.rows = rows
+
+    def query(self, query: str, params: list = None) -> tuple:
+        return len(self.rows), 0
+
+    def get_results(self) -> list:
+        return self.rows
+
+
+def list_contacts(dao: GenericSQLDAO) -> None:
+    """Runs the same calls as the generated `read` endpoint."""
+    total, results = dao.get_all(length=len(dao.database.rows),
+                                 filters={"last_name": "Doe"},
+                                 count_mode="none")
+    nova_api.success_response(
+        data={"total": total,
+              "results": [nova_api.serialize_entity(result)
+                          for result in results]})
+
+
+def main(rows: int, repeat: int) -> None:
+    logging.basicConfig(stream=io.StringIO())
+    database = FakeDatabase([
+        [f"{index:032x}", None, None, "John", "Doe", date(2000, 1, 1)]
+        for index in range(rows)])
+    dao = GenericSQLDAO(database_instance=database, return_class=Contact)
+
+    with Flask(__name__).test_request_context():
+        for level in ("DEBUG", "INFO", "PRODUCTION"):
+            nova_api.set_log_level(level)
+            seconds = min(timeit.repeat(lambda: list_contacts(dao),
+                                        number=repeat, repeat=3)) / repeat
+            print(f"{level:<10} {seconds * 1000:.3f} ms per request "
+                  f"of {rows} rows")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200)
@@ -1,7 +1,10 @@
-from dataclasses import fields
+import dataclasses
 
 from nova_api.dao.generic_sql_dao import GenericSQLDAO
-from nova_api import error_response, success_response, use_dao
+from nova_api.exceptions import EntityNotFoundException, \
+    NoRowsAffectedException
+from nova_api import error_response, serialize_columns, \
+    serialize_entity, streaming_response, success_response, use_dao
 
 from EntityDAO import EntityDAO
 from EntityForTest import EntityForTest
@@ -15,11 +18,13 @@ def probe(dao: GenericSQLDAO = None):
 
 
 @use_dao(EntityDAO, "Unable to list entityfortest")
-def read(length: int = 20, offset: int = 0,
-         dao: GenericSQLDAO = None, **kwargs):
+def read(length: int = 20, offset: int = 0, cursor: str = None,
+         fields: str = None, sort: str = None, stream: str = None,
+         columnar: bool = False, dao: GenericSQLDAO = None, **kwargs):
     filters = dict()
+    selected = fields.split(',') if fields else None
 
-    entity_attributes = [field.name for field in fields(EntityForTest)]
+    entity_attributes = [field.name for field in dataclasses.fields(EntityForTest)]
 
     for key, value in kwargs.items():
         if key not in entity_attributes:
@@ -30,17 +35,40 @@ def read(length: int = 20, offset: int = 0,
                            and str(value).split(',')[0] in dao.database.ALLOWED_COMPARATORS \
                        else value
 
+    if stream:
+        return streaming_response(
+            dao.iter_all(filters=filters if filters else None,
+                         fields=selected),
+            message="List of entityfortest",
+            ndjson=stream == "ndjson", fields_=selected)
+
+    if columnar:
+        total, columns = dao.get_all_columnar(
+            length=length, offset=offset,
+            filters=filters if filters else None, fields=selected,
+            sort=sort.split(',') if sort else None)
+        return success_response(message="List of entityfortest",
+                                data={"total": total,
+                                      "columns": serialize_columns(columns)})
+
     total, results = dao.get_all(length=length, offset=offset,
-                                 filters=filters if filters else None)
-    return success_response(message="List of entityfortest",
-                            data={"total": total, "results": [dict(result)
-                                                              for result
-                                                              in results]})
+                                 filters=filters if filters else None,
+                                 cursor=cursor, fields=selected,
+                                 sort=sort.split(',') if sort else None)
+
+    data = {"total": total,
+            "results": [serialize_entity(result, selected)
+                        for result in results]}
+    if cursor is not None:
+        data["next_cursor"] = dao.next_cursor(results, length)
+
+    return success_response(message="List of entityfortest", data=data)
 
 
 @use_dao(EntityDAO, "Unable to retrieve entityfortest")
-def read_one(id_: str, dao: GenericSQLDAO = None):
-    result = dao.get(id_=id_)
+def read_one(id_: str, fields: str = None, dao: GenericSQLDAO = None):
+    selected = fields.split(',') if fields else None
+    result = dao.get(id_=id_, fields=selected)
 
     if not result:
         return success_response(status_code=404,
@@ -48,7 +76,8 @@ def read_one(id_: str, dao: GenericSQLDAO = None):
                                 data={"id_": id_})
 
     return success_response(message="EntityForTest retrieved",
-                            data={"EntityForTest": dict(result)})
+                            data={"EntityForTest": serialize_entity(result,
+                                                                selected)})
 
 
 @use_dao(EntityDAO, "Unable to create entityfortest")
@@ -63,6 +92,7 @@ def create(entity: dict, dao: GenericSQLDAO = None):
 
 @use_dao(EntityDAO, "Unable to update entityfortest")
 def update(id_: str, entity: dict, dao: GenericSQLDAO = None):
+    # The received fields are merged into the current values
     entity_to_update = dao.get(id_)
 
     if not entity_to_update:
@@ -78,7 +108,7 @@ def update(id_: str, entity: dict, dao: GenericSQLDAO = None):
                            .format(key=key,
                                    entity=dao.return_class))
 
-        entity_to_update.__dict__[key] = value
+        setattr(entity_to_update, key, value)
 
     dao.update(entity_to_update)
 
@@ -88,6 +118,18 @@ def update(id_: str, entity: dict, dao: GenericSQLDAO = None):
 
 @use_dao(EntityDAO, "Unable to delete entityfortest")
 def delete(id_: str, dao: GenericSQLDAO):
+    if dao.rely_on_constraints:
+        # A single DELETE, which reports the missing entities
+        try:
+            dao.remove(filters={"id_": id_})
+        except (EntityNotFoundException, NoRowsAffectedException):
+            return error_response(status_code=404,
+                                  message="EntityForTest not found",
+                                  data={"id_": id_})
+
+        return success_response(message="EntityForTest deleted",
+                                data={"EntityForTest": {"id_": id_}})
+
     entity = dao.get(id_=id_)
 
     if not entity:
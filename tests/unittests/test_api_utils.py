@@ -1,6 +1,9 @@
+import logging
 import os
 import time
-from json import dumps
+from array import array
+from datetime import datetime
+from json import loads
 from os.path import isfile as is_file
 
 from EntityDAO import EntityDAO
@@ -11,7 +14,8 @@ from mock import Mock, call
 from pytest import mark, raises
 
 import nova_api
-from nova_api.exceptions import NovaAPIException
+from nova_api import encoder
+from nova_api.exceptions import InvalidFieldsException, NovaAPIException
 
 NOVA_API_ERROR_RESPONSE = "nova_api.error_response"
 SAMPLE_ERROR_MESSAGE = "A error test"
@@ -33,20 +37,40 @@ class TestAPIUtils:
                               success, status_code):
         make_response_patch = mocker.patch("nova_api.make_response",
                                            return_value=message)
-        mocker.patch("nova_api.jsonify",
-                     side_effect=lambda *args: dumps(*args))
 
         ret_val = nova_api.default_response(success,
                                             status_code,
                                             message,
                                             data)
         assert make_response_patch.mock_calls == [
-            call(dumps({"success": success, "message": message, "data": data}),
+            call(encoder.dumps({"success": success, "message": message,
+                                "data": data}),
                  status_code,
                  {'Content-type': 'application/json'})
         ]
+        assert loads(make_response_patch.call_args[0][0]) == {
+            "success": success, "message": message, "data": data}
         assert ret_val == message
 
+    def test_default_response_should_log_payload_in_debug(self, mocker,
+                                                          caplog):
+        mocker.patch("nova_api.make_response")
+
+        with caplog.at_level(logging.DEBUG, logger="NovaAPILogger"):
+            nova_api.default_response(True, 200, "OK", {"test": 1})
+
+        assert caplog.messages[-1] == \
+            'Message sent: {"success":true,"message":"OK","data":{"test":1}}'
+
+    def test_default_response_should_encode_entities(self, mocker):
+        make_response_patch = mocker.patch("nova_api.make_response")
+        entity = EntityForTest(test_field=1)
+
+        nova_api.default_response(True, 200, "OK", {"entity": entity})
+
+        assert loads(make_response_patch.call_args[0][0])["data"] == {
+            "entity": dict(entity)}
+
     @mark.parametrize("data", [None, {"test": "mydata"}])
     def test_success_response(self, mocker, data):
         default_response_mock = mocker.patch("nova_api.default_response",
@@ -71,6 +95,38 @@ class TestAPIUtils:
                  message="Error",
                  data={} if data is None else data)])
 
+    @mark.parametrize("fields_, keys", [
+        (None, ["id_", "creation_datetime", "last_modified_datetime",
+                "test_field", "not_to_add_field"]),
+        (["test_field"], ["id_", "test_field"])
+    ])
+    def test_serialize_entity(self, fields_, keys):
+        entity = EntityForTest(test_field=1)
+        assert list(nova_api.serialize_entity(entity, fields_)) == keys
+
+    def test_serialize_columns(self):
+        columns = {"test_field": array('q', [1, 2]),
+                   "creation_datetime": [datetime(2020, 1, 1), None]}
+
+        assert nova_api.serialize_columns(columns) == {
+            "test_field": [1, 2],
+            "creation_datetime": ["2020-01-01 00:00:00", None]}
+
+    @mark.parametrize("level, expected", [("production", logging.WARNING),
+                                          ("DEBUG", logging.DEBUG)])
+    def test_set_log_level(self, level, expected):
+        try:
+            nova_api.set_log_level(level)
+            assert logging.getLogger("NovaAPILogger").level == expected
+            assert logging.getLogger("nova_api").level == expected
+        finally:
+            for name in nova_api.LOGGERS:
+                logging.getLogger(name).setLevel(logging.NOTSET)
+
+    def test_set_log_level_invalid(self):
+        with raises(ValueError):
+            nova_api.set_log_level("VERBOSE")
+
     def test_use_dao_should_open_and_close_dao(self, mocker):
         my_mock = Mock()
 
@@ -81,6 +137,71 @@ class TestAPIUtils:
         ret = test_decorated_function()
         assert my_mock.mock_calls == [call(), call().close()] and ret
 
+    def test_use_dao_should_close_dao_after_stream(self):
+        my_mock = Mock()
+
+        @nova_api.use_dao(dao_class=my_mock, retries=1)
+        def test_decorated_function(dao=None):
+            return nova_api.streaming_response(dao.iter_all())
+
+        my_mock.return_value.iter_all.return_value = iter([])
+        response = test_decorated_function()
+        assert my_mock.mock_calls == [call(), call().iter_all()]
+
+        response.get_data()
+        response.close()
+        assert my_mock.mock_calls == [call(), call().iter_all(),
+                                      call().close()]
+
+    def test_use_dao_should_report_stream_errors(self, mocker):
+        my_mock = Mock()
+        my_mock.return_value.iter_all.side_effect = InvalidFieldsException()
+        mocker.patch(NOVA_API_ERROR_RESPONSE,
+                     side_effect=lambda *args, **kwargs: kwargs)
+
+        @nova_api.use_dao(dao_class=my_mock, retries=1)
+        def test_decorated_function(dao=None):
+            return nova_api.streaming_response(dao.iter_all(fields=["x"]))
+
+        ret = test_decorated_function()
+        assert ret["status_code"] == 400
+        assert my_mock.mock_calls == [call(), call().iter_all(fields=["x"]),
+                                      call().close()]
+
+    def test_streaming_response_json(self):
+        entities = [EntityForTest(test_field=1), EntityForTest(test_field=2)]
+
+        response = nova_api.streaming_response(iter(entities),
+                                               message="List",
+                                               fields_=["test_field"])
+
+        assert response.is_streamed
+        assert response.mimetype == "application/json"
+        assert response.get_json() == {
+            "success": True, "message": "List",
+            "data": {"results": [
+                {"id_": entities[0].id_, "test_field": 1},
+                {"id_": entities[1].id_, "test_field": 2}]}}
+
+    def test_streaming_response_ndjson(self):
+        entities = [EntityForTest(test_field=1), EntityForTest(test_field=2)]
+
+        response = nova_api.streaming_response(iter(entities), ndjson=True,
+                                               fields_=["test_field"])
+
+        assert response.mimetype == "application/x-ndjson"
+        assert [loads(line) for line in
+                response.get_data(as_text=True).splitlines()] == [
+            {"id_": entities[0].id_, "test_field": 1},
+            {"id_": entities[1].id_, "test_field": 2}]
+        assert response.get_data(as_text=True).endswith("\n")
+
+    def test_streaming_response_empty(self):
+        response = nova_api.streaming_response(iter([]))
+
+        assert response.get_json() == {"success": True, "message": "OK",
+                                       "data": {"results": []}}
+
     def test_use_dao_db_args(self, mocker):
         my_mock = Mock()
 
@@ -146,6 +267,20 @@ class TestAPIUtils:
         assert my_mock.mock_calls == [call(), call(), call()]
         assert end - start > 3
 
+    def test_use_dao_retry_should_log_in_debug(self, mocker, caplog):
+        my_mock = Mock(side_effect=ConnectionError("Teste"))
+        mocker.patch(NOVA_API_ERROR_RESPONSE,
+                     return_value="NOT OK")
+
+        @nova_api.use_dao(dao_class=my_mock, retries=2, retry_delay=0)
+        def test(**kwargs):
+            return kwargs.get('dao') == my_mock.return_value
+
+        with caplog.at_level(logging.DEBUG, logger="NovaAPILogger"):
+            assert test() == "NOT OK"
+
+        assert "Connection failed, will retry 1 times" in caplog.messages
+
     def test_use_dao_exception(self, mocker):
         my_mock = Mock()
         mocker.patch(NOVA_API_ERROR_RESPONSE,
@@ -0,0 +1,52 @@
+import os
+
+from pytest import fixture, raises
+
+from nova_api.persistence.connection_budget import ConnectionBudget
+
+
+class TestConnectionBudget:
+    @fixture
+    def budget(self, tmp_path):
+        return ConnectionBudget("db:3306", 2, str(tmp_path))
+
+    def test_acquire_should_respect_limit(self, budget):
+        first = budget.acquire()
+        second = budget.acquire()
+
+        assert first is not None and second is not None
+        assert budget.acquire() is None
+
+    def test_acquire_should_be_shared(self, budget, tmp_path):
+        other = ConnectionBudget("db:3306", 2, str(tmp_path))
+        budget.acquire()
+        budget.acquire()
+
+        assert other.acquire() is None
+        assert ConnectionBudget("other", 2, str(tmp_path)).acquire() \
+               is not None
+
+    def test_release(self, budget):
+        budget.acquire()
+        slot = budget.acquire()
+
+        budget.release(slot)
+
+        assert budget.acquire() is not None
+
+    def test_slot_files(self, budget, tmp_path):
+        budget.acquire()
+
+        assert os.listdir(tmp_path) == ["db_3306.0.lock"]
+
+    def test_invalid_limit(self, tmp_path):
+        with raises(ValueError):
+            ConnectionBudget("db", 0, str(tmp_path))
+
+    def test_get_instance(self, tmp_path):
+        budget = ConnectionBudget.get_instance("test_get_instance", 2,
+                                               str(tmp_path))
+
+        assert ConnectionBudget.get_instance("test_get_instance", 5) \
+               is budget
+        assert budget.limit == 2
@@ -0,0 +1,310 @@
+import threading
+import time
+
+from mock import Mock
+from pytest import fixture, mark, raises
+
+from nova_api.persistence import connection_pool
+from nova_api.persistence.connection_budget import ConnectionBudget
+from nova_api.persistence.connection_pool import ConnectionPool, \
+    Histogram, PoolExhaustedError, optional_seconds
+
+
+class TestConnectionPool:
+    @fixture
+    def clock(self, mocker):
+        clock = mocker.patch("nova_api.persistence.connection_pool"
+                             ".time.monotonic")
+        clock.return_value = 100.0
+        return clock
+
+    @fixture
+    def connect(self):
+        return Mock(side_effect=lambda: Mock(name="connection"))
+
+    @fixture
+    def ping(self):
+        return Mock(return_value=True)
+
+    @fixture
+    def pool(self, connect, ping, clock):
+        return ConnectionPool("test", connect, ping, reset=Mock(),
+                              min_size=1, max_size=2, max_age=60,
+                              max_idle=10)
+
+    def test_init_should_open_min_size(self, pool, connect):
+        assert connect.call_count == 1
+        assert pool.size == 1 and pool.idle == 1
+
+    @mark.parametrize("min_size, max_size", [(0, 0), (3, 2), (-1, 2)])
+    def test_init_invalid_size(self, connect, ping, min_size, max_size):
+        with raises(ValueError):
+            ConnectionPool("test", connect, ping, min_size=min_size,
+                           max_size=max_size)
+
+    def test_get_connection_should_reuse_idle(self, pool, connect, ping):
+        connection = pool.get_connection()
+        pool.put_connection(connection)
+
+        assert pool.get_connection() is connection
+        assert connect.call_count == 1
+        ping.assert_called_with(connection)
+        pool.reset.assert_called_once_with(connection)
+
+    def test_get_connection_should_replace_dead(self, pool, connect, ping):
+        ping.return_value = False
+
+        connection = pool.get_connection()
+
+        assert connect.call_count == 2
+        assert pool.size == 1
+        ping.assert_called_once()
+        dead = ping.call_args[0][0]
+        dead.close.assert_called_once_with()
+        assert connection is not dead
+
+    def test_get_connection_without_pre_ping(self, connect, ping, clock):
+        pool = ConnectionPool("test", connect, ping, min_size=1,
+                              pre_ping=False)
+
+        pool.get_connection()
+
+        ping.assert_not_called()
+        assert connect.call_count == 1
+
+    def test_get_connection_should_recycle_old(self, pool, connect, clock):
+        pool.put_connection(pool.get_connection())
+        clock.return_value = 161.0
+
+        pool.get_connection()
+
+        assert connect.call_count == 2
+
+    def test_get_connection_should_replace_idle(self, pool, connect, clock):
+        clock.return_value = 111.0
+
+        pool.get_connection()
+
+        assert connect.call_count == 2
+        assert pool.size == 1
+
+    def test_get_connection_exhausted(self, pool):
+        pool.get_connection()
+        pool.get_connection()
+
+        with raises(PoolExhaustedError):
+            pool.get_connection()
+
+    def test_get_connection_should_wait_for_returned(self, connect, ping):
+        pool = ConnectionPool("test", connect, ping, max_size=1, timeout=5)
+        connection = pool.get_connection()
+        timer = threading.Timer(0.05, pool.put_connection, [connection])
+        timer.start()
+
+        assert pool.get_connection() is connection
+        timer.join()
+        assert connect.call_count == 1
+
+    def test_get_connection_should_wait_for_discarded(self, connect, ping):
+        pool = ConnectionPool("test", connect, ping, max_size=1, timeout=5)
+        connection = pool.get_connection()
+        timer = threading.Timer(0.05, pool.put_connection, [connection],
+                                {"discard": True})
+        timer.start()
+
+        assert pool.get_connection() is not connection
+        timer.join()
+        assert connect.call_count == 2 and pool.size == 1
+
+    def test_get_connection_timeout(self, connect, ping):
+        pool = ConnectionPool("test", connect, ping, max_size=1, timeout=5)
+        pool.get_connection()
+        start = time.monotonic()
+
+        with raises(PoolExhaustedError):
+            pool.get_connection(timeout=0.05)
+        assert 0.05 <= time.monotonic() - start < 5
+
+    def test_get_connection_should_fail_when_closed_waiting(self, connect,
+                                                            ping):
+        pool = ConnectionPool("test", connect, ping, max_size=1,
+                              timeout=None)
+        pool.get_connection()
+        timer = threading.Timer(0.05, pool.close)
+        timer.start()
+
+        with raises(ConnectionError):
+            pool.get_connection()
+        timer.join()
+
+    def test_get_connection_connect_error(self, pool, connect):
+        pool.get_connection()
+        connect.side_effect = ConnectionError()
+
+        with raises(ConnectionError):
+            pool.get_connection()
+        assert pool.size == 1
+
+    def test_put_connection_discard(self, pool):
+        connection = pool.get_connection()
+
+        pool.put_connection(connection, discard=True)
+
+        connection.close.assert_called_once_with()
+        assert pool.size == 0 and pool.idle == 0
+
+    def test_put_connection_reset_error(self, pool):
+        connection = pool.get_connection()
+        pool.reset.side_effect = RuntimeError()
+
+        pool.put_connection(connection)
+
+        connection.close.assert_called_once_with()
+        assert pool.size == 0
+
+    def test_put_connection_unknown(self, pool):
+        connection = Mock()
+
+        pool.put_connection(connection)
+
+        connection.close.assert_called_once_with()
+        assert pool.size == 1 and pool.idle == 1
+
+    def test_evict_and_replenish(self, pool, connect, clock):
+        connection = pool.get_connection()
+        pool.put_connection(connection)
+        pool.put_connection(pool.get_connection())
+        clock.return_value = 111.0
+
+        assert pool.evict() == 1
+        assert pool.size == 0
+        connection.close.assert_called_once_with()
+        assert pool.replenish() == 1
+        assert pool.size == 1 and pool.idle == 1
+
+    def test_close(self, pool):
+        connection = pool.get_connection()
+        pool.put_connection(connection)
+
+        pool.close()
+
+        connection.close.assert_called_once_with()
+        with raises(ConnectionError):
+            pool.get_connection()
+
+    def test_close_should_close_returned_connections(self, pool):
+        connection = pool.get_connection()
+        pool.close()
+
+        pool.put_connection(connection)
+
+        connection.close.assert_called_once_with()
+
+    def test_background_check(self, connect, ping):
+        pool = ConnectionPool("test", connect, ping, min_size=1,
+                              max_idle=0.01, check_interval=0.01)
+        first = pool.get_connection()
+        pool.put_connection(first)
+
+        deadline = time.monotonic() + 5
+        while not first.close.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+        while pool.idle < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pool.close()
+
+        first.close.assert_called_once_with()
+        assert connect.call_count >= 2
+
+    def test_budget(self, connect, ping, tmp_path):
+        budget = ConnectionBudget("test", 1, str(tmp_path))
+        pool = ConnectionPool("test", connect, ping, min_size=1,
+                              budget=budget)
+        other = ConnectionPool("other", connect, ping, budget=budget,
+                               timeout=0.05)
+        connection = pool.get_connection()
+
+        with raises(PoolExhaustedError):
+            other.get_connection()
+        assert other.size == 0 and other.stats().timeouts == 1
+
+        pool.put_connection(connection, discard=True)
+        assert other.get_connection() is not None
+
+    def test_budget_should_not_block_replenish(self, connect, ping,
+                                               tmp_path):
+        budget = ConnectionBudget("test", 1, str(tmp_path))
+        ConnectionPool("test", connect, ping, min_size=1, budget=budget)
+
+        pool = ConnectionPool("other", connect, ping, min_size=1,
+                              budget=budget)
+
+        assert pool.size == 0 and connect.call_count == 1
+
+    def test_budget_connect_error(self, connect, ping, tmp_path):
+        budget = ConnectionBudget("test", 1, str(tmp_path))
+        pool = ConnectionPool("test", connect, ping, budget=budget)
+        connect.side_effect = ConnectionError()
+
+        with raises(ConnectionError):
+            pool.get_connection()
+        assert budget.acquire() is not None
+
+    def test_after_fork(self, pool, connect, tmp_path):
+        pool.budget = ConnectionBudget("test", 2, str(tmp_path))
+        pool.budget.release = Mock()
+        connection = pool.get_connection()
+        pool._in_use[id(connection)].slot = 10
+
+        connection_pool._after_fork_in_child()
+
+        pool.budget.release.assert_called_once_with(10)
+        connection.close.assert_not_called()
+        assert pool.size == 0 and pool.idle == 0
+        assert pool.stats().checkouts == 0
+        pool.put_connection(connection)
+        connection.close.assert_called_once_with()
+        assert pool.get_connection() is not connection
+
+    def test_stats(self, pool, connect, clock):
+        connection = pool.get_connection()
+        other = pool.get_connection()
+        with raises(PoolExhaustedError):
+            pool.get_connection()
+        clock.return_value = 130.0
+        pool.put_connection(other, discard=True)
+
+        stats = pool.stats()
+
+        assert (stats.name, stats.max_size, stats.size, stats.in_use,
+                stats.idle) == ("test", 2, 1, 1, 0)
+        assert (stats.checkouts, stats.timeouts, stats.created,
+                stats.closed) == (2, 1, 2, 1)
+        assert stats.wait_time.count == 2 and stats.wait_time.total == 0
+        assert stats.lifetime.count == 1 and stats.lifetime.total == 30
+        pool.put_connection(connection)
+        assert stats.in_use == 1 and pool.stats().in_use == 0
+
+    def test_instances(self, connect, ping):
+        pool = ConnectionPool("test", connect, ping)
+        assert pool in ConnectionPool.instances
+
+        pool.close()
+        assert pool not in ConnectionPool.instances
+
+    def test_histogram(self):
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 20):
+            histogram.observe(value)
+        copy = histogram.copy()
+        histogram.observe(2)
+
+        assert copy.cumulative() == [(1, 2), (10, 3), (float("inf"), 4)]
+        assert copy.count == 4 and copy.total == 26.5
+        assert histogram.count == 5
+
+    @mark.parametrize("value, expected", [(None, None), ("", None),
+                                          ("0", None), (0, None),
+                                          ("30", 30.0), (1.5, 1.5)])
+    def test_optional_seconds(self, value, expected):
+        assert optional_seconds(value) == expected
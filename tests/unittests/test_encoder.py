@@ -0,0 +1,83 @@
+from array import array
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from json import loads
+
+from pytest import fixture, mark, raises
+
+from nova_api import encoder
+from nova_api.entity import Entity
+from tests.unittests import TestEntity, TestEntityWithChild
+
+
+class Color(Enum):
+    RED = "red"
+
+
+@dataclass
+class PricedEntity(Entity):
+    price: float = 0.0
+
+
+class TestEncoder:
+    @fixture(params=sorted(encoder.BACKENDS))
+    def backend(self, request):
+        encoder.set_backend(request.param)
+        yield request.param
+        encoder.set_backend()
+
+    def test_dumps_should_encode_native_values(self, backend):
+        value = {"text": "ação", "number": 1.5, "list": [1, None, True]}
+
+        assert loads(encoder.dumps(value)) == value
+
+    def test_dumps_should_encode_dates_and_enums(self, backend):
+        value = {"datetime": datetime(2020, 1, 2, 3, 4, 5),
+                 "date": date(2020, 1, 2),
+                 "enum": Color.RED,
+                 "array": array('q', [1, 2])}
+
+        assert loads(encoder.dumps(value)) == {
+            "datetime": "2020-01-02 03:04:05",
+            "date": "2020-01-02",
+            "enum": "red",
+            "array": [1, 2]}
+
+    def test_dumps_should_encode_entities(self, backend):
+        entity = TestEntityWithChild()
+
+        assert loads(encoder.dumps({"entity": entity})) == {
+            "entity": dict(entity)}
+        assert loads(encoder.dumps(entity))["child_id_"] == entity.child.id_
+
+    def test_dumps_should_encode_decimals(self, backend):
+        entity = PricedEntity.from_db(["a59d80c8c5694e08a25b625a745d24e0",
+                                       Decimal("10.50")], ["id_", "price"])
+
+        assert loads(encoder.dumps({"price": Decimal("1.5")})) == {
+            "price": "1.5"}
+        assert loads(encoder.dumps(entity))["price"] == "10.50"
+
+    def test_dumps_should_raise_unknown_types(self, backend):
+        with raises(TypeError):
+            encoder.dumps({"value": object()})
+
+    def test_set_backend_should_accept_functions(self):
+        encoder.set_backend(lambda value: b"encoded")
+        try:
+            assert encoder.dumps(TestEntity()) == b"encoded"
+        finally:
+            encoder.set_backend()
+
+    @mark.parametrize("backend", ["not_a_backend", "simplejson"])
+    def test_set_backend_should_raise_unavailable(self, backend):
+        with raises(ValueError):
+            encoder.set_backend(backend)
+
+    def test_default_backend_should_be_the_fastest_available(self):
+        encoder.set_backend()
+        expected = next(name for name in ("orjson", "ujson", "json")
+                        if name in encoder.BACKENDS)
+        assert encoder._dumps is encoder.BACKENDS[expected]
@@ -8,7 +8,8 @@ from typing import List
 from pytest import fixture, raises
 
 from nova_api.validations import *
-from nova_api.entity import Entity
+from nova_api.entity import Entity, entity, generate_time_ordered_id, \
+    get_db_fields_info, get_fields_info
 from nova_api.exceptions import InvalidAttributeException
 
 
@@ -110,6 +111,21 @@ class EntityForTestWithDefaultValidations(Entity):
                         metadata={'validation': validate_with_custom_exception})
 
 
+@entity(slots=True)
+class SlottedEntity(Entity):
+    name: str = field(default='Anom', metadata={'validation': has_max_length})
+    birthday: date = None
+    child: SampleEntity = None
+
+    def describe(self):
+        return f"{self.name} {super().__repr__()}"
+
+
+@entity(slots=True)
+class SlottedChildEntity(SlottedEntity):
+    age: int = 0
+
+
 class TestEntity:
 
     @fixture
@@ -123,6 +139,14 @@ class TestEntity:
     def test_auto_generate_id(self, entity):
         assert len(entity.id_) == 32
 
+    def test_generate_time_ordered_id(self):
+        first = generate_time_ordered_id()
+        ids = [generate_time_ordered_id() for _ in range(10)]
+
+        assert all(len(id_) == 32 and id_[12] == '7' and id_[16] in '89ab'
+                   for id_ in ids)
+        assert first[:12] <= min(id_[:12] for id_ in ids)
+
     def test_datetime_generation(self, entity):
         assert isinstance(entity.creation_datetime, datetime) \
                and isinstance(entity.last_modified_datetime, datetime)
@@ -246,3 +270,105 @@ class TestEntity:
 
         with raises(MyCustomException):
             EntityForTestWithDefaultValidations(status='invalid')
+
+    def test_from_db_converts_values(self):
+        ent = EntityForTest.from_db(
+            ["12345678901234567890123456789012",
+             datetime(2020, 1, 1, 0, 0, 0),
+             "2020-01-02 00:00:00",
+             3,
+             datetime(2020, 1, 3, 12, 0, 0),
+             "12345678901234567890123456789013"],
+            ["id_", "creation_datetime", "last_modified_datetime",
+             "test_field", "my_date", "child"])
+
+        assert ent == EntityForTest("12345678901234567890123456789012",
+                                    test_field=3, my_date=date(2020, 1, 3),
+                                    child=SampleEntity(
+                                        "12345678901234567890123456789013"))
+        assert ent.last_modified_datetime == datetime(2020, 1, 2)
+
+    def test_from_db_uses_defaults(self):
+        ent = EntityForTestWithEnum2.from_db(
+            ["12345678901234567890123456789012", 2], ["id_", "value"])
+
+        assert ent.value == TestEnum.VALUE2
+        assert ent.name is None
+        assert isinstance(ent.creation_datetime, datetime)
+        assert list(dict(ent)) == ["id_", "creation_datetime",
+                                   "last_modified_datetime", "name",
+                                   "value"]
+
+    def test_from_db_skips_validation(self):
+        ent = EntityForTestWithValidation.from_db(["not json"], ["my_json"])
+        assert ent.my_json == "not json"
+
+    def test_fields_info_is_compiled_once(self):
+        fields_info = get_fields_info(EntityForTestWithValidation)
+
+        assert get_fields_info(EntityForTestWithValidation) is fields_info
+        assert list(fields_info) == ["id_", "creation_datetime",
+                                     "last_modified_datetime", "my_json"]
+        assert fields_info["id_"].primary_key
+        assert fields_info["id_"].db_type == "CHAR(32)"
+        assert fields_info["my_json"].validator is is_valid_json
+
+    def test_db_fields_info_skips_non_database_fields(self):
+        @dataclass
+        class EntityWithNonDatabaseField(Entity):
+            saved: str = None
+            not_saved: str = field(default=None,
+                                   metadata={"database": False})
+
+        assert [field_info.name for field_info in
+                get_db_fields_info(EntityWithNonDatabaseField)] == [
+            "id_", "creation_datetime", "last_modified_datetime", "saved"]
+
+    def test_slotted_entity_has_no_dict(self):
+        ent = SlottedEntity(name=" John ", birthday="2020-01-02")
+
+        assert not hasattr(ent, "__dict__")
+        assert ent.name == "John"
+        assert ent.birthday == date(2020, 1, 2)
+        assert isinstance(ent, Entity)
+        assert SlottedEntity.__slots__ == ("id_", "creation_datetime",
+                                           "last_modified_datetime", "name",
+                                           "birthday", "child")
+
+    def test_slotted_entity_keeps_validation(self):
+        ent = SlottedEntity()
+
+        with raises(InvalidAttributeException):
+            ent.name = "some loooong name"
+        with raises(AttributeError):
+            ent.not_here = True
+
+    def test_slotted_entity_serialization(self):
+        ent = SlottedEntity("12345678901234567890123456789012",
+                            datetime(2020, 1, 1), datetime(2020, 1, 1),
+                            child=SampleEntity(
+                                "12345678901234567890123456789013"))
+
+        assert dict(ent) == {"id_": "12345678901234567890123456789012",
+                             "creation_datetime": "2020-01-01 00:00:00",
+                             "last_modified_datetime": "2020-01-01 00:00:00",
+                             "name": "Anom",
+                             "birthday": None,
+                             "child_id_": "12345678901234567890123456789013"}
+        assert ent.get_db_values()[3:] == [
+            "Anom", None, "12345678901234567890123456789013"]
+        assert SlottedEntity.from_db(["12345678901234567890123456789012"],
+                                     ["id_"]).name == "Anom"
+
+    def test_slotted_entity_inheritance(self):
+        ent = SlottedChildEntity(age=3)
+
+        assert SlottedChildEntity.__slots__ == ("age",)
+        assert not hasattr(ent, "__dict__")
+        assert ent.describe().startswith("Anom SlottedChildEntity(")
+
+    def test_slotted_entity_requires_slotted_bases(self):
+        with raises(TypeError):
+            @entity(slots=True)
+            class InvalidSlottedEntity(SampleEntity):
+                name: str = None
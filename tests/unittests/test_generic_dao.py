@@ -1,3 +1,4 @@
+from array import array
 from dataclasses import dataclass
 from typing import List
 
@@ -21,6 +22,12 @@ class TestEntity2(Entity):
     first_name: str = ""
 
 
+@dataclass
+class TestNumbersEntity(Entity):
+    age: int = 0
+    score: float = 0.0
+
+
 class MyDAO(GenericDAO):
     def __init__(self, **kwargs):
         super().__init__(return_class=TestEntity, **kwargs)
@@ -79,6 +86,11 @@ class MyDAOWithEntries(GenericDAO):
         super().close()
 
 
+class MyNumbersDAO(MyDAO):
+    def __init__(self):
+        GenericDAO.__init__(self, return_class=TestNumbersEntity)
+
+
 class MySecondDAO(GenericDAO):
     pass
 
@@ -116,6 +128,10 @@ class TestGenericDAO:
         with raises(InvalidIDException):
             dao.get(id_)
 
+    def test_get_should_accept_uuid7(self):
+        dao = MyDAO()
+        assert dao.get("01a148f894627f9da07853e488c13a86") is None
+
     def test_get_all(self):
         dao = MyDAO()
         with raises(NotImplementedError):
@@ -212,3 +228,25 @@ class TestGenericDAO:
         dao = MyDAO()
         with raises(NotImplementedError):
             dao.close()
+
+    def test_get_all_columnar_not_implemented(self):
+        dao = MyDAO()
+        with raises(NotImplementedError):
+            dao.get_all_columnar()
+
+    def test_build_columns(self):
+        dao = MyNumbersDAO()
+
+        columns = dao._build_columns(["id_", "age", "score"],
+                                     [("a", "b"), (1, 2), (0.5, None)])
+
+        assert columns == {"id_": ["a", "b"],
+                           "age": array('q', [1, 2]),
+                           "score": [0.5, None]}
+
+    def test_build_columns_overflow(self):
+        dao = MyNumbersDAO()
+
+        columns = dao._build_columns(["age"], [(2 ** 64,)])
+
+        assert columns == {"age": [2 ** 64]}
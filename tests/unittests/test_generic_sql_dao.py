@@ -6,8 +6,8 @@ from pytest import fixture, mark, raises
 
 from nova_api.dao.generic_sql_dao import GenericSQLDAO
 from nova_api.exceptions import DuplicateEntityException, \
-    EntityNotFoundException, InvalidFiltersException, InvalidIDException, \
-    InvalidIDTypeException, \
+    EntityNotFoundException, InvalidCursorException, InvalidFieldsException, \
+    InvalidFiltersException, InvalidIDException, InvalidIDTypeException, \
     NoRowsAffectedException, NotEntityException
 from tests.unittests import TEST_DATE, TestEntity, TestEntity2, \
     TestEntityWithChild
@@ -19,6 +19,15 @@ class TestEntityDAO(GenericSQLDAO):
                                             return_class=TestEntity, **kwargs)
 
 
+class BinaryIdsDAO(GenericSQLDAO):
+    binary_ids = True
+
+    def __init__(self, database_type=None, **kwargs):
+        super().__init__(database_type=database_type, table="test_table",
+                         prefix='', return_class=TestEntityWithChild,
+                         **kwargs)
+
+
 class TestGenericSQLDAO:
     @fixture
     def mysql_mock(self, mocker):
@@ -41,7 +50,13 @@ class TestGenericSQLDAO:
         props.UPDATE_QUERY = "UPDATE {table} SET {fields} " \
                              "WHERE {column} = %s;"
         props.QUERY_TOTAL_COLUMN = "SELECT count({column}" \
-                                   ") FROM {table};"
+                                   ") FROM {table} {filters};"
+        props.IN_FILTER = "{column} IN ({values})"
+        props.INSERT_MANY_QUERY = "INSERT INTO {table} " \
+                                  "({fields}) VALUES {values};"
+        props.UPSERT_QUERY = "INSERT INTO {table} ({fields}) VALUES " \
+                             "{values} ON DUPLICATE KEY UPDATE {updates};"
+        props.UPSERT_UPDATE = "{field}=VALUES({field})"
 
         def predict(cls):
             TYPE_MAPPING = {
@@ -366,7 +381,11 @@ class TestGenericSQLDAO:
         )
 
         assert mysql_mock.mock_calls[3] == call().query(
-            'SELECT count(id) FROM test_table;'
+            'SELECT count(id) FROM test_table '
+            'WHERE creation_datetime > %s '
+            'AND id LIKE %s '
+            'AND name = %s;',
+            [TEST_DATE, '123%', 'Anom']
         )
 
         assert res == [TestEntity("a59d80c8c5694e08a25b625a745d24e0",
@@ -555,6 +574,51 @@ class TestGenericSQLDAO:
             'VALUES (%s, %s, %s, %s, %s, %s);', entity.get_db_values())
         assert id_ == entity.id_
 
+    @fixture
+    def binary_dao(self, mysql_mock):
+        db = mysql_mock.return_value
+        db.UUID_TYPE = "BINARY(16)"
+        db.encode_uuid.side_effect = bytes.fromhex
+        db.decode_uuid.side_effect = lambda value: value.hex()
+        return BinaryIdsDAO()
+
+    def test_create_binary_ids(self, binary_dao, mysql_mock):
+        db = mysql_mock.return_value
+        db.query.return_value = 1, 0
+        db.get_results.return_value = None
+        entity = TestEntityWithChild()
+
+        binary_dao.create(entity)
+
+        values = db.query.call_args.args[1]
+        assert values[0] == bytes.fromhex(entity.id_)
+        assert values[5] == bytes.fromhex(entity.child.id_)
+        assert values[3] == entity.name
+
+    def test_get_all_binary_ids(self, binary_dao, mysql_mock):
+        db = mysql_mock.return_value
+        entity = TestEntityWithChild()
+        db.get_results.return_value = [
+            [bytes.fromhex(entity.id_), entity.creation_datetime,
+             entity.last_modified_datetime, entity.name, entity.birthday,
+             bytes.fromhex(entity.child.id_)]]
+
+        _, results = binary_dao.get_all(
+            filters={"id_": entity.id_, "name": entity.name},
+            count_mode="none")
+
+        assert db.query.call_args.args[1][:2] == [bytes.fromhex(entity.id_),
+                                                  entity.name]
+        assert results[0].id_ == entity.id_
+        assert results[0].child.id_ == entity.child.id_
+
+    def test_create_table_binary_ids(self, binary_dao, mysql_mock):
+        binary_dao.create_table_if_not_exists()
+
+        query = mysql_mock.return_value.query.call_args.args[0]
+        assert "id_ BINARY(16) NOT NULL" in query
+        assert "child_id_ BINARY(16) NULL" in query
+
     def test_create_exist(self, generic_dao, mysql_mock, entity):
         db = mysql_mock.return_value
         db.get_results.return_value = [list(entity.__dict__.values())]
@@ -589,7 +653,7 @@ class TestGenericSQLDAO:
         entity.name = "MyTestName"
         sleep(1)
         generic_dao.update(entity)
-        assert mysql_mock.mock_calls[5] == call().query(
+        assert mysql_mock.mock_calls[3] == call().query(
             'UPDATE test_table SET id=%s, creation_datetime=%s, '
             'last_modified_datetime=%s, name=%s, birthday=%s '
             'WHERE id = %s;', list(dict(entity).values()) + [entity.id_]
@@ -606,7 +670,7 @@ class TestGenericSQLDAO:
         entity.name = "MyTestName"
         sleep(1)
         generic_dao_with_child.update(entity)
-        assert mysql_mock.mock_calls[5] == call().query(
+        assert mysql_mock.mock_calls[3] == call().query(
             'UPDATE test_table SET id_=%s, creation_datetime=%s, '
             'last_modified_datetime=%s, name=%s, birthday=%s, child_id_=%s '
             'WHERE id_ = %s;', entity.get_db_values() + [entity.id_]
@@ -625,6 +689,10 @@ class TestGenericSQLDAO:
         generic_dao.close()
         assert db.mock_calls == [call.close()]
 
+    def test_transaction(self, generic_dao, mysql_mock):
+        db = mysql_mock.return_value
+        assert generic_dao.transaction() is db.transaction.return_value
+
     def test_generate_filters(self, generic_dao):
         filters = generic_dao._generate_filters(filters={
             "id_": "a022f42cfd2b40338bbb54a2894cba9f",
@@ -646,3 +714,622 @@ class TestGenericSQLDAO:
     def test_generate_filters_not_dict(self, generic_dao, param):
         with raises(TypeError):
             generic_dao._generate_filters(param)
+
+    def test_statement_cache_reuses_statements(self, generic_dao,
+                                               mysql_mock):
+        GenericSQLDAO.statement_cache.clear()
+        db = mysql_mock.return_value
+        db.get_results.return_value = None
+        generic_dao.get_all(filters={"name": "Anom"})
+        misses = GenericSQLDAO.statement_cache.misses
+        generic_dao.get_all(filters={"name": "Other"})
+        assert GenericSQLDAO.statement_cache.misses == misses
+        assert GenericSQLDAO.statement_cache.hits == 2
+        assert db.query.call_args == call(
+            "SELECT id, creation_datetime, last_modified_datetime,"
+            " name, birthday "
+            "FROM test_table WHERE name = %s "
+            "LIMIT %s OFFSET %s;",
+            ["Other", 20, 0]
+        )
+
+    def test_statement_cache_shared_between_instances(self, mysql_mock):
+        GenericSQLDAO.statement_cache.clear()
+        mysql_mock.return_value.get_results.return_value = None
+        TestEntityDAO().get_all(filters={"name": ["LIKE", "A%"]})
+        misses = GenericSQLDAO.statement_cache.misses
+        TestEntityDAO().get_all(filters={"name": ["LIKE", "B%"]})
+        assert GenericSQLDAO.statement_cache.misses == misses
+        assert GenericSQLDAO.statement_cache.stats()["size"] == misses
+
+    def test_statement_cache_shape_validated(self, generic_dao):
+        GenericSQLDAO.statement_cache.clear()
+        generic_dao.get_all(filters={"name": "Anom"})
+        with raises(ValueError):
+            generic_dao.get_all(filters={"name": [">>", "Anom"]})
+
+    def test_statement_cache_clear(self, generic_dao):
+        generic_dao.get_all()
+        GenericSQLDAO.statement_cache.clear()
+        assert GenericSQLDAO.statement_cache.stats() == {"hits": 0,
+                                                         "misses": 0,
+                                                         "size": 0}
+
+    def test_get_all_count_none(self, generic_dao, mysql_mock):
+        db = mysql_mock.return_value
+        db.get_results.return_value = [["a59d80c8c5694e08a25b625a745d24e0",
+                                        datetime(2020, 7, 26, 12, 00, 00),
+                                        datetime(2020, 7, 26, 12, 00, 00),
+                                        "Anom",
+                                        None]]
+
+        total, res = generic_dao.get_all(count_mode="none")
+
+        assert total is None and len(res) == 1
+        assert db.query.call_count == 1
+
+    def test_get_all_count_none_no_results(self, generic_dao, mysql_mock):
+        mysql_mock.return_value.get_results.return_value = None
+
+        assert generic_dao.get_all(count_mode="none") == (None, [])
+
+    def test_get_all_count_estimated(self, generic_dao, mysql_mock):
+        db = mysql_mock.return_value
+        db.QUERY_ESTIMATED_TOTAL = "SELECT TABLE_ROWS FROM tables " \
+                                   "WHERE TABLE_NAME = %s;"
+        db.get_results.side_effect = [[["a59d80c8c5694e08a25b625a745d24e0",
+                                        datetime(2020, 7, 26, 12, 00, 00),
+                                        datetime(2020, 7, 26, 12, 00, 00),
+                                        "Anom",
+                                        None]],
+                                      [[1500]]]
+
+        total, _ = generic_dao.get_all(filters={"name": "Anom"},
+                                       count_mode="estimated")
+
+        assert total == 1500
+        assert db.query.call_args == call(
+            "SELECT TABLE_ROWS FROM tables WHERE TABLE_NAME = %s;",
+            ["test_table"])
+
+    def test_get_all_count_window(self, generic_dao, mysql_mock):
+        db = mysql_mock.return_value
+        db.SUPPORTS_WINDOW_COUNT = True
+        db.SELECT_WINDOW_COUNT_QUERY = "SELECT {fields}, COUNT(*) OVER() " \
+                                       "FROM {table} {filters} " \
+                                       "LIMIT %s OFFSET %s;"
+        db.get_results.return_value = [("a59d80c8c5694e08a25b625a745d24e0",
+                                        datetime(2020, 7, 26, 12, 00, 00),
+                                        datetime(2020, 7, 26, 12, 00, 00),
+                                        "Anom",
+                                        None,
+                                        42)]
+
+        total, res = generic_dao.get_all(filters={"name": "Anom"},
+                                         count_mode="window")
+
+        assert db.query.mock_calls == [call(
+            "SELECT id, creation_datetime, last_modified_datetime,"
+            " name, birthday, COUNT(*) OVER() "
+            "FROM test_table WHERE name = %s "
+            "LIMIT %s OFFSET %s;",
+            ["Anom", 20, 0]
+        )]
+        assert total == 42
+        assert res == [TestEntity("a59d80c8c5694e08a25b625a745d24e0",
+                                  datetime(2020, 7, 26, 12, 00, 00),
+                                  datetime(2020, 7, 26, 12, 00, 00),
+                                  "Anom",
+                                  None)]
+
+    def test_get_all_count_window_past_the_end(self, generic_dao,
+                                               mysql_mock):
+        db = mysql_mock.return_value
+        db.SUPPORTS_WINDOW_COUNT = True
+        db.SELECT_WINDOW_COUNT_QUERY = "SELECT {fields}, COUNT(*) OVER() " \
+                                       "FROM {table} {filters} " \
+                                       "LIMIT %s OFFSET %s;"
+        db.get_results.side_effect = [None, [[42]]]
+
+        total, res = generic_dao.get_all(length=20, offset=60,
+                                         filters={"name": "Anom"},
+                                         count_mode="window")
+
+        assert total == 42 and res == []
+        assert db.query.call_args == call(
+            "SELECT count(id) FROM test_table WHERE name = %s;", ["Anom"])
+
+    def test_get_all_count_window_not_supported(self, generic_dao,
+                                                mysql_mock):
+        db = mysql_mock.return_value
+        db.SUPPORTS_WINDOW_COUNT = False
+        db.get_results.side_effect = [[["a59d80c8c5694e08a25b625a745d24e0",
+                                        datetime(2020, 7, 26, 12, 00, 00),
+                                        datetime(2020, 7, 26, 12, 00, 00),
+                                        "Anom",
+                                        None]],
+                                      [[1]]]
+
+        total, _ = generic_dao.get_all(count_mode="window")
+
+        assert total == 1
+        assert db.query.call_args == call(
+            "SELECT count(id) FROM test_table ;", [])
+
+    def test_get_all_invalid_count_mode(self, generic_dao):
+        with raises(ValueError):
+            generic_dao.get_all(count_mode="approximate")
+
+    def test_get_all_keyset_first_page(self, generic_dao, mysql_mock):
+        db = mysql_mock.return_value
+        db.SELECT_KEYSET_QUERY = "SELECT {fields} FROM {table} {filters} " \
+                                 "ORDER BY {sort_column}, {id_column} " \
+                                 "LIMIT %s;"
+        db.get_results.return_value = None
+
+        generic_dao.get_all(length=2, offset=10, filters={"name": "Anom"},
+                            cursor="")
+
+        assert db.query.call_args == call(
+            "SELECT id, creation_datetime, last_modified_datetime,"
+            " name, birthday "
+            "FROM test_table WHERE name = %s "
+            "ORDER BY creation_datetime, id LIMIT %s;",
+            ["Anom", 2]
+        )
+
+    def test_get_all_keyset_next_page(self, generic_dao, mysql_mock):
+        db = mysql_mock.return_value
+        db.SELECT_KEYSET_QUERY = "SELECT {fields} FROM {table} {filters} " \
+                                 "ORDER BY {sort_column}, {id_column} " \
+                                 "LIMIT %s;"
+        db.KEYSET_FILTER = "({sort_column}, {id_column}) > (%s, %s)"
+        db.get_results.side_effect = [[["a59d80c8c5694e08a25b625a745d24e0",
+                                        datetime(2020, 7, 26, 12, 00, 00),
+                                        datetime(2020, 7, 26, 12, 00, 00),
+                                        "Anom",
+                                        None]],
+                                      [[1]]]
+        last = TestEntity("a022f42cfd2b40338bbb54a2894cba9f",
+                          datetime(2020, 7, 25, 12, 00, 00))
+        cursor = generic_dao.next_cursor([last], 1)
+
+        total, res = generic_dao.get_all(length=1, cursor=cursor)
+
+        assert db.query.mock_calls[0] == call(
+            "SELECT id, creation_datetime, last_modified_datetime,"
+            " name, birthday "
+            "FROM test_table WHERE (creation_datetime, id) > (%s, %s) "
+            "ORDER BY creation_datetime, id LIMIT %s;",
+            ["2020-07-25 12:00:00", "a022f42cfd2b40338bbb54a2894cba9f", 1]
+        )
+        assert total == 1
+        assert generic_dao.next_cursor(res, 1) is not None
+        assert generic_dao.next_cursor(res, 2) is None
+
+    @mark.parametrize("cursor", ["not a cursor", "W10=", "WzEsIDJd"])
+    def test_get_all_keyset_invalid_cursor(self, generic_dao, cursor):
+        with raises(InvalidCursorException):
+            generic_dao.get_all(cursor=cursor)
+
+    def test_get_all_fields(self, generic_dao, mysql_mock):
+        db = mysql_mock.return_value
+        db.get_results.side_effect = [[["a59d80c8c5694e08a25b625a745d24e0",
+                                        "Anom"]],
+                                      [[1]]]
+
+        total, res = generic_dao.get_all(filters={"name": "Anom"},
+                                         fields=["name"])
+
+        assert db.query.mock_calls[0] == call(
+            "SELECT id, name FROM test_table WHERE name = %s "
+            "LIMIT %s OFFSET %s;",
+            ["Anom", 20, 0]
+        )
+        assert total == 1
+        assert res[0].id_ == "a59d80c8c5694e08a25b625a745d24e0"
+        assert res[0].name == "Anom"
+
+    def test_get_all_fields_keyset(self, generic_dao, mysql_mock):
+        db = mysql_mock.return_value
+        db.SELECT_KEYSET_QUERY = "SELECT {fields} FROM {table} {filters} " \
+                                 "ORDER BY {sort_column}, {id_column} " \
+                                 "LIMIT %s;"
+        db.get_results.return_value = None
+
+        generic_dao.get_all(length=2, cursor="", fields=["birthday"])
+
+        assert db.query.call_args == call(
+            "SELECT id, creation_datetime, birthday FROM test_table  "
+            "ORDER BY creation_datetime, id LIMIT %s;",
+            [2]
+        )
+
+    def test_get_fields(self, generic_dao, mysql_mock):
+        db = mysql_mock.return_value
+        db.get_results.return_value = None
+
+        generic_dao.get("a59d80c8c5694e08a25b625a745d24e0", fields=["name"])
+
+        assert db.query.call_args == call(
+            "SELECT id, name FROM test_table WHERE id = %s "
+            "LIMIT %s OFFSET %s;",
+            ["a59d80c8c5694e08a25b625a745d24e0", 1, 0]
+        )
+
+    def test_get_all_unknown_fields(self, generic_dao, mysql_mock):
+        with raises(InvalidFieldsException):
+            generic_dao.get_all(fields=["name", "not_a_field"])
+        mysql_mock.return_value.query.assert_not_called()
+
+    def test_get_all_sort(self, generic_dao, mysql_mock):
+        db = mysql_mock.return_value
+        db.ORDER_BY = "ORDER BY {sort}"
+        db.get_results.return_value = None
+
+        generic_dao.get_all(filters={"name": "Anom"},
+                            sort=["-birthday", "name"])
+
+        assert db.query.call_args == call(
+            "SELECT id, creation_datetime, last_modified_datetime, "
+            "name, birthday FROM test_table WHERE name = %s "
+            "ORDER BY birthday DESC, name ASC, id ASC LIMIT %s OFFSET %s;",
+            ["Anom", 20, 0]
+        )
+
+    def test_get_all_sort_warns_unindexed(self, generic_dao, mysql_mock,
+                                          caplog):
+        db = mysql_mock.return_value
+        db.ORDER_BY = "ORDER BY {sort}"
+        db.QUERY_INDEXED_COLUMNS = "SELECT indexed FROM index_table;"
+        db.get_results.side_effect = [[["id"]], None]
+        generic_dao.check_sort_indexes = True
+
+        generic_dao.get_all(sort=["name", "id_"])
+
+        assert db.query.mock_calls[0] == call(
+            "SELECT indexed FROM index_table;", ["test_table"])
+        assert db.query.call_args == call(
+            "SELECT id, creation_datetime, last_modified_datetime, "
+            "name, birthday FROM test_table  "
+            "ORDER BY name ASC, id ASC LIMIT %s OFFSET %s;",
+            [20, 0]
+        )
+        assert "Sorting TestEntity by name, which has no supporting " \
+               "index." in caplog.messages
+
+    def test_get_all_sort_unknown_field(self, generic_dao):
+        with raises(InvalidFieldsException):
+            generic_dao.get_all(sort=["-not_a_field"])
+
+    def test_get_all_sort_with_cursor(self, generic_dao):
+        with raises(InvalidCursorException):
+            generic_dao.get_all(sort=["name"], cursor="")
+
+    def test_iter_all(self, generic_dao, mysql_mock):
+        db = mysql_mock.return_value
+        db.SELECT_ALL_QUERY = "SELECT {fields} FROM {table} {filters};"
+        batches = [
+            [["a59d80c8c5694e08a25b625a745d24e0", "Anom"],
+             ["a022f42cfd2b40338bbb54a2894cba9f", "Anom"]],
+            [["671b63e164a74c508788a3bb34da87f3", "Anom"]]]
+        db.iter_query.return_value = (batch for batch in batches)
+
+        results = generic_dao.iter_all(filters={"name": "Anom"},
+                                       batch_size=2, fields=["name"])
+
+        db.iter_query.assert_called_once_with(
+            "SELECT id, name FROM test_table WHERE name = %s;", ["Anom"], 2)
+        assert [result.id_ for result in results] == [
+            "a59d80c8c5694e08a25b625a745d24e0",
+            "a022f42cfd2b40338bbb54a2894cba9f",
+            "671b63e164a74c508788a3bb34da87f3"]
+
+    def test_iter_all_should_validate_eagerly(self, generic_dao, mysql_mock):
+        with raises(InvalidFieldsException):
+            generic_dao.iter_all(fields=["bogus"])
+
+    def test_iter_all_should_query_eagerly(self, generic_dao, mysql_mock):
+        def fail(*args):
+            raise RuntimeError()
+            yield  # pylint: disable=W0101
+
+        db = mysql_mock.return_value
+        db.SELECT_ALL_QUERY = "SELECT {fields} FROM {table} {filters};"
+        db.iter_query.side_effect = fail
+
+        with raises(RuntimeError):
+            generic_dao.iter_all()
+
+    def test_get_all_columnar(self, generic_dao, mysql_mock):
+        db = mysql_mock.return_value
+        db.get_results.side_effect = [[["a59d80c8c5694e08a25b625a745d24e0",
+                                        "Anom"],
+                                       ["a022f42cfd2b40338bbb54a2894cba9f",
+                                        "Anom"]],
+                                      [[2]]]
+
+        total, columns = generic_dao.get_all_columnar(
+            filters={"name": "Anom"}, fields=["name"])
+
+        assert db.query.mock_calls[0] == call(
+            "SELECT id, name FROM test_table WHERE name = %s "
+            "LIMIT %s OFFSET %s;",
+            ["Anom", 20, 0]
+        )
+        assert total == 2
+        assert columns == {"id_": ["a59d80c8c5694e08a25b625a745d24e0",
+                                   "a022f42cfd2b40338bbb54a2894cba9f"],
+                           "name": ["Anom", "Anom"]}
+
+    def test_get_all_columnar_empty(self, generic_dao, mysql_mock):
+        mysql_mock.return_value.get_results.return_value = None
+
+        total, columns = generic_dao.get_all_columnar()
+
+        assert total == 0
+        assert columns == {"id_": [], "creation_datetime": [],
+                           "last_modified_datetime": [], "name": [],
+                           "birthday": []}
+
+    def test_get_all_trusted_hydration(self, generic_dao, mysql_mock,
+                                       mocker):
+        db = mysql_mock.return_value
+        db.get_results.side_effect = [[["a59d80c8c5694e08a25b625a745d24e0",
+                                        "Anom"]],
+                                      [[1]]]
+        from_db = mocker.spy(TestEntity, "from_db")
+        generic_dao.trusted_hydration = True
+
+        _, res = generic_dao.get_all(fields=["name"])
+
+        assert res == [TestEntity(id_="a59d80c8c5694e08a25b625a745d24e0",
+                                  name="Anom")]
+        from_db.assert_called_once_with(
+            ["a59d80c8c5694e08a25b625a745d24e0", "Anom"], ["id_", "name"])
+
+    def test_get_all_untrusted_hydration(self, generic_dao, mysql_mock,
+                                         mocker):
+        db = mysql_mock.return_value
+        db.get_results.side_effect = [[["a59d80c8c5694e08a25b625a745d24e0",
+                                        "Anom"]],
+                                      [[1]]]
+        from_db = mocker.spy(TestEntity, "from_db")
+
+        _, res = generic_dao.get_all(fields=["name"])
+
+        assert res == [TestEntity(id_="a59d80c8c5694e08a25b625a745d24e0",
+                                  name="Anom")]
+        from_db.assert_not_called()
+
+    def test_create_many(self, generic_dao, mysql_mock):
+        entities = [TestEntity(id_="a59d80c8c5694e08a25b625a745d24e0"),
+                    TestEntity(id_="a022f42cfd2b40338bbb54a2894cba9f"),
+                    "not an entity",
+                    TestEntity(id_="671b63e164a74c508788a3bb34da87f3")]
+        db = mysql_mock.return_value
+        db.get_results.side_effect = [[["a022f42cfd2b40338bbb54a2894cba9f"]],
+                                      None]
+        db.query.return_value = 1, 0
+
+        result = generic_dao.create_many(entities, batch_size=2)
+
+        assert result.ids == ["a59d80c8c5694e08a25b625a745d24e0",
+                              "671b63e164a74c508788a3bb34da87f3"]
+        assert isinstance(result.errors[1], DuplicateEntityException)
+        assert isinstance(result.errors[2], NotEntityException)
+        assert not result.success
+        assert db.query.mock_calls == [
+            call("SELECT id FROM test_table WHERE id IN (%s, %s) "
+                 "LIMIT %s OFFSET %s;",
+                 ["a59d80c8c5694e08a25b625a745d24e0",
+                  "a022f42cfd2b40338bbb54a2894cba9f", 2, 0]),
+            call("INSERT INTO test_table (id, creation_datetime, "
+                 "last_modified_datetime, name, birthday) "
+                 "VALUES (%s, %s, %s, %s, %s);",
+                 entities[0].get_db_values()),
+            call("SELECT id FROM test_table WHERE id IN (%s) "
+                 "LIMIT %s OFFSET %s;",
+                 ["671b63e164a74c508788a3bb34da87f3", 1, 0]),
+            call("INSERT INTO test_table (id, creation_datetime, "
+                 "last_modified_datetime, name, birthday) "
+                 "VALUES (%s, %s, %s, %s, %s);",
+                 entities[3].get_db_values())
+        ]
+
+    def test_create_many_multi_row_values(self, generic_dao, mysql_mock):
+        entities = [TestEntity(), TestEntity()]
+        db = mysql_mock.return_value
+        db.get_results.return_value = None
+        db.query.return_value = 2, 0
+
+        result = generic_dao.create_many(entities)
+
+        assert result.success
+        assert db.query.call_args == call(
+            "INSERT INTO test_table (id, creation_datetime, "
+            "last_modified_datetime, name, birthday) "
+            "VALUES (%s, %s, %s, %s, %s), (%s, %s, %s, %s, %s);",
+            entities[0].get_db_values() + entities[1].get_db_values())
+
+    def test_create_many_failed_batch(self, generic_dao, mysql_mock):
+        entities = [TestEntity(), TestEntity()]
+        db = mysql_mock.return_value
+        db.get_results.return_value = None
+        db.query.side_effect = [None] + [RuntimeError("Data too long")] * 3
+
+        result = generic_dao.create_many(entities)
+
+        assert result.ids == []
+        assert [str(error) for error in result.errors.values()] == \
+            ["Data too long", "Data too long"]
+
+    def test_create_many_failed_row(self, generic_dao, mysql_mock):
+        entities = [TestEntity(), TestEntity(name="x" * 300), TestEntity()]
+        db = mysql_mock.return_value
+        db.get_results.return_value = None
+        db.query.side_effect = [None, RuntimeError("Data too long"), (1, 0),
+                                RuntimeError("Data too long"), (1, 0)]
+
+        result = generic_dao.create_many(entities)
+
+        assert result.ids == [entities[0].id_, entities[2].id_]
+        assert list(result.errors) == [1]
+        assert str(result.errors[1]) == "Data too long"
+        assert db.query.call_args_list[2:] == [call(
+            "INSERT INTO test_table (id, creation_datetime, "
+            "last_modified_datetime, name, birthday) "
+            "VALUES (%s, %s, %s, %s, %s);",
+            entity.get_db_values()) for entity in entities]
+
+    def test_update_many(self, generic_dao, mysql_mock):
+        entities = [TestEntity(id_="a59d80c8c5694e08a25b625a745d24e0"),
+                    TestEntity(id_="a022f42cfd2b40338bbb54a2894cba9f")]
+        db = mysql_mock.return_value
+        db.get_results.return_value = [["a59d80c8c5694e08a25b625a745d24e0"]]
+        db.query_many.return_value = 1, 0
+
+        result = generic_dao.update_many(entities)
+
+        assert result.ids == ["a59d80c8c5694e08a25b625a745d24e0"]
+        assert isinstance(result.errors[1], EntityNotFoundException)
+        assert db.query_many.mock_calls == [call(
+            'UPDATE test_table SET id=%s, creation_datetime=%s, '
+            'last_modified_datetime=%s, name=%s, birthday=%s '
+            'WHERE id = %s;',
+            [entities[0].get_db_values() + [entities[0].id_]])]
+
+    def test_upsert(self, generic_dao, mysql_mock):
+        entity = TestEntity()
+        db = mysql_mock.return_value
+        db.query.return_value = 2, 0
+
+        assert generic_dao.upsert(entity) == entity.id_
+        assert db.query.mock_calls == [call(
+            "INSERT INTO test_table (id, creation_datetime, "
+            "last_modified_datetime, name, birthday) VALUES "
+            "(%s, %s, %s, %s, %s) ON DUPLICATE KEY UPDATE "
+            "last_modified_datetime=VALUES(last_modified_datetime), "
+            "name=VALUES(name), birthday=VALUES(birthday);",
+            entity.get_db_values())]
+
+    def test_upsert_not_entity(self, generic_dao, mysql_mock):
+        with raises(NotEntityException):
+            generic_dao.upsert("not an entity")
+        mysql_mock.return_value.query.assert_not_called()
+
+    def test_upsert_many(self, generic_dao, mysql_mock):
+        entities = [TestEntity(), "not an entity", TestEntity()]
+        db = mysql_mock.return_value
+        db.query.return_value = 3, 0
+
+        result = generic_dao.upsert_many(entities)
+
+        assert result.ids == [entities[0].id_, entities[2].id_]
+        assert isinstance(result.errors[1], NotEntityException)
+        assert db.query.mock_calls == [call(
+            "INSERT INTO test_table (id, creation_datetime, "
+            "last_modified_datetime, name, birthday) VALUES "
+            "(%s, %s, %s, %s, %s), (%s, %s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE "
+            "last_modified_datetime=VALUES(last_modified_datetime), "
+            "name=VALUES(name), birthday=VALUES(birthday);",
+            entities[0].get_db_values() + entities[2].get_db_values())]
+
+    def test_upsert_many_duplicated_id(self, generic_dao, mysql_mock):
+        entities = [TestEntity(id_="a59d80c8c5694e08a25b625a745d24e0"),
+                    TestEntity(id_="a022f42cfd2b40338bbb54a2894cba9f"),
+                    TestEntity(id_="a59d80c8c5694e08a25b625a745d24e0",
+                               name="last")]
+        db = mysql_mock.return_value
+        db.query.return_value = 2, 0
+
+        result = generic_dao.upsert_many(entities)
+
+        assert result.ids == [entity.id_ for entity in entities]
+        assert db.query.mock_calls == [call(
+            "INSERT INTO test_table (id, creation_datetime, "
+            "last_modified_datetime, name, birthday) VALUES "
+            "(%s, %s, %s, %s, %s), (%s, %s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE "
+            "last_modified_datetime=VALUES(last_modified_datetime), "
+            "name=VALUES(name), birthday=VALUES(birthday);",
+            entities[2].get_db_values() + entities[1].get_db_values())]
+
+    def test_remove_many(self, generic_dao, mysql_mock):
+        entities = [TestEntity(id_="a59d80c8c5694e08a25b625a745d24e0"),
+                    TestEntity(id_="a022f42cfd2b40338bbb54a2894cba9f")]
+        db = mysql_mock.return_value
+        db.get_results.return_value = [["a59d80c8c5694e08a25b625a745d24e0"],
+                                       ["a022f42cfd2b40338bbb54a2894cba9f"]]
+        db.query.return_value = 2, 0
+
+        result = generic_dao.remove_many(entities)
+
+        assert result.success
+        assert db.query.call_args == call(
+            "DELETE FROM test_table WHERE id IN (%s, %s);",
+            ["a59d80c8c5694e08a25b625a745d24e0",
+             "a022f42cfd2b40338bbb54a2894cba9f"])
+
+    def test_create_rely_on_constraints(self, generic_dao, mysql_mock,
+                                        entity):
+        generic_dao.rely_on_constraints = True
+        db = mysql_mock.return_value
+        db.query.return_value = 1, 0
+
+        generic_dao.create(entity)
+
+        assert db.query.mock_calls == [call(
+            'INSERT INTO test_table (id, creation_datetime,'
+            ' last_modified_datetime, name, birthday) '
+            'VALUES (%s, %s, %s, %s, %s);', entity.get_db_values())]
+
+    def test_create_rely_on_constraints_duplicate(self, generic_dao,
+                                                  mysql_mock, entity):
+        generic_dao.rely_on_constraints = True
+        db = mysql_mock.return_value
+        db.query.side_effect = DuplicateEntityException()
+
+        with raises(DuplicateEntityException):
+            generic_dao.create(entity)
+
+    def test_update_rely_on_constraints(self, generic_dao, mysql_mock,
+                                        entity):
+        generic_dao.rely_on_constraints = True
+        db = mysql_mock.return_value
+        db.query.return_value = 1, 0
+
+        generic_dao.update(entity)
+
+        assert db.query.call_count == 1
+
+    def test_update_rely_on_constraints_not_found(self, generic_dao,
+                                                  mysql_mock, entity):
+        generic_dao.rely_on_constraints = True
+        db = mysql_mock.return_value
+        db.query.return_value = 0, 0
+        db.get_results.return_value = None
+
+        with raises(EntityNotFoundException):
+            generic_dao.update(entity)
+
+    def test_update_rely_on_constraints_not_changed(self, generic_dao,
+                                                    mysql_mock, entity):
+        generic_dao.rely_on_constraints = True
+        db = mysql_mock.return_value
+        db.query.return_value = 0, 0
+        db.get_results.return_value = [list(entity.__dict__.values())]
+
+        with raises(NoRowsAffectedException):
+            generic_dao.update(entity)
+
+    def test_remove_rely_on_constraints_not_found(self, generic_dao,
+                                                  mysql_mock, entity):
+        generic_dao.rely_on_constraints = True
+        db = mysql_mock.return_value
+        db.query.return_value = 0, 0
+
+        with raises(EntityNotFoundException):
+            generic_dao.remove(entity)
+        assert db.query.call_count == 1
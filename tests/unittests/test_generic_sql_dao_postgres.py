@@ -39,7 +39,7 @@ class TestGenericSQLDAOPostgres:
         props.UPDATE_QUERY = "UPDATE {table} SET {fields} " \
                              "WHERE {column} = %s;"
         props.QUERY_TOTAL_COLUMN = "SELECT count({column}" \
-                                   ") FROM {table};"
+                                   ") FROM {table} {filters};"
 
         def predict(cls):
             TYPE_MAPPING = {
@@ -376,7 +376,11 @@ class TestGenericSQLDAOPostgres:
                 "LIMIT %s OFFSET %s;",
                 [TEST_DATE, '123%', 'Anom', 20, 0]
             ), call().query(
-                'SELECT count(id) FROM test_table;'
+                'SELECT count(id) FROM test_table '
+                'WHERE creation_datetime > %s '
+                'AND id LIKE %s '
+                'AND name = %s;',
+                [TEST_DATE, '123%', 'Anom']
             )])
 
         assert res == [TestEntity("a022f42cfd2b40338bbb54a2894cba9f",
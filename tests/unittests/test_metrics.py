@@ -0,0 +1,68 @@
+from flask import Flask
+from mock import Mock
+from pytest import fixture
+
+from nova_api import metrics
+from nova_api.persistence.connection_pool import ConnectionPool, PoolStats
+
+
+class TestMetrics:
+    @fixture
+    def stats(self):
+        stats = PoolStats('user_host-"db"', 5, size=2, in_use=1, idle=1,
+                          checkouts=3, timeouts=1, created=2, closed=0)
+        stats.wait_time.observe(0.002)
+        stats.wait_time.observe(20)
+        return stats
+
+    def test_pool_stats(self):
+        pool = ConnectionPool("test_metrics", Mock(), Mock())
+        try:
+            stats = [stats for stats in metrics.pool_stats()
+                     if stats.name == "test_metrics"]
+        finally:
+            pool.close()
+
+        assert len(stats) == 1 and stats[0].max_size == 5
+
+    def test_render(self, stats):
+        lines = metrics.render([stats]).splitlines()
+
+        labels = 'pool="user_host-\\"db\\""'
+        assert "# TYPE nova_api_pool_connections_in_use gauge" in lines
+        assert f"nova_api_pool_connections_in_use{{{labels}}} 1" in lines
+        assert f"nova_api_pool_connections_idle{{{labels}}} 1" in lines
+        assert f"nova_api_pool_max_connections{{{labels}}} 5" in lines
+        assert f"nova_api_pool_checkouts_total{{{labels}}} 3" in lines
+        assert f"nova_api_pool_checkout_timeouts_total{{{labels}}} 1" \
+               in lines
+        assert "# TYPE nova_api_pool_checkout_wait_seconds histogram" \
+               in lines
+        assert f'nova_api_pool_checkout_wait_seconds_bucket{{{labels},' \
+               f'le="0.001"}} 0' in lines
+        assert f'nova_api_pool_checkout_wait_seconds_bucket{{{labels},' \
+               f'le="0.005"}} 1' in lines
+        assert f'nova_api_pool_checkout_wait_seconds_bucket{{{labels},' \
+               f'le="+Inf"}} 2' in lines
+        assert f"nova_api_pool_checkout_wait_seconds_sum{{{labels}}} " \
+               f"20.002" in lines
+        assert f"nova_api_pool_checkout_wait_seconds_count{{{labels}}} 2" \
+               in lines
+        assert f"nova_api_pool_connection_lifetime_seconds_count" \
+               f"{{{labels}}} 0" in lines
+
+    def test_render_without_pools(self):
+        lines = metrics.render([]).splitlines()
+
+        assert len(lines) == 2 * len(metrics.METRICS)
+
+    def test_add_metrics_endpoint(self, mocker, stats):
+        mocker.patch("nova_api.metrics.pool_stats", return_value=[stats])
+        app = Flask(__name__)
+
+        metrics.add_metrics_endpoint(app)
+        response = app.test_client().get("/metrics")
+
+        assert response.status_code == 200
+        assert response.content_type == metrics.CONTENT_TYPE
+        assert response.get_data(as_text=True) == metrics.render([stats])
@@ -2,11 +2,14 @@ import datetime
 from unittest.mock import call
 
 from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from pytest import fixture, mark, raises
 
 from dao.mongo_dao import MongoDAO
 from nova_api.exceptions import DuplicateEntityException, \
-    EntityNotFoundException, InvalidFiltersException, NotEntityException
+    EntityNotFoundException, InvalidFieldsException, InvalidFiltersException, \
+    NotEntityException
 from tests.unittests import TestEntity, TestEntity2
 
 
@@ -206,7 +209,8 @@ class TestMongoDAO:
         res = dao.get_all(filters={"name": "Test"})
         dao.cursor.find.assert_called_with({"test_entity_name": "Test"},
                                            limit=20, skip=0)
-        dao.cursor.count_documents.assert_called_with({})
+        dao.cursor.count_documents.assert_called_with(
+            {"test_entity_name": "Test"})
 
         assert res == (1, [
             test_entity])
@@ -349,6 +353,291 @@ class TestMongoDAO:
                       }}
         )
 
+    @staticmethod
+    def test_get_all_count_estimated_should_use_collection_stats(
+            dao, test_entity):
+        db_dict = dao._prepare_db_dict(test_entity)
+        dao.cursor.find.return_value = Cursor([db_dict])
+        dao.cursor.estimated_document_count.return_value = 10
+
+        res = dao.get_all(filters={"name": "Test"}, count_mode="estimated")
+        dao.cursor.count_documents.assert_not_called()
+
+        assert res == (10, [test_entity])
+
+    @staticmethod
+    def test_get_all_count_none_should_not_count(dao, test_entity):
+        db_dict = dao._prepare_db_dict(test_entity)
+        dao.cursor.find.return_value = Cursor([db_dict])
+
+        res = dao.get_all(count_mode="none")
+        dao.cursor.count_documents.assert_not_called()
+        dao.cursor.estimated_document_count.assert_not_called()
+
+        assert res == (None, [test_entity])
+
+    @staticmethod
+    def test_get_all_with_cursor_should_seek_and_sort(dao, test_entity):
+        test_entity.creation_datetime = datetime.datetime(2021, 1, 1)
+        cursor = dao.next_cursor([test_entity], 1)
+
+        dao.get_all(length=1, filters={"name": "Test"}, cursor=cursor)
+        dao.cursor.find.assert_called_with(
+            {"test_entity_name": "Test",
+             "$or": [
+                 {"test_entity_creation_datetime":
+                      {"$gt": datetime.datetime(2021, 1, 1)}},
+                 {"test_entity_creation_datetime":
+                      datetime.datetime(2021, 1, 1),
+                  "test_entity_id_": {"$gt": test_entity.id_}}]},
+            sort=[("test_entity_creation_datetime", 1),
+                  ("test_entity_id_", 1)],
+            limit=1)
+
+    @staticmethod
+    def test_get_all_with_empty_cursor_should_sort(dao):
+        dao.get_all(length=5, offset=10, cursor="")
+        dao.cursor.find.assert_called_with(
+            {},
+            sort=[("test_entity_creation_datetime", 1),
+                  ("test_entity_id_", 1)],
+            limit=5)
+
+    @staticmethod
+    def test_create_many_should_insert_many(dao, test_entity):
+        other = TestEntity(id_="a022f42cfd2b40338bbb54a2894cba9f")
+        dao.cursor.find.return_value = []
+
+        result = dao.create_many([test_entity, other])
+
+        dao.cursor.insert_many.assert_called_with(
+            [dao._prepare_db_dict(test_entity), dao._prepare_db_dict(other)],
+            ordered=False)
+        assert result.ids == [test_entity.id_, other.id_]
+
+    @staticmethod
+    def test_create_many_should_report_write_errors(dao, test_entity):
+        other = TestEntity(id_="a022f42cfd2b40338bbb54a2894cba9f")
+        dao.cursor.find.return_value = []
+        dao.cursor.insert_many.side_effect = BulkWriteError(
+            {"writeErrors": [{"index": 1, "code": 11000,
+                              "errmsg": "duplicate key"}]})
+
+        result = dao.create_many([test_entity, other])
+
+        assert result.ids == [test_entity.id_]
+        assert isinstance(result.errors[1], DuplicateEntityException)
+
+    @staticmethod
+    def test_update_many_should_bulk_write(dao, test_entity):
+        dao.cursor.find.return_value = [
+            {"test_entity_id_": test_entity.id_}]
+
+        result = dao.update_many([test_entity, "not an entity"])
+
+        assert result.ids == [test_entity.id_]
+        assert isinstance(result.errors[1], NotEntityException)
+        dao.cursor.bulk_write.assert_called_with(
+            [UpdateOne({"test_entity_id_": test_entity.id_},
+                       {"$set": dao._prepare_db_dict(test_entity)})],
+            ordered=False)
+
+    @staticmethod
+    def test_get_all_should_project_fields(dao):
+        dao.cursor.find.return_value = [
+            {"test_entity_id_": "a022f42cfd2b40338bbb54a2894cba9f",
+             "test_entity_name": "Test"}]
+
+        _, results = dao.get_all(fields=["name"], count_mode="none")
+
+        dao.cursor.find.assert_called_with(
+            {}, limit=20, skip=0,
+            projection={"test_entity_id_": True, "test_entity_name": True})
+        assert results[0].id_ == "a022f42cfd2b40338bbb54a2894cba9f"
+        assert results[0].name == "Test"
+
+    @staticmethod
+    def test_get_should_project_fields(dao):
+        dao.cursor.find_one.return_value = None
+
+        dao.get("a022f42cfd2b40338bbb54a2894cba9f", fields=["name"])
+
+        dao.cursor.find_one.assert_called_with(
+            {"test_entity_id_": "a022f42cfd2b40338bbb54a2894cba9f"},
+            projection={"test_entity_id_": True, "test_entity_name": True})
+
+    @staticmethod
+    def test_get_all_should_raise_unknown_fields(dao):
+        with raises(InvalidFieldsException):
+            dao.get_all(fields=["not_a_field"])
+        dao.cursor.find.assert_not_called()
+
+    @staticmethod
+    def test_get_all_should_sort(dao):
+        dao.cursor.find.return_value = []
+
+        dao.get_all(sort=["-birthday", "name"])
+
+        dao.cursor.find.assert_called_with(
+            {}, limit=20, skip=0,
+            sort=[("test_entity_birthday", DESCENDING),
+                  ("test_entity_name", ASCENDING),
+                  ("test_entity_id_", ASCENDING)])
+
+    @staticmethod
+    def test_get_all_should_warn_unindexed_sort(dao, caplog):
+        dao.cursor.find.return_value = []
+        dao.cursor.index_information.return_value = {
+            "_id_": {"key": [("_id", 1)]},
+            "id_1": {"key": [("test_entity_id_", 1)]}}
+        dao.check_sort_indexes = True
+
+        dao.get_all(sort=["name"])
+
+        assert caplog.messages == [
+            "Sorting TestEntity by name, which has no supporting index."]
+
+    @staticmethod
+    def test_iter_all_should_use_cursor_batches(dao):
+        result_cur = dao.cursor.find.return_value
+        result_cur.__iter__.return_value = iter([
+            {"test_entity_id_": "a022f42cfd2b40338bbb54a2894cba9f",
+             "test_entity_name": "Test"}])
+
+        results = list(dao.iter_all(filters={"name": "Test"},
+                                    batch_size=10))
+
+        dao.cursor.find.assert_called_with({"test_entity_name": "Test"},
+                                           batch_size=10)
+        assert results[0].id_ == "a022f42cfd2b40338bbb54a2894cba9f"
+        result_cur.close.assert_called_once()
+
+    @staticmethod
+    def test_iter_all_should_validate_eagerly(dao):
+        with raises(InvalidFieldsException):
+            dao.iter_all(fields=["bogus"])
+        dao.cursor.find.assert_not_called()
+
+    @staticmethod
+    def test_get_all_columnar_should_return_columns(dao):
+        dao.cursor.find.return_value = [
+            {"test_entity_id_": "a022f42cfd2b40338bbb54a2894cba9f",
+             "test_entity_name": "Test"},
+            {"test_entity_id_": "a59d80c8c5694e08a25b625a745d24e0"}]
+        dao.cursor.count_documents.return_value = 2
+
+        total, columns = dao.get_all_columnar(filters={"name": "Test"},
+                                              fields=["name"],
+                                              sort=["name"])
+
+        dao.cursor.find.assert_called_with(
+            {"test_entity_name": "Test"}, limit=20, skip=0,
+            projection={"test_entity_id_": True, "test_entity_name": True},
+            sort=[("test_entity_name", ASCENDING),
+                  ("test_entity_id_", ASCENDING)])
+        assert total == 2
+        assert columns == {"id_": ["a022f42cfd2b40338bbb54a2894cba9f",
+                                   "a59d80c8c5694e08a25b625a745d24e0"],
+                           "name": ["Test", None]}
+
+    @staticmethod
+    def test_get_all_columnar_should_return_empty_columns(dao):
+        dao.cursor.find.return_value = []
+
+        total, columns = dao.get_all_columnar(fields=["name"])
+
+        assert total == 0
+        assert columns == {"id_": [], "name": []}
+        dao.cursor.count_documents.assert_not_called()
+
+    @staticmethod
+    def test_upsert_should_update_one_with_upsert(dao, test_entity):
+        assert dao.upsert(test_entity) == test_entity.id_
+
+        document = dao._prepare_db_dict(test_entity)
+        on_insert = {
+            field: document.pop(field)
+            for field in (dao.fields["id_"], dao.fields["creation_datetime"])
+        }
+
+        dao.cursor.find.assert_not_called()
+        dao.cursor.update_one.assert_called_with(
+            {"test_entity_id_": test_entity.id_},
+            {"$set": document, "$setOnInsert": on_insert},
+            upsert=True)
+
+    @staticmethod
+    def test_upsert_should_raise_duplicate(dao, test_entity):
+        dao.cursor.update_one.side_effect = DuplicateKeyError("duplicate")
+
+        with raises(DuplicateEntityException):
+            dao.upsert(test_entity)
+
+    @staticmethod
+    def test_upsert_many_should_bulk_write(dao, test_entity):
+        other = TestEntity(id_="a022f42cfd2b40338bbb54a2894cba9f")
+
+        result = dao.upsert_many([test_entity, other])
+
+        assert result.ids == [test_entity.id_, other.id_]
+        dao.cursor.find.assert_not_called()
+        operations = dao.cursor.bulk_write.call_args[0][0]
+        assert [operation._filter for operation in operations] == [
+            {"test_entity_id_": test_entity.id_},
+            {"test_entity_id_": other.id_}]
+        assert all(operation._upsert for operation in operations)
+
+    @staticmethod
+    def test_upsert_many_duplicated_id(dao, test_entity):
+        other = TestEntity(id_="a022f42cfd2b40338bbb54a2894cba9f")
+        last = TestEntity(id_=test_entity.id_, name="last")
+
+        result = dao.upsert_many([test_entity, other, last])
+
+        assert result.ids == [test_entity.id_, other.id_, last.id_]
+        operations = dao.cursor.bulk_write.call_args[0][0]
+        assert [operation._filter for operation in operations] == [
+            {"test_entity_id_": test_entity.id_},
+            {"test_entity_id_": other.id_}]
+        assert operations[0]._doc["$set"]["test_entity_name"] == "last"
+
+    @staticmethod
+    def test_remove_many_should_delete_many(dao, test_entity):
+        dao.cursor.find.return_value = []
+
+        result = dao.remove_many([test_entity])
+
+        assert isinstance(result.errors[0], EntityNotFoundException)
+        dao.cursor.delete_many.assert_not_called()
+
+    @staticmethod
+    def test_create_rely_on_constraints_should_not_find(dao, test_entity):
+        dao.rely_on_constraints = True
+        dao.cursor.insert_one.side_effect = DuplicateKeyError("duplicate")
+
+        with raises(DuplicateEntityException):
+            dao.create(test_entity)
+        dao.cursor.find_one.assert_not_called()
+
+    @staticmethod
+    def test_update_rely_on_constraints_should_use_matched_count(
+            dao, test_entity):
+        dao.rely_on_constraints = True
+        dao.cursor.update_one.return_value.matched_count = 0
+
+        with raises(EntityNotFoundException):
+            dao.update(test_entity)
+        dao.cursor.find_one.assert_not_called()
+
+    @staticmethod
+    def test_remove_rely_on_constraints_should_use_deleted_count(
+            dao, test_entity):
+        dao.rely_on_constraints = True
+        dao.cursor.delete_one.return_value.deleted_count = 1
+
+        assert dao.remove(test_entity) == 1
+        dao.cursor.find_one.assert_not_called()
+
     @staticmethod
     @fixture
     def dao(mongo_mock):
@@ -2,11 +2,13 @@ from dataclasses import dataclass
 from datetime import date, datetime
 
 import mysql.connector
-from mock import call
+from flask import Flask
+from mock import Mock, call
 from mysql.connector import DatabaseError, Error, InterfaceError
 from pytest import fixture, mark, raises
 
 from nova_api.entity import Entity
+from nova_api.exceptions import DuplicateEntityException
 from nova_api.persistence.mysql_helper import MySQLHelper
 
 
@@ -75,7 +77,7 @@ class TestMySQLHelper:
         assert pool_mock.mock_calls == [
             call.get_instance(host='127.0.0.1', user='test',
                               password='12345', database='test_db',
-                              database_args={}),
+                              database_args={}, prepared=False),
             call.get_instance().get_connection(),
             call.get_instance().get_connection().cursor()
         ]
@@ -88,11 +90,25 @@ class TestMySQLHelper:
         assert pool_mock.mock_calls == [
             call.get_instance(host='127.0.0.1', user='test',
                               password='12345', database='test_db',
-                              database_args={"ssl_ca": "file"}),
+                              database_args={"ssl_ca": "file"},
+                              prepared=False),
             call.get_instance().get_connection(),
             call.get_instance().get_connection().cursor()
         ]
 
+    def test_close_pooled(self, mocker):
+        pool_mock = mocker.patch("nova_api.persistence.mysql_helper.MySQLPool")
+        pool = pool_mock.get_instance.return_value
+        db_ = MySQLHelper(pooled=True)
+
+        db_.close()
+
+        pool.get_connection.return_value.cursor.return_value.close \
+            .assert_called_once_with()
+        pool.put_connection.assert_called_once_with(
+            pool.get_connection.return_value)
+        pool.get_connection.return_value.close.assert_not_called()
+
     def test_init_none(self, mysql_mock):
         MySQLHelper(host=None, user='test',
                     password='12345', database='test_db', pooled=False)
@@ -172,6 +188,171 @@ class TestMySQLHelper:
         with raises(RuntimeError):
             db_.query("SELECT * FROM table")
 
+    def test_query_many(self, mysql_mock, cursor_mock, db_):
+        row_count, _ = db_.query_many("UPDATE t SET a=%s WHERE b=%s;",
+                                      [[1, 2], [3, 4]])
+        assert [call_ for call_ in mysql_mock.mock_calls
+                if call_ in [call.connect().cursor().executemany(
+                                 "UPDATE t SET a=%s WHERE b=%s;",
+                                 [[1, 2], [3, 4]]),
+                             call.connect().commit()]] == [
+            call.connect().cursor().executemany(
+                "UPDATE t SET a=%s WHERE b=%s;", [[1, 2], [3, 4]]),
+            call.connect().commit()]
+        assert row_count == 1
+
+    def test_iter_query(self, mysql_mock, cursor_mock, db_):
+        cursor_mock.fetchmany.side_effect = [[(1,), (2,)], [(3,)], []]
+        connection = mysql_mock.connect.return_value
+        connection.unread_result = False
+
+        batches = list(db_.iter_query("SELECT a FROM t;", batch_size=2))
+
+        assert batches == [[(1,), (2,)], [(3,)]]
+        connection.cursor.assert_called_with(buffered=False)
+        cursor_mock.execute.assert_called_with("SELECT a FROM t;", None)
+        cursor_mock.fetchmany.assert_called_with(2)
+        cursor_mock.close.assert_called_once()
+        connection.consume_results.assert_not_called()
+
+    def test_iter_query_closed_early(self, mysql_mock, cursor_mock, db_):
+        cursor_mock.fetchmany.return_value = [(1,)]
+        connection = mysql_mock.connect.return_value
+        connection.unread_result = True
+
+        batches = db_.iter_query("SELECT a FROM t;")
+        next(batches)
+        batches.close()
+
+        connection.consume_results.assert_called_once()
+        cursor_mock.close.assert_called_once()
+
+    def test_fail_iter_query(self, cursor_mock, db_):
+        cursor_mock.execute.side_effect = Error(msg="Table doesn't exist")
+
+        with raises(RuntimeError):
+            list(db_.iter_query("SELECT a FROM t;"))
+        cursor_mock.close.assert_called_once()
+
+    @fixture
+    def replicated_db(self, mysql_mock):
+        mysql_mock.connect.side_effect = lambda host, **kwargs: Mock(host=host)
+        return MySQLHelper(host="primary", pooled=False,
+                           replicas="replica1, replica2")
+
+    def test_query_should_read_from_replica(self, replicated_db):
+        replicated_db.query("SELECT a FROM t;")
+        replica_conn = replicated_db.replica_conn
+
+        replicated_db.query("SELECT b FROM t;")
+
+        assert replica_conn.host in ("replica1", "replica2")
+        replica_conn.cursor().execute.assert_called_with("SELECT b FROM t;")
+        replicated_db.db_conn.cursor().execute.assert_not_called()
+        replica_conn.cursor().fetchall.return_value = [(1,)]
+        assert replicated_db.get_results() == [(1,)]
+
+    def test_query_should_pin_to_primary_after_write(self, replicated_db):
+        replicated_db.query("SELECT a FROM t;")
+        replicated_db.query("UPDATE t SET a=%s;", [1])
+
+        replicated_db.query("SELECT a FROM t FOR UPDATE;")
+        replicated_db.query("SELECT a FROM t;")
+
+        primary_cursor = replicated_db.db_conn.cursor()
+        assert primary_cursor.execute.call_count == 3
+        replicated_db.replica_conn.cursor().execute.assert_called_once()
+        primary_cursor.fetchall.return_value = [(1,)]
+        assert replicated_db.get_results() == [(1,)]
+
+    def test_query_should_fall_back_to_primary(self, mysql_mock,
+                                               replicated_db):
+        mysql_mock.connect.side_effect = InterfaceError()
+        in_use = dict(replicated_db.replicas.in_use)
+
+        replicated_db.query("SELECT a FROM t;")
+
+        replicated_db.db_conn.cursor().execute.assert_called_once()
+        assert replicated_db.replica_conn is None and replicated_db.pinned
+        assert replicated_db.replicas.in_use == in_use
+
+    def test_query_should_pin_request_to_primary(self, mysql_mock,
+                                                 replicated_db):
+        other = MySQLHelper(host="primary", pooled=False,
+                            replicas="replica1, replica2")
+
+        with Flask(__name__).app_context():
+            replicated_db.query("UPDATE t SET a=%s;", [1])
+            other.query("SELECT a FROM t;")
+
+        other.db_conn.cursor().execute.assert_called_once_with(
+            "SELECT a FROM t;")
+        assert other.replica_conn is None
+        other.query("SELECT a FROM t;")
+        assert other.replica_conn is not None
+
+    def test_close_should_release_replica(self, replicated_db):
+        replicated_db.query("SELECT a FROM t;")
+        replica_conn = replicated_db.replica_conn
+        host = replicated_db.replica_host
+        in_use = replicated_db.replicas.in_use[host]
+
+        replicated_db.close()
+
+        replica_conn.close.assert_called_once_with()
+        assert replicated_db.replicas.in_use[host] == in_use - 1
+
+    def test_transaction_should_commit_once(self, mysql_mock, db_):
+        connection = mysql_mock.connect.return_value
+
+        with db_.transaction():
+            db_.query("INSERT INTO t (a) VALUES (%s);", [1])
+            db_.query("DELETE FROM t WHERE a=%s;", [2])
+            connection.commit.assert_not_called()
+
+        connection.commit.assert_called_once_with()
+
+    def test_query_prepared(self, mysql_mock, cursor_mock):
+        connection = mysql_mock.connect.return_value
+        helper = MySQLHelper(pooled=False, prepared=True,
+                             prepared_cache_size=1)
+
+        helper.query("SELECT a FROM t WHERE b=%s;", [1])
+        helper.query("SELECT a FROM t WHERE b=%s;", [2])
+        helper.query("SELECT a FROM t;")
+
+        assert connection.cursor.call_args_list.count(
+            call(prepared=True)) == 1
+        cursor_mock.close.assert_not_called()
+        cursor_mock.fetchall.return_value = [(1,)]
+        assert helper.get_results() == [(1,)]
+
+        helper.query("SELECT b FROM t WHERE a=%s;", [1])
+
+        cursor_mock.close.assert_called_once_with()
+
+    def test_fail_query_duplicate_key(self, mysql_mock, db_):
+        def raise_exception(*args, **kwargs):
+            raise Error(errno=1062, msg="Duplicate entry '1' for key 'PRIMARY'")
+
+        cursor_mock = mysql_mock.connect.return_value.cursor.return_value
+        cursor_mock.execute.side_effect = raise_exception
+
+        with raises(DuplicateEntityException):
+            db_.query("INSERT INTO t (a) VALUES (%s);", [1])
+
+    def test_fail_query_many_should_rollback(self, mysql_mock, db_):
+        def raise_exception(*args, **kwargs):
+            raise Error()
+
+        cursor_mock = mysql_mock.connect.return_value.cursor.return_value
+        cursor_mock.executemany.side_effect = raise_exception
+
+        with raises(RuntimeError):
+            db_.query_many("UPDATE t SET a=%s;", [[1], [2]])
+        assert call.connect().rollback() in mysql_mock.mock_calls
+        assert call.connect().commit() not in mysql_mock.mock_calls
+
     @mark.parametrize("exception_type", [InterfaceError,
                                          DatabaseError,
                                          Error])
@@ -194,6 +375,7 @@ class TestMySQLHelper:
         (date, "DATE"),
         (TestEntity, "CHAR(32)")
     ])
-    def test_predict_db_type(self, cls, type_, mysql_mock):
+    def test_predict_db_type(self, cls, type_, mysql_mock, capsys):
         helper = MySQLHelper(pooled=False)
         assert helper.predict_db_type(cls) == type_
+        assert capsys.readouterr().out == ""
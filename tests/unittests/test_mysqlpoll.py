@@ -1,55 +1,81 @@
-from mock import call
+from mock import ANY, Mock, call
 from pytest import fixture
 
 from nova_api.persistence.mysql_pool import MySQLPool
 
 
+def pool_call(name, min_size=5, budget=None):
+    return call(name=name, connect=ANY, ping=ANY, reset=ANY,
+                min_size=min_size, max_size=5, max_age=3600.0,
+                max_idle=600.0, pre_ping=True, check_interval=30.0,
+                timeout=10.0, budget=budget)
+
+
 class TestMySQLPoll:
 
     @fixture
     def pooling_mock(self, mocker):
-        return mocker.patch('nova_api.persistence.mysql_pool.pooling')
+        return mocker.patch('nova_api.persistence.mysql_pool.ConnectionPool')
+
+    @fixture
+    def connector_mock(self, mocker):
+        return mocker.patch('nova_api.persistence.mysql_pool'
+                            '.mysql.connector')
 
-    def test_get_instance_not_exist(self, pooling_mock):
-        mock = pooling_mock.MySQLConnectionPool
+    def test_get_instance_not_exist(self, pooling_mock, connector_mock):
         MySQLPool.get_instance(host="test_host", user="test_user",
                                password="test_passwd", database="test_db")
-        assert mock.mock_calls == [call(
-            pool_name='test_user_test_host-test_db',
-            pool_size=5,
-            pool_reset_session=True,
+        assert pooling_mock.mock_calls == [
+            pool_call('test_user_test_host-test_db')]
+
+        pooling_mock.call_args[1]["connect"]()
+        assert connector_mock.mock_calls == [call.connect(
             host='test_host',
             database='test_db',
             user='test_user',
             password='test_passwd')]
 
+    def test_get_instance_health_checks(self, pooling_mock):
+        MySQLPool.get_instance(host="test_host", user="test_user",
+                               password="test_passwd", database="test_db3",
+                               max_age="0", max_idle=None, pre_ping=False,
+                               check_interval=5)
+        kwargs = pooling_mock.call_args[1]
+        assert kwargs["max_age"] is None and kwargs["max_idle"] is None
+        assert kwargs["pre_ping"] is False
+        assert kwargs["check_interval"] == 5.0
+
+        connection = Mock()
+        connection.is_connected.return_value = False
+        assert kwargs["ping"](connection) is False
+        kwargs["reset"](connection)
+        connection.reset_session.assert_called_once_with()
+
+    def test_get_instance_prepared(self, pooling_mock):
+        MySQLPool.get_instance(host="test_host", user="test_user",
+                               password="test_passwd", database="test_db4",
+                               prepared=True)
+        connection = Mock()
+
+        pooling_mock.call_args[1]["reset"](connection)
+
+        connection.rollback.assert_called_once_with()
+        connection.reset_session.assert_not_called()
+
     def test_get_instance_wrong_chars(self, pooling_mock):
         MySQLPool.get_instance(host="test_host", user="test_user@test_host",
                                password="test_passwd", database="test_db")
-        assert pooling_mock.mock_calls == [call.MySQLConnectionPool(
-            pool_name='test_user_test_host_test_host-test_db',
-            pool_size=5,
-            pool_reset_session=True,
-            host='test_host',
-            database='test_db',
-            user='test_user@test_host',
-            password='test_passwd')]
+        assert pooling_mock.mock_calls == [
+            pool_call('test_user_test_host_test_host-test_db')]
 
     def test_get_instance_too_loong(self, pooling_mock):
         MySQLPool.get_instance(host="test_hosthosthosthosthosthosthosthosthos"
                                     "thosthosthosthosthosthosthost",
                                user="test_user@test_host",
                                password="test_passwd", database="test_db")
-        assert pooling_mock.mock_calls == [call.MySQLConnectionPool(
-            pool_name='test_user_test_host_test_hosthosthosthosthosthosthost'
-                      'hosthosthos',
-            pool_size=5,
-            pool_reset_session=True,
-            host="test_hosthosthosthosthosthosthosthosthos"
-                 "thosthosthosthosthosthosthost",
-            database='test_db',
-            user='test_user@test_host',
-            password='test_passwd')]
+        assert pooling_mock.mock_calls == [
+            pool_call('test_user_test_host_test_hosthosthosthosthosthosthost'
+                      'hosthosthos')]
 
     def test_get_instance_exist_extra_args(self, pooling_mock):
         MySQLPool.get_instance(host="test_host", user="test_user",
@@ -57,14 +83,16 @@ class TestMySQLPoll:
                                database_args={"ssl_ca": "file"})
         assert pooling_mock.mock_calls == []
 
-    def test_get_instance_not_exist_extra_args(self, pooling_mock):
+    def test_get_instance_not_exist_extra_args(self, pooling_mock,
+                                               connector_mock):
         MySQLPool.get_instance(host="test_host2", user="test_user",
                                password="test_passwd", database="test_db",
                                database_args={"ssl_ca": "file"})
-        assert pooling_mock.mock_calls == [call.MySQLConnectionPool(
-            pool_name='test_user_test_host2-test_db',
-            pool_size=5,
-            pool_reset_session=True,
+        assert pooling_mock.mock_calls == [
+            pool_call('test_user_test_host2-test_db')]
+
+        pooling_mock.call_args[1]["connect"]()
+        assert connector_mock.mock_calls == [call.connect(
             host='test_host2',
             database='test_db',
             user='test_user',
@@ -90,3 +118,15 @@ class TestMySQLPoll:
                                         database="test_db2")
         assert inst_1 is not None and inst_2 is not None
         assert inst_1 != inst_2
+
+    def test_get_instance_budget(self, pooling_mock, mocker):
+        budget_mock = mocker.patch('nova_api.persistence.mysql_pool'
+                                   '.ConnectionBudget.get_instance')
+        MySQLPool.get_instance(host="test_host5", user="test_user",
+                               password="test_passwd", database="test_db",
+                               max_connections="20")
+
+        budget_mock.assert_called_once_with("test_host5", 20)
+        assert pooling_mock.mock_calls == [
+            pool_call('test_user_test_host5-test_db', min_size=1,
+                      budget=budget_mock.return_value)]
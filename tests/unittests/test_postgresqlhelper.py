@@ -2,11 +2,12 @@ from dataclasses import dataclass
 from datetime import date, datetime
 
 import psycopg2
-from mock import Mock, call
+from mock import ANY, Mock, call
 from psycopg2._psycopg import DatabaseError, Error, InterfaceError
 from pytest import fixture, mark, raises
 
 from nova_api.entity import Entity
+from nova_api.exceptions import DuplicateEntityException
 from nova_api.persistence.postgresql_helper import PostgreSQLHelper
 
 
@@ -76,8 +77,8 @@ class TestPostgreSQLHelper:
             call.get_instance(host='127.0.0.1', user='test',
                               password='12345', database='test_db',
                               database_args={}),
-            call.get_instance().getconn(key=id(help)),
-            call.get_instance().getconn().cursor()
+            call.get_instance().get_connection(),
+            call.get_instance().get_connection().cursor()
         ]
 
     def test_init_pooled_extra_args_pghelper(self, pool_mock):
@@ -89,8 +90,8 @@ class TestPostgreSQLHelper:
             call.get_instance(host='127.0.0.1', user='test',
                               password='12345', database='test_db',
                               database_args={"ssl_ca": "file"}),
-            call.get_instance().getconn(key=id(helper)),
-            call.get_instance().getconn().cursor()
+            call.get_instance().get_connection(),
+            call.get_instance().get_connection().cursor()
         ]
 
     def test_init_none_pghelper(self, postgresql_mock):
@@ -142,6 +143,68 @@ class TestPostgreSQLHelper:
                  if call_ in postgresql_mock.mock_calls] == calls
                 and row_count == 1 and last_id == 1)
 
+    def test_query_prepared(self, postgresql_mock, cursor_mock):
+        helper = PostgreSQLHelper(pooled=False, prepared=True,
+                                  prepared_cache_size=1)
+        prepare_cursor = cursor_mock.__enter__.return_value
+
+        helper.query("SELECT a FROM t WHERE b=%s AND c=%s;", [1, 2])
+        helper.query("SELECT a FROM t WHERE b=%s AND c=%s;", [3, 4])
+
+        prepare_cursor.execute.assert_called_once()
+        prepare = prepare_cursor.execute.call_args.args[0]
+        assert prepare.startswith("PREPARE nova_api_")
+        assert prepare.endswith(" AS SELECT a FROM t WHERE b=$1 AND c=$2;")
+        name = prepare.split()[1]
+        cursor_mock.execute.assert_called_with(f"EXECUTE {name} (%s, %s);",
+                                               [3, 4])
+
+        helper.query("SELECT b FROM t WHERE a=%s;", [1])
+
+        prepare_cursor.execute.assert_called_with(f"DEALLOCATE {name};")
+
+    def test_query_should_not_commit_reads(self, postgresql_mock, db_):
+        db_.query("SELECT * FROM teste;")
+        postgresql_mock.connect.return_value.commit.assert_not_called()
+
+    def test_transaction_should_commit_once(self, postgresql_mock, db_):
+        connection = postgresql_mock.connect.return_value
+
+        with db_.transaction():
+            db_.query("INSERT INTO t (a) VALUES (%s);", [1])
+            with db_.transaction():
+                db_.query_many("UPDATE t SET a=%s;", [[1], [2]])
+            connection.commit.assert_not_called()
+
+        connection.commit.assert_called_once_with()
+        assert db_.transaction_depth == 0
+
+    def test_transaction_should_rollback(self, postgresql_mock, db_):
+        connection = postgresql_mock.connect.return_value
+
+        with raises(KeyError):
+            with db_.transaction():
+                db_.query("INSERT INTO t (a) VALUES (%s);", [1])
+                raise KeyError()
+
+        connection.rollback.assert_called_once_with()
+        connection.commit.assert_not_called()
+
+    def test_transaction_should_fail_after_failed_query(self, postgresql_mock,
+                                                        cursor_mock, db_):
+        connection = postgresql_mock.connect.return_value
+        cursor_mock.execute.side_effect = [Error(), None]
+
+        with raises(RuntimeError):
+            with db_.transaction():
+                with raises(RuntimeError):
+                    db_.query("INSERT INTO t (a) VALUES (%s);", [1])
+                connection.rollback.assert_not_called()
+                db_.query("INSERT INTO t (a) VALUES (%s);", [2])
+
+        connection.rollback.assert_called_once_with()
+        connection.commit.assert_not_called()
+
     @mark.parametrize("results, returned", [
         ([], None),
         ([[1, 2, 3]], [[1, 2, 3]])
@@ -151,6 +214,27 @@ class TestPostgreSQLHelper:
         cursor_mock.fetchall.return_value = results
         assert db_.get_results() == returned
 
+    def test_replica_pooled(self, pool_mock):
+        helper = PostgreSQLHelper(host='primary', user='test',
+                                  password='12345', database='test_db',
+                                  pooled=True, replicas=['replica'])
+        pool_mock.get_instance.reset_mock()
+        pool = pool_mock.get_instance.return_value
+        connection = pool.get_connection.return_value
+        connection.cursor.return_value.fetchmany.side_effect = [[(1,)], []]
+
+        batches = list(helper.iter_query("SELECT a FROM t;"))
+        helper.query("INSERT INTO t (a) VALUES (%s);", [1])
+        helper.close()
+
+        assert batches == [[(1,)]]
+        pool_mock.get_instance.assert_called_once_with(
+            host='replica', user='test', password='12345',
+            database='test_db', database_args={})
+        connection.cursor.assert_any_call(name=ANY)
+        assert pool.put_connection.call_args_list == [call(connection),
+                                                      call(connection)]
+
     def test_close(self, postgresql_mock: Mock, db_, cursor_mock):
         db_.close()
         calls = [
@@ -164,12 +248,13 @@ class TestPostgreSQLHelper:
 
     def test_close_pooled(self, pool_mock, db_pooled, cursor_mock):
         db_pooled.close()
-        my_conn = Mock()
-        pool_mock.get_instance.return_value.getconn.return_value = my_conn
+        my_conn = pool_mock.get_instance.return_value.get_connection \
+            .return_value
 
-        assert call.get_instance().getconn().cursor().close() \
+        assert call.get_instance().get_connection().cursor().close() \
                in pool_mock.mock_calls
-        assert pool_mock.get_instance.return_value.putconn.called_with(my_conn)
+        pool_mock.get_instance.return_value.put_connection \
+            .assert_called_once_with(my_conn)
 
     @mark.parametrize("exception_type", [ValueError,
                                          InterfaceError])
@@ -195,6 +280,67 @@ class TestPostgreSQLHelper:
         with raises(RuntimeError):
             db_.query("SELECT * FROM table")
 
+    def test_query_many(self, postgresql_mock, cursor_mock, db_):
+        row_count, _ = db_.query_many("UPDATE t SET a=%s WHERE b=%s;",
+                                      [[1, 2], [3, 4]])
+        assert [call_ for call_ in postgresql_mock.mock_calls
+                if call_ in [call.connect().cursor().executemany(
+                                 "UPDATE t SET a=%s WHERE b=%s;",
+                                 [[1, 2], [3, 4]]),
+                             call.connect().commit()]] == [
+            call.connect().cursor().executemany(
+                "UPDATE t SET a=%s WHERE b=%s;", [[1, 2], [3, 4]]),
+            call.connect().commit()]
+        assert row_count == 1
+
+    def test_iter_query(self, postgresql_mock, cursor_mock, db_):
+        cursor_mock.fetchmany.side_effect = [[(1,), (2,)], [(3,)], []]
+        connection = postgresql_mock.connect.return_value
+
+        batches = list(db_.iter_query("SELECT a FROM t;", [], 2))
+
+        assert batches == [[(1,), (2,)], [(3,)]]
+        assert connection.cursor.call_args.kwargs["name"] \
+            .startswith("nova_api_")
+        assert cursor_mock.itersize == 2
+        cursor_mock.execute.assert_called_with("SELECT a FROM t;", [])
+        cursor_mock.close.assert_called_once()
+        connection.commit.assert_called_once()
+
+    def test_fail_iter_query(self, postgresql_mock, cursor_mock, db_):
+        cursor_mock.execute.side_effect = Error("Table doesn't exist")
+        connection = postgresql_mock.connect.return_value
+
+        with raises(RuntimeError):
+            list(db_.iter_query("SELECT a FROM t;"))
+        connection.rollback.assert_called_once()
+        cursor_mock.close.assert_called_once()
+
+    def test_fail_query_duplicate_key(self, postgresql_mock, db_):
+        class UniqueViolation(Error):
+            pgcode = "23505"
+
+        def raise_exception(*args, **kwargs):
+            raise UniqueViolation()
+
+        cursor_mock = postgresql_mock.connect.return_value.cursor.return_value
+        cursor_mock.execute.side_effect = raise_exception
+
+        with raises(DuplicateEntityException):
+            db_.query("INSERT INTO t (a) VALUES (%s);", [1])
+
+    def test_fail_query_many_should_rollback(self, postgresql_mock, db_):
+        def raise_exception(*args, **kwargs):
+            raise Error()
+
+        cursor_mock = postgresql_mock.connect.return_value.cursor.return_value
+        cursor_mock.executemany.side_effect = raise_exception
+
+        with raises(RuntimeError):
+            db_.query_many("UPDATE t SET a=%s;", [[1], [2]])
+        assert call.connect().rollback() in postgresql_mock.mock_calls
+        assert call.connect().commit() not in postgresql_mock.mock_calls
+
     @mark.parametrize("exception_type", [InterfaceError,
                                          DatabaseError,
                                          Error])
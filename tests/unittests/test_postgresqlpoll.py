@@ -1,38 +1,64 @@
-from mock import call
+import psycopg2
+from mock import ANY, MagicMock, Mock, call
 from pytest import fixture
 
 from nova_api.persistence.postgresql_pool import PostgreSQLPool
 
 
+def pool_call(name, min_size=1, max_size=5, timeout=10.0, budget=None):
+    return call(name=name, connect=ANY, ping=ANY, reset=ANY,
+                min_size=min_size, max_size=max_size, max_age=3600.0,
+                max_idle=600.0, pre_ping=True, check_interval=30.0,
+                timeout=timeout, budget=budget)
+
+
 class TestPostgreSQLPoll:
 
     @fixture
     def pooling_mock(self, mocker):
-        return mocker.patch('nova_api.persistence.postgresql_pool.pool')
+        return mocker.patch('nova_api.persistence.postgresql_pool'
+                            '.ConnectionPool')
+
+    @fixture
+    def connect_mock(self, mocker):
+        return mocker.patch('nova_api.persistence.postgresql_pool'
+                            '.psycopg2.connect')
 
-    def test_get_instance_not_exist(self, pooling_mock):
-        mock = pooling_mock.SimpleConnectionPool
+    def test_get_instance_not_exist(self, pooling_mock, connect_mock):
         PostgreSQLPool.get_instance(host="test_host", user="test_user",
                                     password="test_passwd", database="test_db")
-        assert mock.mock_calls == [call(
-            maxconn=5,
-            minconn=5,
+        assert pooling_mock.mock_calls == [
+            pool_call('test_user_test_host-test_db')]
+
+        pooling_mock.call_args[1]["connect"]()
+        assert connect_mock.mock_calls == [call(
             host='test_host',
             database='test_db',
             user='test_user',
             password='test_passwd')]
 
+    def test_get_instance_ping(self, pooling_mock):
+        PostgreSQLPool.get_instance(host="test_host", user="test_user",
+                                    password="test_passwd",
+                                    database="test_db3")
+        ping = pooling_mock.call_args[1]["ping"]
+
+        connection = MagicMock(closed=0)
+        assert ping(connection) is True
+        connection.cursor.return_value.__enter__.return_value.execute \
+            .assert_called_once_with("SELECT 1")
+        connection.rollback.assert_called_once_with()
+
+        connection.rollback.side_effect = psycopg2.OperationalError()
+        assert ping(connection) is False
+        assert ping(Mock(closed=1)) is False
+
     def test_get_instance_wrong_chars(self, pooling_mock):
         PostgreSQLPool.get_instance(host="test_host",
                                     user="test_user@test_host",
                                     password="test_passwd", database="test_db")
-        assert pooling_mock.mock_calls == [call.SimpleConnectionPool(
-            maxconn=5,
-            minconn=5,
-            host='test_host',
-            database='test_db',
-            user='test_user@test_host',
-            password='test_passwd')]
+        assert pooling_mock.mock_calls == [
+            pool_call('test_user_test_host_test_host-test_db')]
 
     def test_get_instance_too_loong(self, pooling_mock):
         PostgreSQLPool.get_instance(
@@ -40,14 +66,9 @@ class TestPostgreSQLPoll:
                  "thosthosthosthosthosthosthost",
             user="test_user@test_host",
             password="test_passwd", database="test_db")
-        assert pooling_mock.mock_calls == [call.SimpleConnectionPool(
-            maxconn=5,
-            minconn=5,
-            host="test_hosthosthosthosthosthosthosthosthos"
-                 "thosthosthosthosthosthosthost",
-            database='test_db',
-            user='test_user@test_host',
-            password='test_passwd')]
+        assert pooling_mock.mock_calls == [
+            pool_call('test_user_test_host_test_hosthosthosthosthosthosthost'
+                      'hosthosthos')]
 
     def test_get_instance_exist_extra_args(self, pooling_mock):
         PostgreSQLPool.get_instance(host="test_host", user="test_user",
@@ -55,19 +76,33 @@ class TestPostgreSQLPoll:
                                     database_args={"ssl_ca": "file"})
         assert pooling_mock.mock_calls == []
 
-    def test_get_instance_not_exist_extra_args(self, pooling_mock):
+    def test_get_instance_not_exist_extra_args(self, pooling_mock,
+                                               connect_mock):
         PostgreSQLPool.get_instance(host="test_host2", user="test_user",
                                     password="test_passwd", database="test_db",
-                                    database_args={"ssl_ca": "file"})
-        assert pooling_mock.mock_calls == [call.SimpleConnectionPool(
-            maxconn=5,
-            minconn=5,
+                                    database_args={"ssl_ca": "file",
+                                                   "minconn": 2,
+                                                   "maxconn": 8})
+        assert pooling_mock.mock_calls == [
+            pool_call('test_user_test_host2-test_db', min_size=2,
+                      max_size=8)]
+
+        pooling_mock.call_args[1]["connect"]()
+        assert connect_mock.mock_calls == [call(
             host='test_host2',
             database='test_db',
             user='test_user',
             password='test_passwd',
             ssl_ca='file')]
 
+    def test_get_instance_sizes_and_timeout(self, pooling_mock):
+        PostgreSQLPool.get_instance(host="test_host4", user="test_user",
+                                    password="test_passwd", database="test_db",
+                                    size="20", min_size="0", timeout="")
+        assert pooling_mock.mock_calls == [
+            pool_call('test_user_test_host4-test_db', min_size=0,
+                      max_size=20, timeout=None)]
+
     def test_get_instance_exist(self, pooling_mock):
         inst_1 = PostgreSQLPool.get_instance(host="test_host",
                                              user="test_user",
@@ -91,3 +126,15 @@ class TestPostgreSQLPoll:
                                              database="test_db2")
         assert inst_1 is not None and inst_2 is not None
         assert inst_1 != inst_2
+
+    def test_get_instance_budget(self, pooling_mock, mocker):
+        budget_mock = mocker.patch('nova_api.persistence.postgresql_pool'
+                                   '.ConnectionBudget.get_instance')
+        PostgreSQLPool.get_instance(host="test_host5", user="test_user",
+                                    password="test_passwd", database="test_db",
+                                    max_connections="20")
+
+        budget_mock.assert_called_once_with("test_host5", 20)
+        assert pooling_mock.mock_calls == [
+            pool_call('test_user_test_host5-test_db',
+                      budget=budget_mock.return_value)]
@@ -0,0 +1,54 @@
+from pytest import mark, raises
+
+from nova_api.persistence.replicas import LEAST_CONNECTIONS, ReplicaSet, \
+    is_read_query, parse_hosts
+
+
+class TestReplicas:
+    @mark.parametrize("hosts, expected", [
+        (None, []),
+        ("", []),
+        ("replica1, replica2,", ["replica1", "replica2"]),
+        (["replica1", " "], ["replica1"])])
+    def test_parse_hosts(self, hosts, expected):
+        assert parse_hosts(hosts) == expected
+
+    @mark.parametrize("query, expected", [
+        ("SELECT a FROM t;", True),
+        ("  select a FROM t;", True),
+        ("SELECT a FROM t FOR UPDATE;", False),
+        ("SELECT a FROM t FOR SHARE;", False),
+        ("SELECT a FROM t LOCK IN SHARE MODE;", False),
+        ("INSERT INTO t (a) VALUES (%s);", False),
+        ("CREATE TABLE t (a INT);", False)])
+    def test_is_read_query(self, query, expected):
+        assert is_read_query(query) is expected
+
+    def test_round_robin(self):
+        replicas = ReplicaSet(["replica1", "replica2"])
+
+        assert [replicas.acquire() for _ in range(3)] == \
+            ["replica1", "replica2", "replica1"]
+        assert replicas.in_use == {"replica1": 2, "replica2": 1}
+
+    def test_least_connections(self):
+        replicas = ReplicaSet(["replica1", "replica2"], LEAST_CONNECTIONS)
+
+        assert replicas.acquire() == "replica1"
+        assert replicas.acquire() == "replica2"
+        replicas.release("replica1")
+        assert replicas.acquire() == "replica1"
+
+    def test_invalid(self):
+        with raises(ValueError):
+            ReplicaSet([])
+        with raises(ValueError):
+            ReplicaSet(["replica1"], "random")
+
+    def test_get_instance(self):
+        replicas = ReplicaSet.get_instance("replica1,replica2")
+
+        assert ReplicaSet.get_instance(["replica1", "replica2"]) is replicas
+        assert ReplicaSet.get_instance(["replica1", "replica2"],
+                                       LEAST_CONNECTIONS) is not replicas
+        assert ReplicaSet.get_instance("") is None
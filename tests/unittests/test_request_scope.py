@@ -0,0 +1,68 @@
+from flask import Flask
+from mock import Mock
+from pytest import fixture
+
+from nova_api.dao.generic_sql_dao import GenericSQLDAO
+from nova_api.persistence import request_scope
+from tests.unittests import TestEntity
+
+
+class TestRequestScope:
+    @fixture
+    def app(self):
+        app = Flask(__name__)
+        request_scope.add_request_scope(app)
+        return app
+
+    @fixture
+    def database_type(self):
+        return Mock(side_effect=lambda **kwargs: Mock())
+
+    def test_should_share_database(self, app, database_type):
+        with app.app_context():
+            first = GenericSQLDAO(database_type=database_type,
+                                  return_class=TestEntity)
+            second = GenericSQLDAO(database_type=database_type,
+                                   return_class=TestEntity, table="others")
+            other = GenericSQLDAO(database_type=database_type,
+                                  return_class=TestEntity, host="other")
+            first.close()
+            second.close()
+
+            assert first.database is second.database
+            assert other.database is not first.database
+            first.database.close.assert_not_called()
+
+        first.database.close.assert_called_once_with()
+        other.database.close.assert_called_once_with()
+        assert database_type.call_count == 2
+
+    def test_should_not_share_outside_app(self, database_type):
+        first = GenericSQLDAO(database_type=database_type,
+                              return_class=TestEntity)
+        second = GenericSQLDAO(database_type=database_type,
+                               return_class=TestEntity)
+        first.close()
+
+        assert first.database is not second.database
+        first.database.close.assert_called_once_with()
+
+    def test_should_keep_database_instance(self, app):
+        database = Mock()
+
+        with app.app_context():
+            dao = GenericSQLDAO(database_instance=database,
+                                return_class=TestEntity)
+
+        assert dao.database is database and not dao.request_scoped
+        database.close.assert_not_called()
+
+    def test_detach(self, app, database_type):
+        with app.app_context():
+            dao = GenericSQLDAO(database_type=database_type,
+                                return_class=TestEntity)
+            close = request_scope.detach()
+
+        dao.database.close.assert_not_called()
+        close()
+        dao.database.close.assert_called_once_with()